@@ -0,0 +1,234 @@
+"""
+This file builds an approximate nearest-neighbour index over a Sparse_Graph, so that the
+vertices most similar to a given one can be found without scoring every vertex of its kind
+"""
+from typing import Any, Optional
+
+import numpy as np
+
+from sparse_graph import Sparse_Graph
+
+# the number of rows hashed at once when building tables, which bounds the size of the
+# dense array of projections
+HASH_BATCH_SIZE = 65536
+
+# the number of bits calibrate removes from each hash every time the index has as many
+# tables as it may have and still misses the target recall
+BITS_STEP = 2
+
+# the bucket looked up for a hash no row of a table has
+_EMPTY_BUCKET = np.empty(0, dtype=np.int64)
+
+
+class ANN_Index:
+    """
+    A random-projection (SimHash) locality-sensitive hash index over the rows of a Sparse_Graph.
+
+    Each table hashes a row to num_bits bits, one per random hyperplane, recording which side
+    of the hyperplane the row lies on. Rows at a small angle to each other, and so with a high
+    cosine similarity, tend to share a bucket. A query only scores the rows that share a
+    bucket with it in at least one table, so adding tables raises recall at the cost of
+    scoring more candidates.
+
+    Instance Attributes:
+        - compiled: the Sparse_Graph whose rows are indexed
+        - weight_map: the edge category weights the rows were hashed with, or None for the
+          weights stored in the graph
+        - num_bits: the number of bits in each hash
+        - recall: the recall@k last measured by measure_recall, or None if it was never measured
+
+    Representation Invariants:
+        - self.num_bits >= 1
+        - self.recall is None or 0 <= self.recall <= 1
+    """
+    compiled: Sparse_Graph
+    weight_map: Optional[dict[str, float]]
+    num_bits: int
+    recall: Optional[float]
+    # Private Instance Attributes:
+    #   - _matrix: the (weighted) matrix of compiled, whose rows are hashed and scored
+    #   - _norms: the L2 norm of each row of _matrix
+    #   - _planes: the normals of the hyperplanes, num_bits columns per table
+    #   - _tables: for each table, a mapping from each hash to the rows with that hash
+    #   - _random: the random number generator the hyperplanes are drawn from
+    _matrix: Any
+    _norms: np.ndarray
+    _planes: np.ndarray
+    _tables: list[dict[int, np.ndarray]]
+    _random: np.random.Generator
+
+    def __init__(self, compiled: Sparse_Graph, weight_map: Optional[dict[str, float]] = None,
+                 num_bits: int = 16, num_tables: int = 8, seed: int = 0) -> None:
+        """
+        Index the rows of compiled into num_tables hash tables of num_bits bits each.
+        The hyperplanes are drawn from seed, so the same arguments give the same index.
+
+        Later changes to compiled's graph are not reflected in this index.
+
+        Preconditions:
+            - 1 <= num_bits <= 62
+            - num_tables >= 1
+        """
+        self.compiled = compiled
+        self.weight_map = weight_map
+        self.num_bits = num_bits
+        self.recall = None
+        if weight_map is None:
+            self._matrix, self._norms = compiled.matrix, compiled.norms
+        else:
+            self._matrix, self._norms = compiled.weighted_matrix(weight_map)
+        self._planes = np.empty((self._matrix.shape[1], 0))
+        self._tables = []
+        self._random = np.random.default_rng(seed)
+        self.add_tables(num_tables)
+
+    def num_tables(self) -> int:
+        """
+        Return the number of hash tables in this index
+        """
+        return len(self._tables)
+
+    def add_tables(self, num_tables: int) -> None:
+        """
+        Hash every row into num_tables more tables, raising the recall of later queries.
+        """
+        planes = self._random.standard_normal((self._matrix.shape[1], num_tables * self.num_bits))
+        powers = 1 << np.arange(self.num_bits, dtype=np.int64)
+        codes = np.empty((self._matrix.shape[0], num_tables), dtype=np.int64)
+        for start in range(0, self._matrix.shape[0], HASH_BATCH_SIZE):
+            projections = self._matrix[start:start + HASH_BATCH_SIZE] @ planes
+            bits = (projections > 0).reshape(-1, num_tables, self.num_bits)
+            codes[start:start + HASH_BATCH_SIZE] = bits @ powers
+
+        for table in range(num_tables):
+            order = np.argsort(codes[:, table], kind='stable')
+            hashes, starts = np.unique(codes[order, table], return_index=True)
+            buckets = np.split(order, starts[1:])
+            self._tables.append(dict(zip(hashes.tolist(), buckets)))
+        self._planes = np.hstack((self._planes, planes))
+
+    def candidates(self, item: Any) -> np.ndarray:
+        """
+        Return the rows that share a bucket with item in at least one table, including item's own row.
+
+        Raise ValueError if item is not a row of the indexed Sparse_Graph.
+        """
+        if item not in self.compiled.row_index:
+            raise ValueError
+
+        return self._candidates(self._matrix[self.compiled.row_index[item]].toarray().ravel())
+
+    def _candidates(self, vector: np.ndarray) -> np.ndarray:
+        """
+        Return the rows that share a bucket with the given dense row vector in at least one table.
+        """
+        projections = vector @ self._planes
+        bits = (projections > 0).reshape(len(self._tables), self.num_bits)
+        codes = bits @ (1 << np.arange(self.num_bits, dtype=np.int64))
+        buckets = [table.get(code, _EMPTY_BUCKET) for table, code in zip(self._tables, codes.tolist())]
+        return np.unique(np.concatenate(buckets))
+
+    def top_k(self, item: Any, k: int = 20) -> list[tuple[Any, float]]:
+        """
+        Return up to k rows most similar to item among its candidates as (item, score) pairs,
+        ordered like Sparse_Graph.top_k. Scores are exact cosine similarities; only the set
+        of rows that is scored is approximate, so fewer than k pairs may be returned.
+
+        Raise ValueError if item is not a row of the indexed Sparse_Graph.
+
+        Precondition:
+            - k >= 0
+        """
+        if item not in self.compiled.row_index:
+            raise ValueError
+
+        row = self.compiled.row_index[item]
+        vector = self._matrix[row].toarray().ravel()
+        candidates = self._candidates(vector)
+        candidates = candidates[candidates != row]
+        if k == 0 or len(candidates) == 0:
+            return []
+
+        dots = self._matrix[candidates] @ vector
+        denominators = self._norms[candidates] * self._norms[row]
+        scores = np.divide(dots, denominators, out=np.zeros_like(dots), where=denominators != 0)
+        order = np.lexsort((self.compiled.name_ranks[candidates], -scores))[:k]
+        return [(self.compiled.rows[candidates[i]], float(scores[i])) for i in order]
+
+    def measure_recall(self, k: int = 20, sample_size: int = 100, seed: int = 0) -> float:
+        """
+        Return the recall@k of this index against the exact cosine similarity, averaged over
+        sample_size rows drawn from seed, and store it in self.recall.
+
+        A returned pair counts as a hit if it scores at least as high as the k-th exact
+        result, so a row that ties with the exact results at the cut-off is not a miss.
+
+        Precondition:
+            - k >= 1
+            - sample_size >= 1
+        """
+        rows = self.compiled.rows
+        k = min(k, len(rows) - 1)
+        if k <= 0:
+            self.recall = 1.0
+            return self.recall
+
+        sample_rows = np.random.default_rng(seed).choice(len(rows), min(sample_size, len(rows)), replace=False)
+        sample = [rows[i] for i in sample_rows]
+        exact_scores = self.compiled.similarity_matrix(sample, self.weight_map)
+        hits = 0
+        for i, item in enumerate(sample):
+            cut_off = self.compiled.top_k(exact_scores[:, i], k, item)[-1][1]
+            hits += sum(score >= cut_off - 1e-12 for _, score in self.top_k(item, k))
+
+        self.recall = hits / (k * len(sample))
+        return self.recall
+
+    def rebuild(self, num_bits: int, num_tables: int) -> None:
+        """
+        Discard every table and hash every row again into num_tables tables of num_bits bits each.
+        Fewer bits give larger buckets, raising recall at the cost of scoring more candidates.
+
+        Preconditions:
+            - 1 <= num_bits <= 62
+            - num_tables >= 1
+        """
+        self.num_bits = num_bits
+        self.recall = None
+        self._planes = np.empty((self._matrix.shape[1], 0))
+        self._tables = []
+        self.add_tables(num_tables)
+
+    def calibrate(self, target_recall: float, k: int = 20, sample_size: int = 100,
+                  max_tables: int = 64, min_bits: int = 4) -> float:
+        """
+        Add tables, doubling their number each time, until the measured recall@k reaches
+        target_recall or the index has max_tables tables. While the recall is still short of
+        target_recall after that, rebuild the index with BITS_STEP fewer bits per hash, down to
+        min_bits. Return the last measured recall, which is below target_recall only if
+        target_recall could not be reached with min_bits bits.
+
+        Preconditions:
+            - 0 <= target_recall <= 1
+            - max_tables >= 1
+            - min_bits >= 1
+        """
+        recall = self.measure_recall(k, sample_size)
+        while recall < target_recall and self.num_tables() < max_tables:
+            self.add_tables(min(self.num_tables(), max_tables - self.num_tables()))
+            recall = self.measure_recall(k, sample_size)
+        while recall < target_recall and self.num_bits > min_bits:
+            self.rebuild(max(min_bits, self.num_bits - BITS_STEP), self.num_tables())
+            recall = self.measure_recall(k, sample_size)
+        return recall
+
+
+if __name__ == "__main__":
+    # python_ta is only needed to check this file, so it is not imported along with the module
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['typing', 'numpy', 'python_ta', 'sparse_graph'],
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120
+    })
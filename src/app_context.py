@@ -0,0 +1,167 @@
+"""
+This file holds the data, graphs and predictors the project needs, building each of them
+the first time it is asked for rather than when a module is imported
+"""
+import os
+import threading
+from typing import Optional
+
+import Constants
+import create_usable_data
+import generate_sample_user_graph
+import graph_container
+import predict_from_data
+
+
+class App_Context:
+    """
+    Lazily built application state.
+    Each getter builds its value on first use and returns the same value afterwards.
+    The getters are safe to call from several threads, so warm_up can build everything
+    in the background while the interface starts.
+
+    Instance Attributes:
+        - input_file: the csv file the restaurant data is read from
+        - number_rows: the number of rows of input_file to read
+        - weight_map: the weights used to build the sample restaurant graph; queries
+          can score it with other weights without rebuilding it
+        - table_dir: the directory the sample predictor looks up similarity tables in, or None
+          to always compute similarities
+        - graph_file: if not None, a graph saved with Graph.save that is loaded as the sample
+          graph instead of building it, so processes loading the same file share its pages
+    """
+    input_file: str
+    number_rows: int
+    weight_map: dict[str, int]
+    table_dir: Optional[str]
+    graph_file: Optional[str]
+    # Private Instance Attributes:
+    #   - _lock: held while a value is being built
+    #   - _values: mapping from the name of each value built so far to that value
+    #   - _warm_up_thread: the thread started by warm_up, if any
+    _lock: threading.RLock
+    _values: dict
+    _warm_up_thread: Optional[threading.Thread]
+
+    def __init__(self, input_file: str, number_rows: int, weight_map: dict[str, int],
+                 table_dir: Optional[str] = None, graph_file: Optional[str] = None) -> None:
+        """
+        Initialize a new context for the given data. Nothing is read until it is needed.
+
+        Preconditions:
+            - graph_file is None or it holds the graph get_sample_graph would build
+        """
+        self.input_file = input_file
+        self.number_rows = number_rows
+        self.weight_map = weight_map
+        self.table_dir = table_dir
+        self.graph_file = graph_file
+        self._lock = threading.RLock()
+        self._values = {}
+        self._warm_up_thread = None
+
+    def _get(self, name: str, build) -> object:
+        """
+        Return the value stored under name, calling build() to create it if it does not exist yet.
+        """
+        if name in self._values:
+            return self._values[name]
+        with self._lock:
+            if name not in self._values:
+                self._values[name] = build()
+            return self._values[name]
+
+    def get_usable_data(self) -> dict[str, create_usable_data.Restaurant]:
+        """
+        Return the mapping from restaurant name to Restaurant read from input_file
+        """
+        return self._get('usable_data', lambda: create_usable_data.load_valid_rows(self.input_file,
+                                                                                   self.number_rows))
+
+    def get_sample_graph(self) -> graph_container.Graph:
+        """
+        Return the restaurant graph built from the usable data with weight_map,
+        or loaded from graph_file if it is given
+        """
+        return self._get('sample_graph', self._build_sample_graph)
+
+    def _build_sample_graph(self) -> graph_container.Graph:
+        """
+        Return a new sample graph, loading it from graph_file if it is given
+        """
+        graph = graph_container.Graph()
+        if self.graph_file is not None:
+            graph.load(self.graph_file)
+            return graph
+        return create_usable_data.create_graph(self.get_usable_data(), self.weight_map, graph)
+
+    def get_sample_predictor(self) -> predict_from_data.Similarity_Computations:
+        """
+        Return a predictor over the sample restaurant graph
+        """
+        return self._get('sample_predictor',
+                         lambda: predict_from_data.Similarity_Computations(self.get_sample_graph(),
+                                                                           table_dir=self.table_dir))
+
+    def build_similarity_table(self, weight_map: Optional[dict[str, int]] = None, k: int = 20,
+                               processes: int = 1) -> str:
+        """
+        Compute the k restaurants most similar to each restaurant of the sample graph under
+        weight_map in a pool of the given number of processes, save them to table_dir and
+        return the path they were saved to. The sample predictor answers from them from then on.
+
+        Preconditions:
+            - self.table_dir is not None
+        """
+        # imported here so numpy and scipy are only loaded when a table is built
+        import similarity_table
+        import sparse_graph
+
+        os.makedirs(self.table_dir, exist_ok=True)
+        compiled = sparse_graph.Sparse_Graph(self.get_sample_graph(), Constants.RESTAURANT)
+        table = similarity_table.build_table(compiled, weight_map, k, processes)
+        path = similarity_table.table_path(self.table_dir, Constants.RESTAURANT, weight_map)
+        table.save(path)
+        self.get_sample_predictor().add_similarity_table(table)
+        return path
+
+    def get_user_predictor(self) -> predict_from_data.Similarity_Computations:
+        """
+        Return a predictor over a random user graph, created with create_user_graph the
+        first time it is asked for and shared afterwards
+        """
+        return self._get('user_predictor',
+                         lambda: predict_from_data.Similarity_Computations(self.create_user_graph()))
+
+    def create_user_graph(self) -> graph_container.Graph:
+        """
+        Return a new random graph connecting users to the restaurants in the usable data.
+        Unlike the other getters, this creates a new graph on every call.
+        """
+        generator = generate_sample_user_graph.Generate_Graph(self.get_usable_data())
+        return generator.create_random_graph(50, 15)
+
+    def warm_up(self, background: bool = True) -> None:
+        """
+        Build the usable data, the sample graph and its predictor.
+        If background is True, build them on a daemon thread and return immediately;
+        getters called in the meantime wait for the value they need.
+        """
+        if not background:
+            self.get_sample_predictor()
+        elif self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(target=self.get_sample_predictor, daemon=True)
+            self._warm_up_thread.start()
+
+
+if __name__ == "__main__":
+    # python_ta is only needed to check this file, so it is not imported along with the module
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['os', 'threading', 'typing', 'python_ta', 'Constants', 'create_usable_data',
+                          'generate_sample_user_graph', 'graph_container', 'predict_from_data', 'similarity_table',
+                          'sparse_graph'],
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120
+    })
@@ -0,0 +1,126 @@
+"""
+This file runs the slow computations of the interfaces on a worker thread and hands their
+results back to the Tk event loop, so the window keeps responding while they run
+"""
+import concurrent.futures
+from typing import Any, Callable, Optional
+
+# how often, in milliseconds, the event loop checks whether the computation has finished
+POLL_INTERVAL = 50
+
+
+class Background_Runner:
+    """
+    Runs computations for a Tk window on a worker thread, one at a time.
+
+    Submitting a computation cancels the one submitted before it: if that one has not
+    started it never runs, and if it has, its result is discarded when it finishes.
+    Results are delivered from the event loop through window.after, since Tk widgets
+    must only be used from the thread running the event loop. The methods of this class
+    must be called from that thread too.
+
+    Instance Attributes:
+        - window: the Tk widget whose event loop the results are delivered on
+        - on_busy: if not None, called with True when a computation is submitted while
+          none is running and with False when the latest one finishes
+    """
+    window: Any
+    on_busy: Optional[Callable[[bool], None]]
+    # Private Instance Attributes:
+    #   - _executor: the pool of worker threads the computations run on
+    #   - _future: the future of the latest computation, or None if it has finished or was cancelled
+    #   - _generation: the number of computations submitted or cancelled so far,
+    #     used to recognise the results of stale ones
+    _executor: concurrent.futures.ThreadPoolExecutor
+    _future: Optional[concurrent.futures.Future]
+    _generation: int
+
+    def __init__(self, window: Any, on_busy: Optional[Callable[[bool], None]] = None) -> None:
+        """
+        Initialize a new runner for the given window. The worker thread is started
+        the first time a computation is submitted.
+        """
+        self.window = window
+        self.on_busy = on_busy
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._future = None
+        self._generation = 0
+
+    def busy(self) -> bool:
+        """
+        Return whether a computation that has not been cancelled is still running or waiting to run
+        """
+        return self._future is not None
+
+    def submit(self, compute: Callable[[], Any], on_done: Callable[[Any], None],
+               on_error: Optional[Callable[[Exception], None]] = None) -> None:
+        """
+        Cancel the current computation and run compute() on the worker thread. When it
+        returns, on_done is called on the event loop with its result; if it raises an
+        Exception, on_error is called with it instead, or the exception is re-raised on
+        the event loop if on_error is None.
+
+        compute must not use any Tk widget, so read what it needs from them before submitting.
+        """
+        was_busy = self._cancel_future()
+        self._generation += 1
+        self._future = self._executor.submit(compute)
+        if not was_busy and self.on_busy is not None:
+            self.on_busy(True)
+        self.window.after(POLL_INTERVAL, self._poll, self._generation, on_done, on_error)
+
+    def cancel(self) -> None:
+        """
+        Cancel the current computation, if any, so its result is never delivered
+        """
+        if self._cancel_future():
+            self._generation += 1
+            if self.on_busy is not None:
+                self.on_busy(False)
+
+    def _cancel_future(self) -> bool:
+        """
+        Stop the current computation from starting if it has not started yet, forget it,
+        and return whether there was one
+        """
+        if self._future is None:
+            return False
+        self._future.cancel()
+        self._future = None
+        return True
+
+    def _poll(self, generation: int, on_done: Callable[[Any], None],
+              on_error: Optional[Callable[[Exception], None]]) -> None:
+        """
+        Deliver the result of the computation of the given generation if it has finished,
+        or check again after POLL_INTERVAL. Do nothing if it has been cancelled since.
+        """
+        if generation != self._generation:
+            return
+        if not self._future.done():
+            self.window.after(POLL_INTERVAL, self._poll, generation, on_done, on_error)
+            return
+
+        future = self._future
+        self._future = None
+        if self.on_busy is not None:
+            self.on_busy(False)
+
+        error = future.exception()
+        if error is None:
+            on_done(future.result())
+        elif on_error is not None:
+            on_error(error)
+        else:
+            raise error
+
+
+if __name__ == "__main__":
+    # python_ta is only needed to check this file, so it is not imported along with the module
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['concurrent.futures', 'typing', 'python_ta'],
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120
+    })
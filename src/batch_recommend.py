@@ -0,0 +1,178 @@
+"""
+This file computes the similar restaurants recommendation for every row of a seed file
+and writes the results as JSON Lines, so recommendations can be made in bulk
+
+Each row of the seed file is a csv row of favourite restaurant names. Each output line is a
+JSON object holding the row's names under "restaurants" and either the fields of
+recommendations.SIMILAR_FIELDS or, if a name is unknown, an "error".
+Output lines are in the same order as the seed rows.
+
+Run this file to process a seed file; pass --help for its options.
+"""
+import argparse
+import collections
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from typing import Iterable, Iterator, Optional, TextIO
+
+import Constants
+import app_context
+import recommendations
+
+# the default number of seed rows computed together by one process
+DEFAULT_CHUNK_SIZE = 256
+
+
+def read_seeds(lines: Iterable[str]) -> Iterator[list[str]]:
+    """
+    Yield the restaurant names of each csv row of lines that has any, one row at a time,
+    with the whitespace around each name removed
+    """
+    for row in csv.reader(lines):
+        names = [name.strip() for name in row if name.strip()]
+        if names:
+            yield names
+
+
+def chunks(seeds: Iterable[list[str]], chunk_size: int) -> Iterator[list[list[str]]]:
+    """
+    Yield consecutive lists of at most chunk_size seed rows, reading seeds only as far as needed
+
+    Preconditions:
+        - chunk_size >= 1
+    """
+    seeds = iter(seeds)
+    chunk = list(itertools.islice(seeds, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(seeds, chunk_size))
+
+
+def recommend_chunk(context: app_context.App_Context, chunk: list[list[str]],
+                    weight_map: dict[str, int]) -> list[str]:
+    """
+    Return the JSON line of each seed row in chunk, scoring the rows whose names are all
+    known in one batch
+    """
+    usable_data = context.get_usable_data()
+    valid = [names for names in chunk if all(name in usable_data for name in names)]
+    results = iter(recommendations.similar_restaurants_batch(context, valid, weight_map))
+
+    lines = []
+    for names in chunk:
+        unknown = [name for name in names if name not in usable_data]
+        if unknown:
+            record = {'restaurants': names, 'error': f'unknown restaurant {unknown[0]}'}
+        else:
+            record = {'restaurants': names, **dict(zip(recommendations.SIMILAR_FIELDS, next(results)))}
+        lines.append(json.dumps(record))
+    return lines
+
+
+def recommend_all(context: app_context.App_Context, seeds: Iterable[list[str]], output: TextIO,
+                  weight_map: dict[str, int], processes: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Write the JSON line of every seed row in seeds to output, in order, and return the
+    number of rows written.
+
+    If processes > 1, chunks of chunk_size rows are computed in a pool of that many
+    processes. The sample graph of context is saved once and every process memory-maps
+    the saved file, so they all share one copy of it. At most two chunks per process are
+    read ahead of the output, so memory stays bounded however long seeds is.
+
+    Preconditions:
+        - processes >= 1
+        - chunk_size >= 1
+    """
+    written = 0
+    if processes == 1:
+        for chunk in chunks(seeds, chunk_size):
+            output.writelines(line + '\n' for line in recommend_chunk(context, chunk, weight_map))
+            written += len(chunk)
+        return written
+
+    with tempfile.TemporaryDirectory() as directory:
+        graph_file = os.path.join(directory, 'sample_graph')
+        context.get_sample_graph().save(graph_file)
+        # make sure the snapshot of the usable data exists before the processes read it
+        context.get_usable_data()
+        settings = (context.input_file, context.number_rows, context.weight_map, context.table_dir, graph_file)
+
+        with multiprocessing.Pool(processes, _init_worker, settings) as pool:
+            pending = collections.deque()
+            for chunk in chunks(seeds, chunk_size):
+                pending.append(pool.apply_async(_recommend_chunk, (chunk, weight_map)))
+                if len(pending) >= 2 * processes:
+                    written += _write_lines(output, pending.popleft().get())
+            while pending:
+                written += _write_lines(output, pending.popleft().get())
+
+    return written
+
+
+def _write_lines(output: TextIO, lines: list[str]) -> int:
+    """
+    Write lines to output, one per line, and return how many there were
+    """
+    output.writelines(line + '\n' for line in lines)
+    return len(lines)
+
+
+# the context _recommend_chunk uses in each process, set by _init_worker
+_worker_context: Optional[app_context.App_Context] = None
+
+
+def _init_worker(input_file: str, number_rows: int, weight_map: dict[str, int], table_dir: Optional[str],
+                 graph_file: str) -> None:
+    """
+    Create the context this process computes recommendations from
+    """
+    global _worker_context
+    _worker_context = app_context.App_Context(input_file, number_rows, weight_map, table_dir, graph_file)
+
+
+def _recommend_chunk(chunk: list[list[str]], weight_map: dict[str, int]) -> list[str]:
+    """
+    Return recommend_chunk for this process's context
+    """
+    return recommend_chunk(_worker_context, chunk, weight_map)
+
+
+if __name__ == "__main__":
+    import main
+
+    parser = argparse.ArgumentParser(description='Write similar restaurants for every row of a seed file '
+                                                 'as JSON Lines.')
+    parser.add_argument('seeds', help="the csv file of favourite restaurant names, one set per row, or - for stdin")
+    parser.add_argument('-o', '--output', default='-', help='the file to write to, or - for stdout')
+    parser.add_argument('--input', default=main.input_file, help='the csv file to read restaurants from')
+    parser.add_argument('--rows', type=int, default=main.number_rows, help='the number of rows to read')
+    parser.add_argument('--table-dir', default=main.table_dir, help='the directory of similarity tables')
+    parser.add_argument('--processes', type=int, default=1, help='the number of processes to compute in')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='the number of seed rows each process computes at once')
+    for parameter, category in [('location', Constants.LOCATION), ('price', Constants.APPROX_COST),
+                                ('cuisines', Constants.CUISINES), ('rest-type', Constants.REST_TYPE)]:
+        parser.add_argument(f'--{parameter}', type=int, default=main.wm[category], choices=range(0, 11),
+                            metavar='0-10', help=f'the priority of {category}')
+    args = parser.parse_args()
+
+    priorities = {Constants.LOCATION: args.location, Constants.APPROX_COST: args.price,
+                  Constants.CUISINES: args.cuisines, Constants.REST_TYPE: args.rest_type}
+    batch_context = app_context.App_Context(args.input, args.rows, main.wm, args.table_dir)
+
+    seed_file = sys.stdin if args.seeds == '-' else open(args.seeds, newline='', encoding='utf-8')
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        count = recommend_all(batch_context, read_seeds(seed_file), output_file, priorities,
+                              args.processes, args.chunk_size)
+    finally:
+        for file in (seed_file, output_file):
+            if file not in (sys.stdin, sys.stdout):
+                file.close()
+    print(f'wrote {count} recommendations', file=sys.stderr)
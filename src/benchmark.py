@@ -0,0 +1,192 @@
+"""
+This file benchmarks the main stages of the project on synthetic data, writing the wall time
+and peak memory of each stage as JSON that can be compared against a stored baseline
+
+The stages are, for each data size:
+    - select_valid_rows: reading and validating every row of the csv file
+    - create_graph: building the restaurant graph from the valid rows
+    - cosine_similarity: scoring PAIRS_PER_RUN random pairs of restaurants with Graph.get_similarity_score
+    - generate_from_similarity_scores: finding the most similar restaurants to SEEDS_PER_RUN
+      random restaurants, with the pairwise and the sparse backend and without a cache
+Times are the fastest of --repeat runs. Peak memory is measured in one more run under
+tracemalloc, which slows code down, so it never affects the times.
+
+Run this file to benchmark; pass --help for its options. The baseline stored beside this file
+was recorded with: python benchmark.py --sizes 1k,10k,50k --output benchmark_baseline.json
+Times depend on the machine, so record a new baseline the same way before comparing on another one.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Optional
+
+import create_usable_data
+import graph_container
+import main
+import predict_from_data
+import synthetic_data
+import Constants
+
+# the sizes benchmarked by default, from the size of a quick check to ten times the real data
+DEFAULT_SIZES = ['1k', '10k', '50k', '500k']
+
+# the number of restaurant pairs scored and seed restaurants queried per run
+PAIRS_PER_RUN = 2000
+SEEDS_PER_RUN = 20
+
+# the stored baseline, and how much slower or larger than it a stage may be before it is reported;
+# a single run (--repeat 1) is compared against the fastest of the baseline's runs, so the
+# tolerance leaves room for the spread between runs, while a stage that doubles is still caught
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+DEFAULT_TOLERANCE = 0.5
+
+# the noise margin of each metric: a measurement is only reported as regressed when it also exceeds
+# the baseline by at least this much, since stages taking a few milliseconds vary by more than
+# the tolerance from run to run on the same machine
+MIN_REGRESSION = {'seconds': 0.05, 'peak_bytes': 64 * 1024}
+
+
+def measure(stage: Callable[[], Any], repeat: int) -> dict[str, float]:
+    """
+    Return the fastest wall time in seconds of repeat calls to stage, and the peak memory
+    in bytes allocated during one more call
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        stage()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'peak_bytes': peak}
+
+
+def benchmark_size(csv_file: str, repeat: int, seed: int = 0) -> dict[str, dict[str, float]]:
+    """
+    Return the measurements of every stage on the given csv file
+    """
+    results = {'select_valid_rows': measure(lambda: create_usable_data.select_valid_rows(csv_file, sys.maxsize),
+                                            repeat)}
+    usable_data = create_usable_data.select_valid_rows(csv_file, sys.maxsize)
+
+    results['create_graph'] = measure(lambda: create_usable_data.create_graph(usable_data, main.wm,
+                                                                              graph_container.Graph()), repeat)
+    graph = create_usable_data.create_graph(usable_data, main.wm, graph_container.Graph())
+
+    rng = random.Random(seed)
+    names = sorted(usable_data)
+    pairs = [(rng.choice(names), rng.choice(names)) for _ in range(PAIRS_PER_RUN)]
+    seeds = rng.sample(names, min(SEEDS_PER_RUN, len(names)))
+    results['cosine_similarity'] = measure(lambda: [graph.get_similarity_score(a, b) for a, b in pairs], repeat)
+
+    for backend, use_sparse in [('pairwise', False), ('sparse', True)]:
+        predictor = predict_from_data.Similarity_Computations(graph, use_sparse, cache_size=0)
+        if use_sparse:
+            # compiling is a one-off cost, so it is not part of the query time
+            predictor.compile_sparse(Constants.RESTAURANT)
+        results[f'generate_from_similarity_scores[{backend}]'] = measure(
+            lambda: [predictor.generate_from_similarity_scores(name, Constants.RESTAURANT, main.wm)
+                     for name in seeds], repeat)
+
+    return results
+
+
+def run(sizes: list[str], data_dir: str, repeat: int) -> dict:
+    """
+    Return the report of benchmarking every size, generating the synthetic csv file of
+    each size in data_dir unless it is already there
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    report = {'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                              'processor': platform.processor(), 'cpus': os.cpu_count()},
+              'repeat': repeat, 'results': {}}
+    for size in sizes:
+        csv_file = os.path.join(data_dir, f'zomato_{size}.csv')
+        if not os.path.exists(csv_file):
+            print(f'generating {csv_file}', file=sys.stderr)
+            write_atomically(csv_file, synthetic_data.parse_size(size))
+        print(f'benchmarking {size}', file=sys.stderr)
+        report['results'][size] = benchmark_size(csv_file, repeat)
+    return report
+
+
+def write_atomically(csv_file: str, num_rows: int) -> None:
+    """
+    Write the synthetic csv file of num_rows rows to csv_file, so that an interrupted
+    run never leaves a partial file behind to be benchmarked later
+    """
+    partial = csv_file + '.partial'
+    synthetic_data.write_synthetic_csv(partial, num_rows)
+    os.replace(partial, csv_file)
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """
+    Return one entry for every measurement of report that is also in baseline, giving both
+    values, their ratio and whether the report is worse than the baseline by more than tolerance
+    and by more than the noise margin of the metric in MIN_REGRESSION
+    """
+    comparisons = []
+    for size, stages in report['results'].items():
+        for stage, measurements in stages.items():
+            base = baseline.get('results', {}).get(size, {}).get(stage)
+            if base is None:
+                continue
+            for metric, value in measurements.items():
+                if base.get(metric):
+                    ratio = value / base[metric]
+                    comparisons.append({'size': size, 'stage': stage, 'metric': metric, 'value': value,
+                                        'baseline': base[metric], 'ratio': ratio,
+                                        'regressed': ratio > 1 + tolerance
+                                        and value - base[metric] > MIN_REGRESSION.get(metric, 0)})
+    return comparisons
+
+
+def load_baseline(path: str) -> Optional[dict]:
+    """
+    Return the report stored at path, or None if there is no file there
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the project on synthetic zomato-shaped data.')
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES), help='comma separated row counts, like 1k,10k')
+    parser.add_argument('--data-dir', default='benchmark_data', help='where the synthetic csv files are kept')
+    parser.add_argument('--repeat', type=int, default=3, help='the number of timed runs of each stage')
+    parser.add_argument('--output', default='benchmark_report.json', help='the file the report is written to')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='the report to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='the fraction by which a measurement may exceed the baseline, '
+                             'on top of the noise margin of its metric')
+    args = parser.parse_args()
+
+    benchmark_report = run([size.strip() for size in args.sizes.split(',')], args.data_dir, args.repeat)
+    stored_baseline = load_baseline(args.baseline) if os.path.abspath(args.baseline) != os.path.abspath(
+        args.output) else None
+    if stored_baseline is not None:
+        benchmark_report['comparison'] = compare(benchmark_report, stored_baseline, args.tolerance)
+
+    with open(args.output, 'w', encoding='utf-8') as output:
+        json.dump(benchmark_report, output, indent=2)
+
+    for entry in benchmark_report.get('comparison', []):
+        flag = 'REGRESSED' if entry['regressed'] else 'ok'
+        print(f"{entry['size']:>5} {entry['stage']:<45} {entry['metric']:<10} x{entry['ratio']:.2f} {flag}")
+    sys.exit(1 if any(entry['regressed'] for entry in benchmark_report.get('comparison', [])) else 0)
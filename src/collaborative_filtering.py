@@ -0,0 +1,511 @@
+"""
+This file predicts how much users will like the restaurants they have not visited with
+collaborative filtering, from a graph connecting users to the restaurants they have rated,
+like the ones generate_sample_user_graph creates
+
+User_Based_CF predicts a user's rating of a restaurant as their mean rating plus the
+mean-centred ratings of the restaurant by their most similar users, weighted by similarity.
+Similarity is the cosine similarity of Graph.get_similarity_score. Users are handled in
+blocks: the similarities between a block and every user are one sparse matrix product, and
+the predictions for the block are two more, so recommending for all users never needs more
+than one block of dense scores in memory.
+
+Item_Based_CF instead keeps the most similar restaurants of every restaurant, by the cosine
+similarity of their ratings, and predicts a user's rating of a restaurant as the average of
+the user's ratings of the restaurants it is similar to. There are far fewer restaurants than
+users, so these neighbourhoods are computed once and then kept up to date one rating at a
+time, and recommending for a user only reads the neighbourhoods of the restaurants they rated.
+"""
+from typing import Any, Iterator
+
+import numpy as np
+from scipy import sparse
+
+import Constants
+import instrumentation
+from graph_container import Graph
+from sparse_graph import Sparse_Graph
+
+# the default number of most similar users a prediction is made from
+DEFAULT_NEIGHBOURS = 20
+
+# the most dense scores held at once for a block of users, which bounds the memory used per block
+BLOCK_ENTRIES = 1 << 22
+
+# the default number of most similar restaurants kept for each restaurant
+DEFAULT_ITEM_NEIGHBOURS = 20
+
+# the most changed co-rating products Item_Based_CF keeps aside before merging them into its sparse matrix
+MAX_PENDING_PRODUCTS = 1 << 18
+
+# the range of the ratings in a user graph, which predictions are clipped to
+MIN_RATING = 1
+MAX_RATING = 10
+
+
+class User_Based_CF:
+    """
+    A snapshot of the ratings in a user graph, recommending restaurants to its users.
+    Later changes to the graph are not reflected in the recommendations.
+
+    Instance Attributes:
+        - num_neighbours: the number of most similar users each prediction is made from
+        - ratings: the users (as rows) and restaurants (as columns) of the graph, with the
+          weight of each edge as the rating
+        - means: the mean rating of each user, in row order
+
+    Private Instance Attributes:
+        - _normalized: the ratings with every row divided by its norm, so that the product
+          of two rows is the cosine similarity of their users
+        - _centred: the ratings with the mean of every row subtracted from its entries
+        - _rated: 1 for every rating, 0 elsewhere
+        - _column_ranks: the position of each restaurant when the restaurants are sorted,
+          used to break ties between equal predictions by name
+    """
+    num_neighbours: int
+    ratings: Sparse_Graph
+    means: np.ndarray
+    _normalized: sparse.csr_matrix
+    _centred: sparse.csr_matrix
+    _rated: sparse.csr_matrix
+    _column_ranks: np.ndarray
+
+    def __init__(self, graph: Graph, num_neighbours: int = DEFAULT_NEIGHBOURS) -> None:
+        """
+        Compile the ratings of the users in graph.
+
+        Preconditions:
+            - num_neighbours >= 1
+            - every neighbour of a user in graph is a restaurant
+        """
+        self.num_neighbours = num_neighbours
+        self.ratings = Sparse_Graph(graph, Constants.USER)
+
+        matrix = self.ratings.matrix
+        counts = np.diff(matrix.indptr)
+        self.means = np.divide(np.asarray(matrix.sum(axis=1)).ravel(), counts, out=np.zeros(len(counts)),
+                               where=counts != 0)
+        inverse_norms = np.divide(1, self.ratings.norms, out=np.zeros_like(self.ratings.norms),
+                                  where=self.ratings.norms != 0)
+        self._normalized = sparse.diags(inverse_norms) @ matrix
+        self._centred = sparse.csr_matrix((matrix.data - np.repeat(self.means, counts), matrix.indices,
+                                           matrix.indptr), shape=matrix.shape)
+        self._rated = sparse.csr_matrix((np.ones(matrix.nnz), matrix.indices, matrix.indptr), shape=matrix.shape)
+        self._column_ranks = np.empty(len(self.ratings.columns), dtype=np.int64)
+        self._column_ranks[sorted(range(len(self.ratings.columns)), key=self.ratings.columns.__getitem__)] = \
+            np.arange(len(self.ratings.columns))
+
+    def recommend(self, user: Any, n: int = 10) -> list[tuple[Any, float]]:
+        """
+        Return the n restaurants user has not rated with the highest predicted ratings,
+        as (restaurant, predicted rating) pairs from highest to lowest. Equal predictions
+        are ordered by restaurant. Restaurants none of the user's neighbours have rated
+        have no prediction and are never recommended, so there may be fewer than n.
+        Raise ValueError if user is not a user of the graph.
+
+        Preconditions:
+            - n >= 0
+        """
+        return self.recommend_batch([user], n)[0]
+
+    def recommend_batch(self, users: list, n: int = 10) -> list[list[tuple[Any, float]]]:
+        """
+        Return [self.recommend(user, n) for user in users], computed a block of users at a time.
+        Raise ValueError if a user is not a user of the graph.
+
+        Preconditions:
+            - n >= 0
+        """
+        if any(user not in self.ratings.row_index for user in users):
+            raise ValueError
+
+        rows = np.array([self.ratings.row_index[user] for user in users], dtype=np.int64)
+        results = []
+        block_size = self.block_size()
+        for start in range(0, len(rows), block_size):
+            results.extend(self._recommend_rows(rows[start:start + block_size], n))
+        return results
+
+    def recommend_all(self, n: int = 10) -> Iterator[tuple[Any, list[tuple[Any, float]]]]:
+        """
+        Yield (user, self.recommend(user, n)) for every user of the graph, in the order
+        they were added to it, computing one block of users at a time.
+
+        Preconditions:
+            - n >= 0
+        """
+        block_size = self.block_size()
+        for start in range(0, len(self.ratings.rows), block_size):
+            rows = np.arange(start, min(start + block_size, len(self.ratings.rows)))
+            yield from zip(self.ratings.rows[start:start + block_size], self._recommend_rows(rows, n))
+
+    def predict_ratings(self, users: list) -> np.ndarray:
+        """
+        Return the len(users) x len(self.ratings.columns) array of the predicted rating of each
+        user for each restaurant, in the column order of ratings, with nan where there is no
+        prediction. Restaurants a user has rated are predicted too.
+        Raise ValueError if a user is not a user of the graph.
+        """
+        if any(user not in self.ratings.row_index for user in users):
+            raise ValueError
+        rows = np.array([self.ratings.row_index[user] for user in users], dtype=np.int64)
+        return self._predict_rows(rows)
+
+    def neighbours(self, rows: np.ndarray) -> sparse.csr_matrix:
+        """
+        Return the len(rows) x len(self.ratings.rows) matrix holding, in row i, the similarity
+        of user rows[i] to each of its num_neighbours most similar other users. Users with a
+        similarity of 0 are never neighbours, and equal similarities are ordered by user.
+        """
+        with instrumentation.stage('similarity_scan'):
+            scores = (self._normalized[rows] @ self._normalized.T).toarray()
+        instrumentation.count('similarity_evaluations', scores.size)
+        scores[np.arange(len(rows)), rows] = 0
+
+        with instrumentation.stage('ranking'):
+            block_rows, columns = _top_n_per_row(scores, self.num_neighbours, self.ratings.name_ranks)
+        return sparse.csr_matrix((scores[block_rows, columns], (block_rows, columns)), shape=scores.shape)
+
+    def block_size(self) -> int:
+        """
+        Return the number of users handled together, so that a block never holds more
+        than BLOCK_ENTRIES dense scores
+        """
+        return max(1, BLOCK_ENTRIES // max(1, len(self.ratings.rows), len(self.ratings.columns)))
+
+    def _predict_rows(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Return predict_ratings for the users in the given rows
+        """
+        weights = self.neighbours(rows)
+        with instrumentation.stage('cf_prediction'):
+            deviations = (weights @ self._centred).toarray()
+            totals = (weights @ self._rated).toarray()
+            predictions = np.full(deviations.shape, np.nan)
+            np.divide(deviations, totals, out=predictions, where=totals > 0)
+            predictions += self.means[rows, np.newaxis]
+        return np.clip(predictions, MIN_RATING, MAX_RATING)
+
+    def _recommend_rows(self, rows: np.ndarray, n: int) -> list[list[tuple[Any, float]]]:
+        """
+        Return the recommendations for the users in the given rows
+        """
+        predictions = self._predict_rows(rows)
+        predictions[self._rated[rows].toarray() > 0] = np.nan
+        predictions = np.nan_to_num(predictions, nan=0)
+
+        with instrumentation.stage('ranking'):
+            block_rows, columns = _top_n_per_row(predictions, n, self._column_ranks)
+        results = [[] for _ in rows]
+        for i, column in zip(block_rows.tolist(), columns.tolist()):
+            results[i].append((self.ratings.columns[column], float(predictions[i, column])))
+        return results
+
+
+class Item_Based_CF:
+    """
+    The most similar restaurants of every restaurant in a user graph, recommending restaurants
+    to its users. Ratings must be added with add_rating to be reflected in the neighbourhoods.
+
+    Instance Attributes:
+        - graph: the user graph the ratings are read from
+        - version: the version of graph the neighbourhoods are up to date with
+        - num_neighbours: the number of most similar restaurants kept for each restaurant
+        - restaurants: the restaurants of the graph, in the order they were added to it
+        - restaurant_index: mapping from each restaurant to its position in restaurants
+        - neighbours: row i holds the positions of the most similar restaurants to restaurants[i],
+          from most to least similar, followed by -1 where it has fewer than num_neighbours
+        - neighbour_scores: row i holds the similarity of each restaurant in neighbours[i],
+          and 0 after the last one
+
+    Private Instance Attributes:
+        - _dots: the sum over all users of the product of their ratings of each pair of
+          different restaurants, as a sparse matrix with an entry for each pair some user
+          rated both of, not counting the changes in _pending
+        - _pending: mapping from i to a mapping from j to the change in the co-rating product
+          of restaurants i and j since it was last merged into _dots, holding both (i, j) and (j, i)
+        - _num_pending: the number of entries in the mappings of _pending
+        - _sq_norms: the sum of the squared ratings of each restaurant
+        - _name_ranks: the position of each restaurant when the restaurants are sorted,
+          used to break ties between equal scores by name
+
+    Representation Invariants:
+        - self.neighbours.shape == self.neighbour_scores.shape == (len(self.restaurants), self.num_neighbours)
+    """
+    graph: Graph
+    version: int
+    num_neighbours: int
+    restaurants: list
+    restaurant_index: dict[Any, int]
+    neighbours: np.ndarray
+    neighbour_scores: np.ndarray
+    _dots: sparse.csr_matrix
+    _pending: dict[int, dict[int, float]]
+    _num_pending: int
+    _sq_norms: np.ndarray
+    _name_ranks: np.ndarray
+
+    def __init__(self, graph: Graph, num_neighbours: int = DEFAULT_ITEM_NEIGHBOURS) -> None:
+        """
+        Compute the most similar restaurants of every restaurant in graph.
+
+        The co-rating products are held as a sparse matrix, so memory grows with the number
+        of pairs of restaurants some user rated both of rather than with the square of the
+        number of restaurants, and the neighbourhoods are computed a block of restaurants at a time.
+
+        Preconditions:
+            - num_neighbours >= 1
+            - every neighbour of a restaurant in graph is a user
+        """
+        self.graph = graph
+        self.version = graph.version
+        self.num_neighbours = num_neighbours
+        ratings = Sparse_Graph(graph, Constants.RESTAURANT)
+        self.restaurants = ratings.rows
+        self.restaurant_index = ratings.row_index
+        self._name_ranks = ratings.name_ranks
+
+        with instrumentation.stage('similarity_scan'):
+            dots = (ratings.matrix @ ratings.matrix.T).tocsr()
+            self._sq_norms = dots.diagonal()
+            self._dots = (dots - sparse.diags(self._sq_norms, format='csr')).tocsr()
+            self._dots.eliminate_zeros()
+        instrumentation.count('similarity_evaluations', self._dots.nnz)
+        self._pending = {}
+        self._num_pending = 0
+
+        size = len(self.restaurants)
+        self.neighbours = np.full((size, num_neighbours), -1, dtype=np.int64)
+        self.neighbour_scores = np.zeros((size, num_neighbours))
+        block_size = max(1, BLOCK_ENTRIES // max(1, size))
+        for start in range(0, size, block_size):
+            self._refresh_rows(np.arange(start, min(start + block_size, size)))
+
+    def similar_restaurants(self, restaurant: Any) -> list[tuple[Any, float]]:
+        """
+        Return the most similar restaurants to restaurant as (restaurant, score) pairs,
+        from most to least similar.
+        Raise ValueError if restaurant is not a restaurant of the graph.
+        """
+        if restaurant not in self.restaurant_index:
+            raise ValueError
+        i = self.restaurant_index[restaurant]
+        return [(self.restaurants[j], float(score))
+                for j, score in zip(self.neighbours[i].tolist(), self.neighbour_scores[i].tolist()) if j != -1]
+
+    def recommend(self, user: Any, n: int = 10) -> list[tuple[Any, float]]:
+        """
+        Return the n restaurants user has not rated with the highest predicted ratings, as
+        (restaurant, predicted rating) pairs from highest to lowest, with equal predictions
+        ordered by restaurant.
+
+        A restaurant is predicted the average of the user's ratings of the restaurants it is
+        among the most similar restaurants of, weighted by similarity, so this takes time
+        proportional to the number of restaurants user rated times num_neighbours. Restaurants
+        that are not among the most similar restaurants of any restaurant user rated are never
+        recommended, so there may be fewer than n.
+        Raise ValueError if user is not a user of the graph.
+
+        Preconditions:
+            - n >= 0
+        """
+        if user not in self.graph.get_all_vertices(Constants.USER):
+            raise ValueError
+
+        rated = self.graph.get_edges(user)
+        rows = np.array([self.restaurant_index[restaurant] for restaurant in rated], dtype=np.int64)
+        ratings = np.array(list(rated.values()))
+        candidates = self.neighbours[rows].ravel()
+        scores = self.neighbour_scores[rows].ravel()
+        valid = candidates != -1
+        candidates, scores = candidates[valid], scores[valid]
+        candidate_ratings = np.repeat(ratings, self.num_neighbours)[valid]
+
+        # sum the weighted ratings of each distinct candidate, touching only the entries read
+        ids, inverse = np.unique(candidates, return_inverse=True)
+        totals = np.bincount(inverse, weights=scores, minlength=len(ids))
+        predictions = np.bincount(inverse, weights=scores * candidate_ratings, minlength=len(ids)) / totals
+        unrated = ~np.isin(ids, rows)
+        ids, predictions = ids[unrated], predictions[unrated]
+
+        order = np.lexsort((self._name_ranks[ids], -predictions))[:n]
+        return [(self.restaurants[i], float(predictions[j])) for i, j in zip(ids[order].tolist(), order.tolist())]
+
+    def recommend_batch(self, users: list, n: int = 10) -> list[list[tuple[Any, float]]]:
+        """
+        Return [self.recommend(user, n) for user in users].
+        Raise ValueError if a user is not a user of the graph.
+
+        Preconditions:
+            - n >= 0
+        """
+        return [self.recommend(user, n) for user in users]
+
+    def add_rating(self, user: Any, restaurant: Any, rating: float) -> None:
+        """
+        Set user's rating of restaurant in the graph, adding user if it is not in the graph yet,
+        and update the neighbourhoods the change affects.
+
+        Changing one rating only changes the co-rating products of restaurant with the other
+        restaurants user rated, and the norm of restaurant, so only the similarities between
+        restaurant and the restaurants it is co-rated with change. Each neighbourhood holding
+        restaurant, or that restaurant now belongs in, is updated in place; a neighbourhood is
+        only computed again if restaurant drops to its bottom and might be overtaken.
+        Raise ValueError if restaurant is not a restaurant of the graph; restaurants can only
+        be added by building a new Item_Based_CF.
+
+        Preconditions:
+            - self.version == self.graph.version
+            - MIN_RATING <= rating <= MAX_RATING
+        """
+        if restaurant not in self.restaurant_index:
+            raise ValueError
+
+        self.graph.add_vertex(user, Constants.USER)
+        rated = self.graph.get_edges(user)
+        old_rating = rated.pop(restaurant, 0)
+        self.graph.add_edge(user, restaurant, rating)
+        self.version = self.graph.version
+
+        i = self.restaurant_index[restaurant]
+        # use the stored 32-bit rating so the products match a model built from the graph
+        change = self.graph.get_weight(user, restaurant) - old_rating
+        row = self._pending.setdefault(i, {})
+        for other, other_rating in rated.items():
+            j = self.restaurant_index[other]
+            if j not in row:
+                self._num_pending += 2
+            row[j] = row.get(j, 0.0) + change * other_rating
+            self._pending.setdefault(j, {})[i] = row[j]
+        self._sq_norms[i] += change * (2 * old_rating + change)
+        if self._num_pending > MAX_PENDING_PRODUCTS:
+            self._merge_pending()
+        self._update_column(i)
+
+    def _merge_pending(self) -> None:
+        """
+        Add the changes in _pending to _dots and empty _pending
+        """
+        rows, columns, changes = [], [], []
+        for i, row in self._pending.items():
+            rows.extend([i] * len(row))
+            columns.extend(row)
+            changes.extend(row.values())
+        self._dots = (self._dots + sparse.csr_matrix((changes, (rows, columns)), shape=self._dots.shape)).tocsr()
+        self._pending = {}
+        self._num_pending = 0
+
+    def _dot_rows(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Return the len(rows) x len(restaurants) dense array of the co-rating products of the
+        restaurants in rows with every other restaurant, with 0 between a restaurant and itself
+        """
+        dots = self._dots[rows].toarray()
+        for k, i in enumerate(rows.tolist()):
+            row = self._pending.get(i)
+            if row:
+                dots[k, list(row)] += list(row.values())
+        return dots
+
+    def _similarities(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Return the len(rows) x len(restaurants) array of the cosine similarity between the
+        restaurants in rows and every restaurant, with 0 between a restaurant and itself
+        """
+        norms = np.sqrt(self._sq_norms)
+        denominators = np.outer(norms[rows], norms)
+        return np.divide(self._dot_rows(rows), denominators, out=np.zeros(denominators.shape),
+                         where=denominators != 0)
+
+    def _refresh_rows(self, rows: np.ndarray) -> None:
+        """
+        Compute the neighbourhoods of the restaurants in rows again from the co-rating products
+        """
+        self._set_rows(rows, self._similarities(rows))
+
+    def _set_rows(self, rows: np.ndarray, scores: np.ndarray) -> None:
+        """
+        Set the neighbourhoods of the restaurants in rows from scores, their rows of _similarities
+        """
+        with instrumentation.stage('ranking'):
+            block_rows, columns = _top_n_per_row(scores, self.num_neighbours, self._name_ranks)
+        positions = np.arange(len(block_rows)) - np.searchsorted(block_rows, block_rows)
+        self.neighbours[rows] = -1
+        self.neighbour_scores[rows] = 0
+        self.neighbours[rows[block_rows], positions] = columns
+        self.neighbour_scores[rows[block_rows], positions] = scores[block_rows, columns]
+
+    def _update_column(self, i: int) -> None:
+        """
+        Update every neighbourhood after the similarities between restaurant i and the
+        other restaurants have changed
+        """
+        row = np.array([i])
+        scores = self._similarities(row)
+        self._set_rows(row, scores)
+        scores = scores[0]
+
+        holding, positions = np.nonzero(self.neighbours == i)
+        full = self.neighbours[holding, -1] != -1
+        dropped = (scores[holding] <= 0) | (full & (scores[holding] < self.neighbour_scores[holding, positions]))
+        self._refresh_rows(holding[dropped])
+        self.neighbour_scores[holding[~dropped], positions[~dropped]] = scores[holding[~dropped]]
+
+        # rows whose last neighbour restaurant i now beats, or that have room for it
+        last = self.neighbours[:, -1]
+        last_ranks = np.where(last != -1, self._name_ranks[last], len(self.restaurants))
+        beats = (scores > self.neighbour_scores[:, -1]) | (
+            (scores == self.neighbour_scores[:, -1]) & (self._name_ranks[i] < last_ranks))
+        joining = np.flatnonzero(beats & (scores > 0))
+        joining = joining[(joining != i) & ~np.isin(joining, holding)]
+        self.neighbours[joining, -1] = i
+        self.neighbour_scores[joining, -1] = scores[joining]
+
+        for row in np.concatenate([holding[~dropped], joining]).tolist():
+            self._sort_row(row)
+
+    def _sort_row(self, row: int) -> None:
+        """
+        Sort the neighbourhood of the restaurant in row from most to least similar,
+        with equal scores ordered by name and empty places last
+        """
+        entries = self.neighbours[row]
+        ranks = np.where(entries != -1, self._name_ranks[entries], len(self.restaurants))
+        order = np.lexsort((ranks, -self.neighbour_scores[row]))
+        self.neighbours[row] = entries[order]
+        self.neighbour_scores[row] = self.neighbour_scores[row][order]
+
+
+def _top_n_per_row(scores: np.ndarray, n: int, ranks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the row and column of the n highest positive scores in each row of scores,
+    ordered by row and then from highest to lowest score, with equal scores ordered by the
+    rank of their column.
+
+    Preconditions:
+        - n >= 0
+        - ranks.shape == (scores.shape[1],)
+    """
+    n = min(n, scores.shape[1])
+    if n == 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # partition to find the n-th best score of each row, then only sort the entries that reach it
+    thresholds = np.partition(scores, scores.shape[1] - n, axis=1)[:, scores.shape[1] - n]
+    rows, columns = np.nonzero((scores >= thresholds[:, np.newaxis]) & (scores > 0))
+    order = np.lexsort((ranks[columns], -scores[rows, columns], rows))
+    rows, columns = rows[order], columns[order]
+    keep = np.arange(len(rows)) - np.searchsorted(rows, rows) < n
+    return rows[keep], columns[keep]
+
+
+if __name__ == "__main__":
+    # python_ta is only needed to check this file, so it is not imported along with the module
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['typing', 'numpy', 'scipy', 'Constants', 'instrumentation', 'graph_container',
+                          'sparse_graph', 'python_ta'],
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120
+    })
@@ -2,120 +2,551 @@
 This file handles reading the data and creating a graph from a raw csv file
 """
 import csv
+import hashlib
+import itertools
+import mmap
+import multiprocessing
+import os
+import pickle
+import re
 import sys
 from dataclasses import dataclass
-import python_ta
+from typing import Iterable, Iterator, Optional
 import Constants
+import instrumentation
 from graph_container import Graph
 
 csv.field_size_limit(sys.maxsize)
 
+# bump this whenever parsing or the Restaurant dataclass changes, so old snapshots are rebuilt
+LOADER_VERSION = 3
 
-@dataclass
+# the columns of zomato.csv that parse_row reads
+USED_COLUMNS = [2, 3, 4, 5, 8, 9, 11, 12, 15]
+
+# a quoted field, including any escaped ("") quotes inside it
+_QUOTED_FIELD = re.compile(rb'"[^"]*(?:""[^"]*)*"?')
+# the end of a field: the next delimiter or the line ending that ends the record, which like
+# csv.reader on a file opened with newline='' may be \n, \r\n or a bare \r
+_FIELD_END = re.compile(rb',|\r\n?|\n')
+# the number of bytes copied at a time when counting quotes to find record boundaries
+_COUNT_BLOCK = 1 << 20
+
+
+class Vocabulary:
+    """
+    A shared table of the distinct values of one categorical field, so each value is
+    stored once and records refer to it by a small int code.
+
+    Instance Attributes:
+        - names: the values in this vocabulary, where the value with code c is names[c]
+        - codes: mapping from each value to its code
+
+    Representation Invariants:
+        - all(self.codes[name] == code for code, name in enumerate(self.names))
+    """
+    names: list[str]
+    codes: dict[str, int]
+    # Private Instance Attributes:
+    #   - _tuples: mapping from each tuple of codes returned by encode_all to itself,
+    #              so records with the same values share one tuple
+    _tuples: dict[tuple[int, ...], tuple[int, ...]]
+
+    def __init__(self) -> None:
+        """
+        Initialize a new empty vocabulary
+        """
+        self.names = []
+        self.codes = {}
+        self._tuples = {}
+
+    def encode(self, name: str) -> int:
+        """
+        Return the code of name, adding name to this vocabulary if it is new
+        """
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.names.append(sys.intern(name))
+            self.codes[name] = code
+        return code
+
+    def encode_all(self, names: list[str]) -> tuple[int, ...]:
+        """
+        Return the codes of names, in order, as a tuple shared with every other equal result
+        """
+        codes = tuple(self.encode(name) for name in names)
+        return self._tuples.setdefault(codes, codes)
+
+
+# the shared vocabularies of the categorical Restaurant fields
+LOCATIONS = Vocabulary()
+REST_TYPES = Vocabulary()
+CUISINE_TYPES = Vocabulary()
+LISTINGS = Vocabulary()
+
+
+@dataclass(init=False, repr=False, slots=True)
 class Restaurant:
     """
     Data container to hold values of a given restaurant
+
+    The categorical fields are stored as codes into the shared vocabularies
+    LOCATIONS, REST_TYPES, CUISINE_TYPES and LISTINGS. The location, rest_type,
+    cuisines and listed_in properties give their string values.
     """
     online_order: bool
     book_table: bool
     rate: float
-    location: str
-    rest_type: list[str]
-    cuisines: list[str]
+    location_code: int
+    rest_type_codes: tuple[int, ...]
+    cuisine_codes: tuple[int, ...]
     approx_cost: int
-    listed_in: str
+    listed_in_code: int
+
+    def __init__(self, online_order: bool, book_table: bool, rate: float, location: str, rest_type: list[str],
+                 cuisines: list[str], approx_cost: int, listed_in: str) -> None:
+        """
+        Initialize a new restaurant, encoding its categorical fields against the shared vocabularies
+        """
+        self.online_order = online_order
+        self.book_table = book_table
+        self.rate = rate
+        self.location_code = LOCATIONS.encode(location)
+        self.rest_type_codes = REST_TYPES.encode_all(rest_type)
+        self.cuisine_codes = CUISINE_TYPES.encode_all(cuisines)
+        self.approx_cost = approx_cost
+        self.listed_in_code = LISTINGS.encode(listed_in)
 
+    @property
+    def location(self) -> str:
+        """
+        Return the location of this restaurant
+        """
+        return LOCATIONS.names[self.location_code]
 
-def select_valid_rows(input_file, num_rows=5000) -> dict[str, Restaurant]:
+    @property
+    def rest_type(self) -> list[str]:
+        """
+        Return the restaurant types of this restaurant
+        """
+        return [REST_TYPES.names[code] for code in self.rest_type_codes]
+
+    @property
+    def cuisines(self) -> list[str]:
+        """
+        Return the cuisines of this restaurant
+        """
+        return [CUISINE_TYPES.names[code] for code in self.cuisine_codes]
+
+    @property
+    def listed_in(self) -> str:
+        """
+        Return the listing type of this restaurant
+        """
+        return LISTINGS.names[self.listed_in_code]
+
+    def __repr__(self) -> str:
+        """
+        Return a representation of this restaurant showing the string values of its fields
+        """
+        return (f'Restaurant(online_order={self.online_order!r}, book_table={self.book_table!r}, '
+                f'rate={self.rate!r}, location={self.location!r}, rest_type={self.rest_type!r}, '
+                f'cuisines={self.cuisines!r}, approx_cost={self.approx_cost!r}, listed_in={self.listed_in!r})')
+
+    def __reduce__(self) -> tuple:
+        """
+        Pickle this restaurant by its string values, since codes are only meaningful
+        in the process that assigned them. Unpickling encodes them again.
+        """
+        return Restaurant, (self.online_order, self.book_table, self.rate, self.location, self.rest_type,
+                            self.cuisines, self.approx_cost, self.listed_in)
+
+
+def read_rows(input_file: str, num_rows: int = 5000, columns: Optional[list[int]] = None) -> Iterator[list[str]]:
     """
-    Given the large input file of data,
-    select num_rows amount of lines to create a smaller subset of data.
-    Use this smaller subset of data to return dictionary mapping restaurant name
-    to its respective Restaurant dataclass.
+    Yield the first num_rows data rows of the given csv file, skipping its header.
+    The file is read lazily and closed as soon as num_rows rows have been yielded,
+    so the rest of the file is never read.
+
+    If columns is not None, only those columns are decoded: every other field of a
+    yielded row is the empty string, and the long review and menu fields of zomato.csv
+    are skipped over without creating Python strings for them.
     """
-    # Read the original CSV file and store its rows
+    if columns is not None:
+        yield from read_columns(input_file, columns, num_rows)
+        return
+
     with open(input_file, 'r', newline='', encoding='utf-8') as f:
         reader = csv.reader(f)
         next(reader)
-        rows = list(reader)
+        yield from itertools.islice(reader, num_rows)
 
-    selected_rows = rows[:num_rows]
-    created_dict = {}
 
-    for row in selected_rows:
-        name = row[2]
-        online_order = row[3]
-        book_table = row[4]
-        rate = row[5]
-        location = row[8]
-        rest_type = row[9]
-        cuisines = row[11]
-        approx_cost = row[12]
-        listed_in = row[15]
-
-        # Flag to check if all the components are valid
-        valid = True
-
-        if not name or len(name) >= 30:
-            valid = False
-        if online_order and book_table in {"Yes", "No"}:
-            if online_order == "Yes":
-                online_order = True
-            else:
-                online_order = False
+def read_columns(input_file: str, columns: list[int], num_rows: int = 5000) -> Iterator[list[str]]:
+    """
+    Yield the first num_rows data rows of the given csv file, skipping its header and blank lines.
+    Only the fields in the given columns are decoded; every other field is the empty string.
 
-            if book_table == "Yes":
-                book_table = True
+    The file is memory-mapped and scanned for quotes and delimiters, so a skipped field
+    costs a search over its bytes rather than a decoded copy of it.
+    """
+    with open(input_file, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            _, start = _scan_record(buf, 0, set())
+            yield from itertools.islice(_iter_records(buf, start, len(buf), set(columns)), num_rows)
+
+
+def _iter_records(buf: mmap.mmap, start: int, stop: int, wanted: set[int]) -> Iterator[list[str]]:
+    """
+    Yield every non-blank record of buf that starts in the range [start, stop),
+    with only the fields whose column is in wanted decoded.
+
+    Preconditions:
+        - start is the position where a record starts
+    """
+    pos = start
+    while pos < stop:
+        row, next_pos = _scan_record(buf, pos, wanted)
+        # a blank line is at most a line ending; never copy a whole record just to check it
+        if next_pos - pos > 2 or buf[pos:next_pos].strip(b'\r\n'):
+            yield row
+        pos = next_pos
+
+
+def _scan_record(buf: mmap.mmap, pos: int, wanted: set[int]) -> tuple[list[str], int]:
+    """
+    Scan the csv record starting at position pos of buf.
+    Return the record, with only the fields whose column is in wanted decoded,
+    and the position where the next record starts.
+
+    Fields are split like csv.reader splits them: any text between the closing quote of a
+    quoted field and the next delimiter is kept as it is, quotes included.
+    """
+    row = []
+    end = len(buf)
+    while True:
+        quoted = _QUOTED_FIELD.match(buf, pos)
+        if quoted:
+            match = _FIELD_END.search(buf, quoted.end())
+            if len(row) in wanted:
+                field = buf[pos + 1:quoted.end()]
+                if field.endswith(b'"'):
+                    field = field[:-1]
+                trailing = buf[quoted.end():match.start() if match else end]
+                row.append((field.replace(b'""', b'"') + trailing).decode('utf-8'))
             else:
-                book_table = False
-        if online_order and book_table not in {"Yes", "No"}:
-            valid = False
-        if "/" in rate:
-            compute = rate.split("/")
-            rate = round(float(compute[0]) / float(compute[1]), 2)
-        elif "/" not in rate:
-            valid = False
-        elif not location or location == "":
-            valid = False
-        elif not rest_type or rest_type == "":
-            valid = False
-        elif not approx_cost or approx_cost == "":
-            valid = False
-        elif not listed_in or listed_in == "":
-            valid = False
-
-        if valid:
-            try:
-                if "," in approx_cost:
-                    approx_cost = approx_cost.replace(",", "")
-                    approx_cost = int(approx_cost)
-                else:
-                    approx_cost = int(approx_cost)
-
-                rest_type = [item.strip() for item in rest_type.split(',')]
-                cuisines = [item.strip() for item in cuisines.split(',')]
-
-                restaurant = Restaurant(online_order, book_table, rate, location, rest_type,
-                                        cuisines, approx_cost, listed_in)
-                created_dict[name] = restaurant
+                row.append('')
+        else:
+            match = _FIELD_END.search(buf, pos)
+            if len(row) in wanted:
+                row.append(buf[pos:match.start() if match else end].decode('utf-8'))
+            else:
+                row.append('')
+
+        if match is None:
+            return row, end
+        pos = match.end()
+        if match.group() != b',':
+            return row, pos
+
+
+def parse_row(row: list[str]) -> Optional[tuple[str, Restaurant]]:
+    """
+    Return the name and Restaurant dataclass of the given csv row,
+    or None if the row does not hold a valid restaurant.
+    """
+    name = row[2]
+    online_order = row[3]
+    book_table = row[4]
+    rate = row[5]
+    location = row[8]
+    rest_type = row[9]
+    cuisines = row[11]
+    approx_cost = row[12]
+    listed_in = row[15]
+
+    # Flag to check if all the components are valid
+    valid = True
+
+    if not name or len(name) >= 30:
+        valid = False
+    if online_order and book_table in {"Yes", "No"}:
+        if online_order == "Yes":
+            online_order = True
+        else:
+            online_order = False
+
+        if book_table == "Yes":
+            book_table = True
+        else:
+            book_table = False
+    if online_order and book_table not in {"Yes", "No"}:
+        valid = False
+    if "/" in rate:
+        compute = rate.split("/")
+        rate = round(float(compute[0]) / float(compute[1]), 2)
+    elif "/" not in rate:
+        valid = False
+    elif not location or location == "":
+        valid = False
+    elif not rest_type or rest_type == "":
+        valid = False
+    elif not approx_cost or approx_cost == "":
+        valid = False
+    elif not listed_in or listed_in == "":
+        valid = False
+
+    if not valid:
+        return None
+
+    try:
+        if "," in approx_cost:
+            approx_cost = approx_cost.replace(",", "")
+            approx_cost = int(approx_cost)
+        else:
+            approx_cost = int(approx_cost)
+
+        rest_type = [item.strip() for item in rest_type.split(',')]
+        cuisines = [item.strip() for item in cuisines.split(',')]
+
+        return name, Restaurant(online_order, book_table, rate, location, rest_type,
+                                cuisines, approx_cost, listed_in)
+
+    except ValueError:
+        return None
 
-            except ValueError:
-                continue
+
+def read_restaurants(rows: Iterable[list[str]]) -> Iterator[tuple[str, Restaurant]]:
+    """
+    Yield the name and Restaurant dataclass of every valid row in rows, one at a time.
+    Callers can chain further generators on top of this one to filter restaurants
+    without holding all of them in memory, for example:
+
+        (pair for pair in read_restaurants(read_rows('zomato.csv')) if pair[1].book_table)
+    """
+    for row in rows:
+        parsed = parse_row(row)
+        if parsed is not None:
+            yield parsed
+
+
+def select_valid_rows(input_file, num_rows=5000, processes=1) -> dict[str, Restaurant]:
+    """
+    Given the large input file of data,
+    select num_rows amount of lines to create a smaller subset of data.
+    Use this smaller subset of data to return dictionary mapping restaurant name
+    to its respective Restaurant dataclass.
+    Only the first num_rows rows of the file are read.
+
+    If processes > 1, the file is split into byte ranges that are parsed in a pool
+    of that many processes instead. The result is the same as the sequential one.
+    """
+    with instrumentation.stage('csv_parsing'):
+        if processes > 1:
+            restaurants = select_valid_rows_parallel(input_file, num_rows, processes)
+        else:
+            restaurants = dict(read_restaurants(read_rows(input_file, num_rows, USED_COLUMNS)))
+    instrumentation.count('restaurants_parsed', len(restaurants))
+    return restaurants
+
+
+def select_valid_rows_parallel(input_file: str, num_rows: int, processes: int) -> dict[str, Restaurant]:
+    """
+    Return the same dictionary as select_valid_rows, parsing and validating the file in a
+    pool of the given number of processes.
+
+    The file is split into byte ranges that start at record boundaries. Each process
+    parses a whole range, and the partial results are merged in file order as they finish,
+    so later rows overwrite earlier ones exactly as in the sequential loader. Once the
+    ranges merged so far hold num_rows rows, the ranges after them are not parsed.
+
+    Preconditions:
+        - processes > 1
+    """
+    with open(input_file, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            return {}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            _, start = _scan_record(buf, 0, set())
+            # a few ranges per process keeps the pool busy when some ranges parse slower
+            bounds = record_boundaries(buf, start, processes * 4)
+
+    ranges = [(input_file, bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+    created_dict = {}
+    rows_seen = 0
+    # leaving the with block terminates the pool, so ranges past num_rows stop being parsed
+    with multiprocessing.Pool(processes) as pool:
+        for row_count, parsed in pool.imap(_parse_range, ranges):
+            for index, name, restaurant in parsed:
+                if rows_seen + index >= num_rows:
+                    return created_dict
+                created_dict[name] = restaurant
+            rows_seen += row_count
+            if rows_seen >= num_rows:
+                break
 
     return created_dict
 
 
+def record_boundaries(buf: mmap.mmap, start: int, num_ranges: int) -> list[int]:
+    """
+    Return increasing positions [start, ..., len(buf)] splitting buf into at most num_ranges
+    byte ranges of similar size, each starting at a csv record boundary.
+
+    A newline ends a record only when it is preceded by an even number of quotes since the
+    last record boundary, so newlines inside quoted fields are never split on.
+
+    Preconditions:
+        - start is the position where a record starts
+        - num_ranges >= 1
+    """
+    size = len(buf)
+    bounds = [start]
+    for i in range(1, num_ranges):
+        target = start + (size - start) * i // num_ranges
+        if target <= bounds[-1]:
+            continue
+
+        quotes = _count_quotes(buf, bounds[-1], target)
+        pos = target
+        newline = buf.find(b'\n', pos)
+        while newline != -1:
+            quotes += _count_quotes(buf, pos, newline)
+            if quotes % 2 == 0:
+                break
+            pos = newline + 1
+            newline = buf.find(b'\n', pos)
+
+        if newline == -1 or newline + 1 >= size:
+            break
+        bounds.append(newline + 1)
+
+    bounds.append(size)
+    return bounds
+
+
+def _count_quotes(buf: mmap.mmap, start: int, stop: int) -> int:
+    """
+    Return the number of quote characters in buf[start:stop], copying at most
+    _COUNT_BLOCK bytes of buf at a time.
+    """
+    total = 0
+    for pos in range(start, stop, _COUNT_BLOCK):
+        total += buf[pos:min(pos + _COUNT_BLOCK, stop)].count(b'"')
+    return total
+
+
+def _parse_range(args: tuple[str, int, int]) -> tuple[int, list[tuple[int, str, Restaurant]]]:
+    """
+    Parse the records of the given file that start in the byte range [start, stop).
+    Return the number of records read and a list of (index, name, Restaurant) tuples
+    for the valid ones, where index is the record's position within the range.
+    """
+    input_file, start, stop = args
+    parsed = []
+    row_count = 0
+    with open(input_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        for index, row in enumerate(_iter_records(buf, start, stop, set(USED_COLUMNS))):
+            row_count += 1
+            restaurant = parse_row(row)
+            if restaurant is not None:
+                parsed.append((index, restaurant[0], restaurant[1]))
+
+    return row_count, parsed
+
+
+def load_valid_rows(input_file: str, num_rows: int = 5000, processes: int = 1,
+                    use_hash: bool = False, cache_dir: Optional[str] = None) -> dict[str, Restaurant]:
+    """
+    Return the same dictionary as select_valid_rows, reusing a snapshot of a previous result
+    when one exists for the same input.
+
+    The snapshot is a pickle stored in cache_dir (by default, the directory of input_file).
+    It is keyed by the input file's size and modification time (or, if use_hash is True,
+    a hash of its contents), num_rows and LOADER_VERSION, and is rebuilt whenever any of
+    them change. A snapshot that cannot be read is rebuilt too.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.dirname(os.path.abspath(input_file))
+    snapshot_file = os.path.join(cache_dir, f'.{os.path.basename(input_file)}.{num_rows}.usable_data.pickle')
+    key = _snapshot_key(input_file, num_rows, use_hash)
+
+    try:
+        with open(snapshot_file, 'rb') as f, instrumentation.stage('snapshot_loading'):
+            snapshot = pickle.load(f)
+        if snapshot['key'] == key:
+            instrumentation.count('snapshot_hits')
+            return snapshot['data']
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError, KeyError,
+            TypeError, ValueError):
+        # a truncated, corrupt or outdated pickle can fail in any of these ways; rebuild it like a missing one
+        pass
+
+    instrumentation.count('snapshot_misses')
+    data = select_valid_rows(input_file, num_rows, processes)
+
+    # write to a temporary file first so a concurrent reader never sees half a snapshot
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_file = f'{snapshot_file}.{os.getpid()}.tmp'
+    try:
+        with open(temp_file, 'wb') as f:
+            pickle.dump({'key': key, 'data': data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, snapshot_file)
+    finally:
+        # only left behind if writing the snapshot failed
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    return data
+
+
+def _snapshot_key(input_file: str, num_rows: int, use_hash: bool) -> tuple:
+    """
+    Return the key identifying the snapshot of input_file read with num_rows.
+    """
+    stat = os.stat(input_file)
+    if use_hash:
+        digest = hashlib.sha256()
+        with open(input_file, 'rb') as f:
+            for block in iter(lambda: f.read(_COUNT_BLOCK), b''):
+                digest.update(block)
+        source = ('sha256', digest.hexdigest())
+    else:
+        source = ('mtime', stat.st_mtime_ns)
+
+    return LOADER_VERSION, stat.st_size, source, num_rows
+
+
 def create_graph(mapped_values: dict[str, Restaurant], weight_map: dict[str, int], graph: Graph) -> Graph:
     """
     Creates and returns a graph given the mapped_values mapping restaurant's name to its qualities.
-    The weights are dynamically chosen by the user and given in the weight_map
+    The weights are dynamically chosen by the user and given in the weight_map.
+    Each weighted edge is added with its key in weight_map as its category, so the weights
+    can also be changed per query by passing a new weight_map when scoring similarities.
 
     Preconditions:
         - len(weight_map) == 6
         - all([key in {'restaurant', 'location', 'rest_type', 'cuisines', 'approx_cost', 'other', 'user'}
                 for key in weight_map])
     """
+    with instrumentation.stage('graph_building'):
+        return _add_restaurants(mapped_values, weight_map, graph)
 
+
+def _add_restaurants(mapped_values: dict[str, Restaurant], weight_map: dict[str, int], graph: Graph) -> Graph:
+    """
+    Add the vertices and edges of create_graph to graph and return it
+
+    The categorical fields are read as codes and named through the shared vocabularies,
+    so no list of names is built for any restaurant.
+    """
+    location_weight = weight_map[Constants.LOCATION]
+    rest_type_weight = weight_map[Constants.REST_TYPE]
+    cuisine_weight = weight_map[Constants.CUISINES]
+    price_weight = weight_map[Constants.APPROX_COST]
     for key in mapped_values:
         graph.add_vertex(key, Constants.RESTAURANT)
         rest_data = mapped_values[key]
@@ -156,42 +587,51 @@ def create_graph(mapped_values: dict[str, Restaurant], weight_map: dict[str, int
             graph.add_edge(key, "excellent_rated")
 
         # add vertex for restaurant's location
-        graph.add_vertex(rest_data.location, Constants.LOCATION)
-        graph.add_edge(key, rest_data.location, weight_map[Constants.LOCATION])
+        location = LOCATIONS.names[rest_data.location_code]
+        graph.add_vertex(location, Constants.LOCATION)
+        graph.add_edge(key, location, location_weight, Constants.LOCATION)
 
         # add vertices for rest_type
-        for r_type in rest_data.rest_type:
+        for code in rest_data.rest_type_codes:
+            r_type = REST_TYPES.names[code]
             graph.add_vertex(r_type, Constants.REST_TYPE)
-            graph.add_edge(key, r_type, weight_map[Constants.REST_TYPE])
+            graph.add_edge(key, r_type, rest_type_weight, Constants.REST_TYPE)
 
         # add verticies for cuisine type
-        for cuisine in rest_data.cuisines:
+        for code in rest_data.cuisine_codes:
+            cuisine = CUISINE_TYPES.names[code]
             graph.add_vertex(cuisine, Constants.CUISINES)
-            graph.add_edge(key, cuisine, weight_map[Constants.CUISINES])
+            graph.add_edge(key, cuisine, cuisine_weight, Constants.CUISINES)
 
         # add vertex for restaurant's approx price
         # split ratings into 3 sets, (0, 750), (600, 2000), (2000, ...)
         price = rest_data.approx_cost
         if 0 <= price < 750:
             graph.add_vertex("low_cost", Constants.APPROX_COST)
-            graph.add_edge(key, "low_cost", weight_map[Constants.APPROX_COST])
+            graph.add_edge(key, "low_cost", price_weight, Constants.APPROX_COST)
         elif 600 <= price < 2000:
             graph.add_vertex("medium_price", Constants.APPROX_COST)
-            graph.add_edge(key, "medium_price", weight_map[Constants.APPROX_COST])
+            graph.add_edge(key, "medium_price", price_weight, Constants.APPROX_COST)
         else:
             graph.add_vertex("high_price", Constants.APPROX_COST)
-            graph.add_edge(key, "high_price", weight_map[Constants.APPROX_COST])
+            graph.add_edge(key, "high_price", price_weight, Constants.APPROX_COST)
 
         # add vertex and edge for listed_in
-        graph.add_vertex(rest_data.listed_in, Constants.OTHER)
-        graph.add_edge(key, rest_data.listed_in)
+        listed_in = LISTINGS.names[rest_data.listed_in_code]
+        graph.add_vertex(listed_in, Constants.OTHER)
+        graph.add_edge(key, listed_in)
 
     return graph
 
 
 if __name__ == "__main__":
+    # python_ta is only needed to check this file, so it is not imported along with the module
+    import python_ta
+
     python_ta.check_all(config={
-        'extra-imports': ['csv', 'sys', 'dataclass', 'python_ta', 'Constants', 'Graph'],
-        'allowed-io': ['select_random_rows'],  # the names (strs) of functions that call print/open/input
+        'extra-imports': ['csv', 'hashlib', 'itertools', 'mmap', 'multiprocessing', 'os', 'pickle', 're', 'sys',
+                          'dataclass', 'typing', 'python_ta', 'Constants', 'instrumentation', 'Graph'],
+        'allowed-io': ['read_rows', 'read_columns', 'select_valid_rows_parallel', '_parse_range',
+                       'load_valid_rows', '_snapshot_key'],  # the names (strs) of functions that call print/open/input
         'max-line-length': 120
     })
@@ -5,10 +5,19 @@ Weighted edges are fomred between users and restaurants, the weight being how mu
 they like a certain restaurant
 """
 import random
-import python_ta
+from typing import Optional
+
 import graph_container
 import Constants
 
+# the default median number of restaurants a user of a large graph has visited;
+# user degrees are log-normal, so a few users visit far more than most
+MEDIAN_DEGREE = 8
+
+# the default exponent of the Zipf distribution of restaurant popularity in a large graph: the i-th
+# most popular restaurant is visited about 1 / i ** POPULARITY_EXPONENT times as often as the most popular
+POPULARITY_EXPONENT = 1.0
+
 
 class Generate_Graph:
     """
@@ -23,19 +32,20 @@ class Generate_Graph:
         """
         self.data_map = data_map
 
-    def create_random_graph(self, user_size: int, rest_size: int) -> graph_container.Graph:
+    def create_random_graph(self, user_size: int, rest_size: int, seed: Optional[int] = None) -> graph_container.Graph:
         """
         Creates a graph connecting a fixed size number of users
         to restaurants given in the data_map, similar to one created
         like main.usable_data
+        The same seed always gives the same graph; with no seed, every graph is different.
 
         Preconditions:
             - user_size > 10 and rest_size > 10
         """
+        rng = random.Random(seed)
         graph = graph_container.Graph()
-        users = {i for i in range(user_size)}
-        total_restaurants = list(self.data_map)
-        restaurants = random.sample(total_restaurants, rest_size)
+        users = range(user_size)
+        restaurants = sorted(rng.sample(sorted(self.data_map), rest_size))
 
         # add vertices to the graph
         for restaurant in restaurants:
@@ -46,16 +56,68 @@ class Generate_Graph:
         # give connections to the users
         # each user should have degree between 5 - 10
         for user in users:
-            random_degree = random.randint(5, 10)
-            to_connect = random.sample(sorted(restaurants), random_degree)
+            random_degree = rng.randint(5, 10)
+            to_connect = rng.sample(restaurants, random_degree)
             for restaurant in to_connect:
                 # generate random weight for edge
                 # weight is in between 1 - 10
-                weight = random.randint(1, 10)
+                weight = rng.randint(1, 10)
                 graph.add_edge(user, restaurant, weight)
 
         return graph
 
+    def create_large_graph(self, user_size: int, rest_size: Optional[int] = None, seed: int = 0,
+                           processes: int = 1, median_degree: float = MEDIAN_DEGREE,
+                           popularity_exponent: float = POPULARITY_EXPONENT) -> graph_container.Graph:
+        """
+        Return a graph connecting user_size users to rest_size restaurants of the data_map
+        (all of them if rest_size is None), generated as described in large_user_graph.generate_edges.
+
+        The edges are generated as arrays and handed to Graph.load_arrays, so no edge is
+        added one at a time. Users are the ints 0 to user_size - 1, as in create_random_graph.
+
+        Preconditions:
+            - user_size >= 0
+            - rest_size is None or 1 <= rest_size <= len(self.data_map)
+            - processes >= 1
+            - median_degree >= 1
+        """
+        sections = self.generate_sections(user_size, rest_size, seed, processes, median_degree,
+                                          popularity_exponent)
+        items, kind_names, kinds, offsets, neighbours, weights, categories = sections
+        graph = graph_container.Graph()
+        graph.load_arrays(items, kind_names, kinds, offsets.tolist(), memoryview(neighbours), memoryview(weights),
+                          memoryview(categories), [])
+        return graph
+
+    def write_large_graph(self, path: str, user_size: int, rest_size: Optional[int] = None, seed: int = 0,
+                          processes: int = 1, median_degree: float = MEDIAN_DEGREE,
+                          popularity_exponent: float = POPULARITY_EXPONENT) -> None:
+        """
+        Write the graph create_large_graph would return straight to the file at path, in the
+        format of Graph.save, without building it. Graph.load reads the file back.
+
+        Preconditions:
+            - the same as create_large_graph
+        """
+        sections = self.generate_sections(user_size, rest_size, seed, processes, median_degree,
+                                          popularity_exponent)
+        items, kind_names, kinds, offsets, neighbours, weights, categories = sections
+        graph_container.write_graph(path, items, kind_names, kinds, offsets, neighbours, weights, categories, [])
+
+    def generate_sections(self, user_size: int, rest_size: Optional[int], seed: int, processes: int,
+                          median_degree: float, popularity_exponent: float) -> tuple:
+        """
+        Return the items, kind names, kinds, offsets, neighbours, weights and categories of the
+        graph create_large_graph would return, as taken by graph_container.write_graph.
+        Restaurants come first, then users.
+        """
+        # imported here so numpy is only loaded when large graphs are generated
+        import large_user_graph
+
+        return large_user_graph.generate_sections(self.data_map, user_size, rest_size, seed, processes,
+                                                  median_degree, popularity_exponent)
+
     def create_static_graph(self) -> graph_container.Graph:
         """
         Create a graph that takes in 10 users, and manually creates edges and vertices
@@ -112,8 +174,11 @@ class Generate_Graph:
 
 
 if __name__ == "__main__":
+    # python_ta is only needed to check this file, so it is not imported along with the module
+    import python_ta
+
     python_ta.check_all(config={
-        'extra-imports': ['Constants', 'graph_container', 'random'],
+        'extra-imports': ['Constants', 'graph_container', 'large_user_graph', 'random', 'typing'],
         'allowed-io': [],  # the names (strs) of functions that call print/open/input
         'max-line-length': 120
     })
@@ -2,56 +2,377 @@
 This file represents the Graph data structure this project will use
 """
 from __future__ import annotations
+import json
 import math
-from typing import Any, Union
+import mmap
+import operator
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Any, Iterator, KeysView, Optional, Sequence, Union
+
+import instrumentation
+
+
+# The saved graph format, all in native byte order:
+#   - header: GRAPH_MAGIC, then the vertex count, edge entry count and table length as int64s
+#   - table: JSON object holding the vertex items in id order, the kind names, the edge
+#            category names and the byte order
+#   - kinds: one byte per vertex, indexing the kind names
+#   - offsets: int64 per vertex plus one; the edges of vertex i are entries offsets[i] to offsets[i + 1]
+#   - neighbours: int32 vertex id per edge entry, sorted within each vertex
+#   - weights: float32 weight per edge entry
+#   - categories: one byte per edge entry, 0 for no category or 1 + the index of its category name
+# Every section after the header starts on an 8 byte boundary.
+GRAPH_MAGIC = b'YEGRAPH2'
+_HEADER = struct.Struct('<8sqqq')
+
+# the category totals of a vertex with no edges in any category
+_NO_CATEGORIES = ()
+
+# the number of category codes a vertex's totals have room for once it has an edge with a category
+CATEGORY_SLOTS = 8
+
+
+def write_graph(path: str, items: list, kind_names: list[str], kinds: Any, offsets: Any, neighbours: Any,
+                weights: Any, categories: Any, category_names: list[str]) -> None:
+    """Write a graph to the file at the given path in the format described above, given its sections.
+
+    kinds, offsets, neighbours, weights and categories may be any objects supporting the buffer
+    protocol with the item types of the format, such as arrays or numpy arrays, so graphs can
+    be written without building a Graph.
+
+    Preconditions:
+        - every item is a str or an int
+        - the sections describe a valid graph, as in Graph.load_arrays
+    """
+    sections = [memoryview(section).cast('B') for section in (kinds, offsets, neighbours, weights, categories)]
+    table = json.dumps({'items': items, 'kinds': kind_names, 'categories': category_names,
+                        'byteorder': sys.byteorder}).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(GRAPH_MAGIC, len(items), sections[2].nbytes // 4, len(table)))
+        for section in [memoryview(table)] + sections:
+            f.write(section)
+            f.write(bytes(-section.nbytes % 8))
+
+
+def _category_totals(categories: memoryview, weights: memoryview) -> tuple[Union[list, tuple], Union[list, tuple]]:
+    """Return the category_counts and category_sq_norms of a vertex with the given edge categories and weights."""
+    largest = max(categories, default=0)
+    if largest == 0:
+        return _NO_CATEGORIES, _NO_CATEGORIES
+    counts = [0] * max(largest + 1, CATEGORY_SLOTS)
+    sq_norms = [0.0] * len(counts)
+    for code, weight in zip(categories, weights):
+        if code:
+            counts[code] += 1
+            sq_norms[code] += weight * weight
+    return counts, sq_norms
+
+
+class _Saved_Edges:
+    """The edge sections of a saved graph, shared by all of its loaded vertices.
+
+    Instance Attributes:
+        - offsets: the edges of the vertex with id i are entries offsets[i] to offsets[i + 1]
+        - neighbours: the neighbour id of each edge entry
+        - weights: the weight of each edge entry
+        - categories: the category code of each edge entry
+    """
+    __slots__ = ('offsets', 'neighbours', 'weights', 'categories')
+    offsets: Sequence[int]
+    neighbours: memoryview
+    weights: memoryview
+    categories: memoryview
 
-import python_ta
+    def __init__(self, offsets: Sequence[int], neighbours: memoryview, weights: memoryview,
+                 categories: memoryview) -> None:
+        """Initialize the shared sections of a saved graph."""
+        self.offsets = offsets
+        self.neighbours = neighbours
+        self.weights = weights
+        self.categories = categories
 
 
 class _Vertex:
+    """A vertex in a graph.
+
+    The edges of a vertex are stored in three parallel arrays sorted by neighbour id,
+    rather than in a dictionary, to keep the memory used per edge small. A vertex loaded
+    from a saved graph keeps no arrays of its own until an edge is changed: it reads its
+    edges from the sections shared by the whole graph, so it costs no more memory than a
+    vertex with no edges.
+
+    Instance Attributes:
+        - item: the data stored in this vertex
+        - kind: the type of this vertex
+        - id: the position of this vertex in its graph
+        - neighbour_ids: the ids of the vertices adjacent to this vertex, in increasing order
+        - weights: weights[i] is the weight of the edge to the vertex with id neighbour_ids[i]
+        - categories: categories[i] is the category code of the edge to the vertex with id
+          neighbour_ids[i], or 0 if it has no category
+        - sq_norm: the sum of the squared weights, kept up to date by Graph.add_edge
+        - category_counts: category_counts[c] is the number of edges with category code c >= 1,
+          counted when the vertex is loaded and kept up to date by Graph.add_edge, so queries
+          only ever read it
+        - category_sq_norms: category_sq_norms[c] is the sum of the squared weights of the edges
+          with category code c >= 1, kept like category_counts
+    """
+    __slots__ = ('item', 'kind', 'id', '_neighbour_ids', '_weights', '_categories', '_saved', 'sq_norm',
+                 'category_counts', 'category_sq_norms')
     item: Any
     kind: str
-    neighbours: dict[_Vertex, Union[int, float]]
-
-    def __init__(self, item: Any, kind: str) -> None:
-        """Initialize a new vertex with the given item and kind.
-
-        This vertex is initialized with no neighbours.
+    id: int
+    sq_norm: float
+    category_counts: Union[list[int], tuple]
+    category_sq_norms: Union[list[float], tuple]
+    # Private Instance Attributes:
+    #   - _neighbour_ids, _weights, _categories: the arrays of this vertex's own edges,
+    #     or None while its edges are read from _saved
+    #   - _saved: the sections of the saved graph this vertex was loaded from, whose entries
+    #     _saved.offsets[id] to _saved.offsets[id + 1] are its edges, or None once it has its own arrays
+    _neighbour_ids: Optional[array]
+    _weights: Optional[array]
+    _categories: Optional[array]
+    _saved: Optional[_Saved_Edges]
+
+    def __init__(self, item: Any, kind: str, vertex_id: int, saved: Optional[_Saved_Edges] = None,
+                 count_categories: bool = True) -> None:
+        """Initialize a new vertex with the given item, kind and id.
+
+        If saved is given, the edges of this vertex are its entries in saved, and the squared
+        weights are summed once here. If count_categories is also True, so are the category totals;
+        otherwise the edges must all have no category. If saved is not given, this vertex is
+        initialized with no neighbours.
 
         Preconditions:
             - kind in {'restaurant', 'location', 'rest_type', 'cuisines', 'approx_cost', 'other', 'user'}
+            - saved is None or 0 <= vertex_id < len(saved.offsets) - 1
         """
         self.item = item
         self.kind = kind
-        self.neighbours = {}
+        self.id = vertex_id
+        self._saved = saved
+        if saved is None:
+            self._neighbour_ids = array('i')
+            self._weights = array('f')
+            self._categories = array('B')
+            self.sq_norm = 0
+            # most vertices only have edges without a category, so they share one empty tuple
+            self.category_counts = self.category_sq_norms = _NO_CATEGORIES
+        else:
+            self._neighbour_ids = self._weights = self._categories = None
+            start, end = saved.offsets[vertex_id], saved.offsets[vertex_id + 1]
+            weights = saved.weights[start:end]
+            self.sq_norm = sum(map(operator.mul, weights, weights))
+            if count_categories:
+                self.category_counts, self.category_sq_norms = _category_totals(saved.categories[start:end], weights)
+            else:
+                self.category_counts = self.category_sq_norms = _NO_CATEGORIES
+
+    @property
+    def neighbour_ids(self) -> Union[array, memoryview]:
+        """The ids of the vertices adjacent to this vertex, in increasing order."""
+        saved = self._saved
+        if saved is None:
+            return self._neighbour_ids
+        return saved.neighbours[saved.offsets[self.id]:saved.offsets[self.id + 1]]
+
+    @property
+    def weights(self) -> Union[array, memoryview]:
+        """The weights of the edges of this vertex, matching neighbour_ids."""
+        saved = self._saved
+        if saved is None:
+            return self._weights
+        return saved.weights[saved.offsets[self.id]:saved.offsets[self.id + 1]]
+
+    @property
+    def categories(self) -> Union[array, memoryview]:
+        """The category codes of the edges of this vertex, matching neighbour_ids."""
+        saved = self._saved
+        if saved is None:
+            return self._categories
+        return saved.categories[saved.offsets[self.id]:saved.offsets[self.id + 1]]
+
+    def find(self, other_id: int) -> int:
+        """Return the position of the edge to the vertex with id other_id, or -1 if there is none."""
+        neighbour_ids = self.neighbour_ids
+        i = bisect_left(neighbour_ids, other_id)
+        if i < len(neighbour_ids) and neighbour_ids[i] == other_id:
+            return i
+        return -1
+
+    def set_weight(self, other_id: int, weight: Union[int, float], category: int) -> None:
+        """Set the weight and category code of the edge from this vertex to the vertex with id other_id,
+        adding the edge if it does not exist, and keep sq_norm and the category totals up to date.
+        """
+        if self._saved is not None:
+            # copy the edges of a loaded graph before changing them
+            self._neighbour_ids = array('i', self.neighbour_ids)
+            self._weights = array('f', self.weights)
+            self._categories = array('B', self.categories)
+            self._saved = None
+
+        neighbour_ids, weights, categories = self._neighbour_ids, self._weights, self._categories
+        # edges are usually added in increasing id order, so try appending before searching
+        if not neighbour_ids or neighbour_ids[-1] < other_id:
+            neighbour_ids.append(other_id)
+            weights.append(weight)
+            categories.append(category)
+            old_weight = 0
+            # use the stored 32-bit weight so the totals match the weights array exactly
+            new_weight = weights[-1]
+        else:
+            i = bisect_left(neighbour_ids, other_id)
+            if i < len(neighbour_ids) and neighbour_ids[i] == other_id:
+                old_weight = weights[i]
+                if categories[i]:
+                    self._add_to_category(categories[i], -1, -old_weight * old_weight)
+                weights[i] = weight
+                categories[i] = category
+            else:
+                old_weight = 0
+                neighbour_ids.insert(i, other_id)
+                weights.insert(i, weight)
+                categories.insert(i, category)
+            new_weight = weights[i]
+
+        self.sq_norm += new_weight * new_weight - old_weight * old_weight
+        if category:
+            counts = self.category_counts
+            if category < len(counts):
+                counts[category] += 1
+                self.category_sq_norms[category] += new_weight * new_weight
+            else:
+                self._add_to_category(category, 1, new_weight * new_weight)
+
+    def _add_to_category(self, code: int, count: int, sq_weight: float) -> None:
+        """Add count edges whose squared weights sum to sq_weight to the totals of category code."""
+        counts = self.category_counts
+        if code >= len(counts):
+            # room for a few codes at once, so a vertex's totals rarely grow more than once
+            padding = max(code + 1, CATEGORY_SLOTS) - len(counts)
+            counts = self.category_counts = list(counts) + [0] * padding
+            self.category_sq_norms = list(self.category_sq_norms) + [0.0] * padding
+        counts[code] += count
+        self.category_sq_norms[code] += sq_weight
+
+    def weighted_sq_norm(self, code_weights: list[Optional[float]]) -> float:
+        """Return the sum of the squared weights of this vertex's edges, where every edge
+        whose category code c has code_weights[c] is not None has weight code_weights[c] instead of its own.
+
+        This takes time proportional to the number of categories, not to the degree of this
+        vertex, and changes nothing, so it is safe to call from several threads at once.
+        """
+        total = self.sq_norm
+        for code_weight, count, category_sq_norm in zip(code_weights, self.category_counts, self.category_sq_norms):
+            if count and code_weight is not None:
+                total += count * code_weight * code_weight - category_sq_norm
+        # replacing every weight of a vertex by 0 can leave rounding error below 0
+        return max(total, 0.0)
 
     def degree(self) -> int:
         """Return the degree of this vertex."""
-        return len(self.neighbours)
+        return len(self.neighbour_ids)
 
-    def cosine_similarity(self, other: _Vertex) -> float:
+    def dot(self, other: _Vertex, code_weights: Optional[list[Optional[float]]] = None) -> float:
+        """Return the dot product of the edge weights of this vertex and another.
+
+        If code_weights is given, every edge whose category code c has code_weights[c]
+        is not None is treated as having weight code_weights[c] instead of its own.
+        """
+        # walk the smaller neighbour array and find each id in the larger one;
+        # both are sorted, so each search can start where the previous one ended
+        small_ids, large_ids = self.neighbour_ids, other.neighbour_ids
+        if len(small_ids) <= len(large_ids):
+            small, large = self, other
+        else:
+            small, large = other, self
+            small_ids, large_ids = large_ids, small_ids
+
+        small_weights, large_weights = small.weights, large.weights
+        if code_weights is not None:
+            small_categories, large_categories = small.categories, large.categories
+        size = len(large_ids)
+        j = 0
+        numerator = 0
+        for i, x in enumerate(small_ids):
+            j = bisect_left(large_ids, x, j)
+            if j == size:
+                break
+            if large_ids[j] == x:
+                weight = small_weights[i]
+                other_weight = large_weights[j]
+                if code_weights is not None:
+                    # the two edges to x may be in different categories, so look both up
+                    if code_weights[small_categories[i]] is not None:
+                        weight = code_weights[small_categories[i]]
+                    if code_weights[large_categories[j]] is not None:
+                        other_weight = code_weights[large_categories[j]]
+                numerator += weight * other_weight
+
+        return numerator
+
+    def norm(self, code_weights: Optional[list[Optional[float]]] = None) -> float:
+        """Return the L2 norm of the edge weights of this vertex, with code_weights applied as in dot."""
+        if code_weights is None:
+            return math.sqrt(self.sq_norm)
+        return math.sqrt(self.weighted_sq_norm(code_weights))
+
+    def cosine_similarity(self, other: _Vertex, code_weights: Optional[list[Optional[float]]] = None) -> float:
         """
         Compute the cosine similarity between this vertex and another
         see this link for cosine similarity formula:
         https://en.wikipedia.org/wiki/Cosine_similarity
-        """
-        intersect_set = {x for x in self.neighbours if x in other.neighbours}
-        numerator = sum([self.neighbours[x] * other.neighbours[x] for x in intersect_set])
-        den_a = math.sqrt(sum([self.neighbours[x] ** 2 for x in self.neighbours]))
-        den_b = math.sqrt(sum([other.neighbours[x] ** 2 for x in other.neighbours]))
 
-        return numerator / (den_a * den_b)
+        If code_weights is given, every edge whose category code c has code_weights[c]
+        is not None is treated as having weight code_weights[c] instead of its own.
+
+        Return 0.0 if either vertex has no edges or only edges of weight 0, like Sparse_Graph does.
+        """
+        denominator = self.norm(code_weights) * other.norm(code_weights)
+        if denominator == 0:
+            return 0.0
+        return self.dot(other, code_weights) / denominator
 
 
 class Graph:
     """A graph used to represent a restaurant network.
+
+    Edges are stored as arrays of 32-bit neighbour ids, 32-bit float weights and 8-bit
+    category codes, so each edge costs 18 bytes of array data (9 in each direction).
+    Including the arrays' headers and spare capacity and the vertex objects, a graph of
+    25k vertices and 240k edges built by create_usable_data.create_graph uses about
+    73 bytes per edge, where storing neighbours in dictionaries used about 210.
+
+    Instance Attributes:
+        - version: the number of changes made to this graph, increased by every call to
+          add_vertex that adds a vertex, every call to add_edge and every load, so results
+          computed from the graph can be discarded once it changes
     """
+    version: int
     # Private Instance Attributes:
+    #   - _vertices: mapping from each item to its vertex
+    #   - _vertex_list: the vertices of this graph, indexed by id
+    #   - _kinds: mapping from each vertex kind to the vertices of that kind,
+    #             kept in sync with _vertices so lookups by kind never scan the graph
+    #   - _category_names: the edge category names, where the category with code c is _category_names[c - 1]
+    #   - _category_codes: mapping from each edge category name to its code
     _vertices: dict[Any, _Vertex]
+    _vertex_list: list[_Vertex]
+    _kinds: dict[str, dict[Any, _Vertex]]
+    _category_names: list[str]
+    _category_codes: dict[str, int]
 
     def __init__(self) -> None:
         """Initialize an empty graph (no vertices or edges)."""
+        self.version = 0
         self._vertices = {}
+        self._vertex_list = []
+        self._kinds = {}
+        self._category_names = []
+        self._category_codes = {}
 
     def add_vertex(self, item: Any, kind: str) -> None:
         """Add a vertex with the given item and kind to this graph.
@@ -60,24 +381,44 @@ class Graph:
             - kind in {'restaurant', 'location', 'rest_type', 'cuisines', 'approx_cost', 'other', 'user'}
         """
         if item not in self._vertices:
-            self._vertices[item] = _Vertex(item, kind)
-
-    def add_edge(self, item1: Any, item2: Any, weight: Union[int, float] = 5) -> None:
+            vertex = _Vertex(item, kind, len(self._vertex_list))
+            self._vertices[item] = vertex
+            self._vertex_list.append(vertex)
+            self._kinds.setdefault(kind, {})[item] = vertex
+            self.version += 1
+            if instrumentation.ENABLED:
+                instrumentation.count('vertices')
+
+    def add_edge(self, item1: Any, item2: Any, weight: Union[int, float] = 5, category: Optional[str] = None) -> None:
         """Add an edge between the two vertices with the given items in this graph,
         with the given weight.
 
+        If category is given, the edge's weight can be replaced at query time by passing a
+        weight_map containing category to get_similarity_score.
+
         Raise a ValueError if item1 or item2 are not in this graph
 
         Preconditions:
             - item1 != item2
+            - len(set of categories added to this graph) < 256
         """
         if item1 in self._vertices and item2 in self._vertices:
             v1 = self._vertices[item1]
             v2 = self._vertices[item2]
 
-            # Add the new edge
-            v1.neighbours[v2] = weight
-            v2.neighbours[v1] = weight
+            code = 0
+            if category is not None:
+                if category not in self._category_codes:
+                    self._category_names.append(category)
+                    self._category_codes[category] = len(self._category_names)
+                code = self._category_codes[category]
+
+            # Add the new edge, or overwrite the weight of an existing one
+            v1.set_weight(v2.id, weight, code)
+            v2.set_weight(v1.id, weight, code)
+            self.version += 1
+            if instrumentation.ENABLED:
+                instrumentation.count('edges')
         else:
             raise ValueError
 
@@ -88,7 +429,7 @@ class Graph:
         """
         if item1 in self._vertices and item2 in self._vertices:
             v1 = self._vertices[item1]
-            return any(v2.item == item2 for v2 in v1.neighbours)
+            return v1.find(self._vertices[item2].id) != -1
         else:
             return False
 
@@ -98,24 +439,49 @@ class Graph:
         """
         if item in self._vertices:
             v = self._vertices[item]
-            return {neighbour.item for neighbour in v.neighbours}
+            return {self._vertex_list[i].item for i in v.neighbour_ids}
+        else:
+            raise ValueError
+
+    def get_edges(self, item: Any) -> dict[Any, float]:
+        """Return a dictionary mapping each neighbour of the given item to the weight of their edge.
+        Raise a ValueError if item does not appear as a vertex in this graph.
+        """
+        if item in self._vertices:
+            v = self._vertices[item]
+            return {self._vertex_list[i].item: weight for i, weight in zip(v.neighbour_ids, v.weights)}
+        else:
+            raise ValueError
+
+    def get_edge_categories(self, item: Any) -> dict[Any, str]:
+        """Return a dictionary mapping each neighbour of the given item whose edge was added
+        with a category to that category.
+        Raise a ValueError if item does not appear as a vertex in this graph.
+        """
+        if item in self._vertices:
+            v = self._vertices[item]
+            return {self._vertex_list[i].item: self._category_names[code - 1]
+                    for i, code in zip(v.neighbour_ids, v.categories) if code}
         else:
             raise ValueError
 
-    def get_all_vertices(self, kind: str = '') -> set:
-        """Return a set of all vertex items in this graph.
+    def get_all_vertices(self, kind: str = '') -> KeysView:
+        """Return a read-only, set-like view of all vertex items in this graph.
 
         If kind != '', only return the items of the given vertex kind.
+        The view is live: it reflects vertices added to the graph after it was returned,
+        unless kind had no vertices when it was returned.
 
         Preconditions:
             - kind in {'restaurant', 'location', 'rest_type', 'cuisines', 'approx_cost', 'other', 'user'}
         """
         if kind != '':
-            return {v.item for v in self._vertices.values() if v.kind == kind}
+            # get rather than setdefault, so asking for a kind with no vertices does not add it
+            return self._kinds.get(kind, {}).keys()
         else:
-            return set(self._vertices.keys())
+            return self._vertices.keys()
 
-    def get_weight(self, item1: Any, item2: Any) -> Union[int, float]:
+    def get_weight(self, item1: Any, item2: Any) -> float:
         """Return the weight of the edge between the given items.
 
         Return 0 if item1 and item2 are not adjacent.
@@ -124,8 +490,8 @@ class Graph:
             - item1 and item2 are vertices in this graph
         """
         v1 = self._vertices[item1]
-        v2 = self._vertices[item2]
-        return v1.neighbours.get(v2, 0)
+        i = v1.find(self._vertices[item2].id)
+        return v1.weights[i] if i != -1 else 0
 
     def average_weight(self, item: Any) -> float:
         """Return the average weight of the edges adjacent to the vertex corresponding to item.
@@ -134,7 +500,7 @@ class Graph:
         """
         if item in self._vertices:
             v = self._vertices[item]
-            return sum(v.neighbours.values()) / len(v.neighbours)
+            return sum(v.weights) / len(v.weights)
         else:
             raise ValueError
 
@@ -147,9 +513,14 @@ class Graph:
             total += self.get_weight(item, value)
         return total
 
-    def get_similarity_score(self, item1: Any, item2: Any) -> float:
+    def get_similarity_score(self, item1: Any, item2: Any,
+                             weight_map: Optional[dict[str, Union[int, float]]] = None) -> float:
         """
         return the cosine similarity between two verticies
+
+        If weight_map is given, every edge whose category is in weight_map
+        is scored as if it had weight weight_map[category]. The graph itself is not changed,
+        so queries with different weight maps can run in several threads at once.
         """
 
         if item1 not in self._vertices or item2 not in self._vertices:
@@ -158,7 +529,194 @@ class Graph:
         v1 = self._vertices[item1]
         v2 = self._vertices[item2]
 
-        return v1.cosine_similarity(v2)
+        if instrumentation.ENABLED:
+            instrumentation.count('similarity_evaluations')
+        return v1.cosine_similarity(v2, self._code_weights(weight_map))
+
+    def get_all_similarity_scores(self, item: Any, kind: str,
+                                  weight_map: Optional[dict[str, Union[int, float]]] = None) -> dict[Any, float]:
+        """Return a dictionary mapping every vertex of the given kind, item included if it is of that kind,
+        to its cosine similarity with item, with weight_map applied as in get_similarity_score.
+
+        This is get_similarity_scores for a single item, without building a list per vertex.
+        The scores are the same as those of get_similarity_score.
+        Raise ValueError if item does not appear as a vertex in this graph.
+        """
+        if item not in self._vertices:
+            raise ValueError
+
+        code_weights = self._code_weights(weight_map)
+        seed = self._vertices[item]
+        seed_norm = seed.norm(code_weights)
+        dots = self._dot_products(seed, code_weights)
+        others = self._kinds.get(kind, {})
+        instrumentation.count('similarity_evaluations', len(others))
+        scores = dict.fromkeys(others, 0.0)
+        if seed_norm == 0:
+            return scores
+        for other, v in others.items():
+            dot = dots[v.id]
+            if dot:
+                denominator = v.norm(code_weights) * seed_norm
+                if denominator != 0:
+                    scores[other] = dot / denominator
+        return scores
+
+    def get_similarity_scores(self, items: list, kind: str,
+                              weight_map: Optional[dict[str, Union[int, float]]] = None) -> Iterator[tuple[Any, list]]:
+        """Yield (other, scores) for every vertex other of the given kind, where scores[i] is
+        the cosine similarity between other and items[i], with weight_map applied as in get_similarity_score.
+
+        Rather than comparing each item with every vertex, the dot products of each item are summed
+        by walking the edges of its neighbours, so vertices sharing no neighbour with an item cost
+        nothing but a lookup, and norms are only computed for vertices sharing a neighbour with some
+        item. The scores are the same as those of get_similarity_score. Scores involving a vertex
+        with no edges are 0.0, as in _Vertex.cosine_similarity. One float per vertex of this graph
+        is kept for each item while the scores are yielded.
+        Raise ValueError if an item does not appear as a vertex in this graph.
+        """
+        if any(item not in self._vertices for item in items):
+            raise ValueError
+
+        code_weights = self._code_weights(weight_map)
+        seeds = [self._vertices[item] for item in items]
+        seed_norms = [seed.norm(code_weights) for seed in seeds]
+        seed_dots = [self._dot_products(seed, code_weights) for seed in seeds]
+        others = list(self._kinds.get(kind, {}).values())
+        instrumentation.count('similarity_evaluations', len(others) * len(seeds))
+        for v in others:
+            dots = [dots[v.id] for dots in seed_dots]
+            if not any(dots):
+                yield v.item, [0.0] * len(seeds)
+                continue
+            norm = v.norm(code_weights)
+            yield v.item, [dot / (norm * seed_norm) if norm * seed_norm != 0 else 0.0
+                           for dot, seed_norm in zip(dots, seed_norms)]
+
+    def _dot_products(self, seed: _Vertex, code_weights: Optional[list[Optional[float]]]) -> list[float]:
+        """Return the list whose entry i is seed.dot(v, code_weights) for the vertex v with id i.
+
+        The terms of each dot product are added in increasing order of the shared neighbour's id,
+        as _Vertex.dot adds them, so the sums are exactly the same.
+        """
+        dots = [0.0] * len(self._vertex_list)
+        for neighbour_id, weight, category in zip(seed.neighbour_ids, seed.weights, seed.categories):
+            neighbour = self._vertex_list[neighbour_id]
+            if code_weights is None:
+                for other_id, other_weight in zip(neighbour.neighbour_ids, neighbour.weights):
+                    dots[other_id] += weight * other_weight
+            else:
+                if code_weights[category] is not None:
+                    weight = code_weights[category]
+                for other_id, other_weight, other_category in zip(neighbour.neighbour_ids, neighbour.weights,
+                                                                  neighbour.categories):
+                    if code_weights[other_category] is not None:
+                        other_weight = code_weights[other_category]
+                    dots[other_id] += weight * other_weight
+        return dots
+
+    def _code_weights(self, weight_map: Optional[dict[str, Union[int, float]]]) -> Optional[list]:
+        """Return the list mapping each category code to its weight in weight_map, or None if it has none.
+        Return None if weight_map is None.
+        """
+        if weight_map is None:
+            return None
+        return [None] + [weight_map.get(category) for category in self._category_names]
+
+    def save(self, path: str) -> None:
+        """Save this graph to the file at the given path in the compact format described
+        at the top of this file.
+
+        Preconditions:
+            - every vertex item is a str or an int
+        """
+        with instrumentation.stage('graph_saving'):
+            kind_names = sorted(self._kinds)
+            kind_codes = {kind: i for i, kind in enumerate(kind_names)}
+
+            kinds = bytes(kind_codes[v.kind] for v in self._vertex_list)
+            offsets = array('q', [0])
+            neighbours = array('i')
+            weights = array('f')
+            categories = array('B')
+            for v in self._vertex_list:
+                neighbours.extend(v.neighbour_ids)
+                weights.extend(v.weights)
+                categories.extend(v.categories)
+                offsets.append(len(neighbours))
+
+            write_graph(path, [v.item for v in self._vertex_list], kind_names, kinds, offsets, neighbours, weights,
+                        categories, self._category_names)
+
+    def load(self, path: str) -> None:
+        """Add the vertices and edges of the graph saved at the given path to this graph.
+
+        The file is memory-mapped and every vertex reads its edges from the mapped arrays,
+        so loading does no per-edge work except summing the squared weights and category
+        totals of each vertex, and processes that load the same file share its pages. A vertex
+        copies its edges into its own arrays the first time one of its edges is changed.
+        Raise ValueError if the file is not a saved graph.
+
+        Preconditions:
+            - this graph has no vertices
+        """
+        with instrumentation.stage('graph_loading'):
+            with open(path, 'rb') as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, num_vertices, num_entries, table_len = _HEADER.unpack_from(buf, 0)
+            if magic != GRAPH_MAGIC:
+                raise ValueError
+
+            pos = _HEADER.size
+            table = json.loads(buf[pos:pos + table_len].decode('utf-8'))
+            if table['byteorder'] != sys.byteorder:
+                raise ValueError
+            pos += table_len + (-table_len % 8)
+
+            # the views below keep buf open for as long as any vertex uses them
+            view = memoryview(buf)
+            kinds = view[pos:pos + num_vertices].tolist()
+            pos += num_vertices + (-num_vertices % 8)
+            offsets = view[pos:pos + 8 * (num_vertices + 1)].cast('q').tolist()
+            pos += 8 * (num_vertices + 1)
+            neighbours = view[pos:pos + 4 * num_entries].cast('i')
+            pos += 4 * num_entries + (-4 * num_entries % 8)
+            weights = view[pos:pos + 4 * num_entries].cast('f')
+            pos += 4 * num_entries + (-4 * num_entries % 8)
+            categories = view[pos:pos + num_entries]
+
+            self.load_arrays(table['items'], table['kinds'], kinds, offsets, neighbours, weights, categories,
+                             table['categories'])
+
+    def load_arrays(self, items: list, kind_names: list[str], kinds: Sequence[int], offsets: Sequence[int],
+                    neighbours: memoryview, weights: memoryview, categories: memoryview,
+                    category_names: list[str]) -> None:
+        """Add the vertices and edges given as the sections of the saved format described at the
+        top of this file to this graph, without copying neighbours, weights or categories.
+
+        Every vertex reads its edges from the three memoryviews, which all vertices share, as in load,
+        so a graph of any size can be built from arrays made in bulk instead of one add_edge at a time.
+
+        Preconditions:
+            - this graph has no vertices
+            - the arguments describe a valid graph: within each vertex the neighbours are sorted,
+              and every edge entry has a matching entry with the same weight and category at its neighbour
+            - neighbours.format == 'i' and weights.format == 'f' and categories.format == 'B'
+        """
+        self._category_names = list(category_names)
+        self._category_codes = {category: i + 1 for i, category in enumerate(self._category_names)}
+        saved = _Saved_Edges(offsets, neighbours, weights, categories)
+        kind_maps = [self._kinds.setdefault(kind, {}) for kind in kind_names]
+        # with no category names every code is 0, so counting the categories of each vertex can be skipped
+        count_categories = bool(category_names)
+        for i, item in enumerate(items):
+            vertex = _Vertex(item, kind_names[kinds[i]], i, saved, count_categories)
+            self._vertices[item] = vertex
+            self._vertex_list.append(vertex)
+            kind_maps[kinds[i]][item] = vertex
+        self.version += 1
+        instrumentation.count('vertices', len(items))
+        instrumentation.count('edges', len(neighbours) // 2)
 
     def get_degree(self, item) -> int:
         """
@@ -171,8 +729,13 @@ class Graph:
 
 
 if __name__ == "__main__":
+    # python_ta is only needed to check this file, so it is not imported along with the module
+    import python_ta
+
     python_ta.check_all(config={
-        'extra-imports': ['annotations', 'math', 'Any', 'Union'],
-        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'extra-imports': ['annotations', 'json', 'math', 'mmap', 'operator', 'struct', 'sys', 'array', 'bisect',
+                          'Any', 'Iterator', 'KeysView', 'Optional', 'Sequence', 'Union',
+                          'instrumentation'],
+        'allowed-io': ['write_graph', 'Graph.load'],  # the names (strs) of functions that call print/open/input
         'max-line-length': 120
     })
@@ -0,0 +1,169 @@
+"""
+This file records how long each stage of the pipeline takes and counts the work it does,
+so a slow recommendation can be traced to parsing, graph building, scanning or ranking
+
+Nothing is recorded unless it is switched on, either with enable or through these
+environment variables, read when this module is first imported:
+    - YUMMYEATS_INSTRUMENT: record stage times and counters. If it is 1, the report is
+      printed to stderr as JSON when the program exits; otherwise it is the path of a file
+      the report is written to.
+    - YUMMYEATS_PROFILE: a comma separated list of cprofile and tracemalloc. cprofile profiles
+      the main thread and tracemalloc traces every allocation, from the import of this module
+      until the program exits. The results are written to the files starting with
+      YUMMYEATS_PROFILE_OUTPUT, which defaults to yummyeats_profile.
+When recording is off, stage returns a shared context manager that does nothing and count
+returns at once, so the instrumented code runs at practically full speed.
+"""
+import atexit
+import contextlib
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import ContextManager, Iterator, Optional
+
+# whether stage times and counters are being recorded
+ENABLED = False
+
+# the number of allocation sites listed in the tracemalloc report
+TRACEMALLOC_TOP = 50
+
+# the total seconds and number of calls of each stage, and the total of each counter
+_stage_seconds: dict[str, float] = {}
+_stage_calls: dict[str, int] = {}
+_counters: dict[str, int] = {}
+_lock = threading.Lock()
+
+# returned by stage while recording is off
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def enable(enabled: bool = True) -> None:
+    """
+    Start recording stage times and counters, or stop if enabled is False.
+    What was recorded so far is kept.
+    """
+    global ENABLED
+    ENABLED = enabled
+
+
+def stage(name: str) -> ContextManager:
+    """
+    Return a context manager adding the wall time spent in it to the stage with the given name.
+    Stages may be nested, in which case the time of the inner stage also counts for the outer one.
+    """
+    if not ENABLED:
+        return _NULL_STAGE
+    return _timed_stage(name)
+
+
+@contextlib.contextmanager
+def _timed_stage(name: str) -> Iterator[None]:
+    """
+    Add the wall time spent in this context manager to the stage with the given name
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _stage_seconds[name] = _stage_seconds.get(name, 0.0) + elapsed
+            _stage_calls[name] = _stage_calls.get(name, 0) + 1
+
+
+def count(name: str, amount: int = 1) -> None:
+    """
+    Add amount to the counter with the given name
+    """
+    if ENABLED:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+
+def report() -> dict:
+    """
+    Return the total seconds and calls of every stage and the total of every counter recorded so far
+    """
+    with _lock:
+        return {'stages': {name: {'seconds': seconds, 'calls': _stage_calls[name]}
+                           for name, seconds in sorted(_stage_seconds.items())},
+                'counters': dict(sorted(_counters.items()))}
+
+
+def reset() -> None:
+    """
+    Forget every stage time and counter recorded so far
+    """
+    with _lock:
+        _stage_seconds.clear()
+        _stage_calls.clear()
+        _counters.clear()
+
+
+def _write_report(destination: str) -> None:
+    """
+    Write report() as JSON to stderr if destination is 1, or else to the file at destination
+    """
+    data = json.dumps(report(), indent=2)
+    if destination == '1':
+        print(data, file=sys.stderr)
+    else:
+        with open(destination, 'w', encoding='utf-8') as f:
+            f.write(data)
+
+
+def _write_profiles(profiler: Optional[cProfile.Profile], output: str) -> None:
+    """
+    Stop profiling and write the cProfile stats to output.prof and the largest allocation
+    sites traced by tracemalloc to output.tracemalloc.txt
+    """
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(output + '.prof')
+    if tracemalloc.is_tracing():
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with open(output + '.tracemalloc.txt', 'w', encoding='utf-8') as f:
+            f.write(f'peak traced memory: {peak} bytes\n')
+            for statistic in snapshot.statistics('lineno')[:TRACEMALLOC_TOP]:
+                f.write(f'{statistic}\n')
+
+
+def _configure_from_environment() -> None:
+    """
+    Switch on what the environment variables described at the top of this file ask for
+    """
+    destination = os.environ.get('YUMMYEATS_INSTRUMENT')
+    if destination:
+        enable()
+        atexit.register(_write_report, destination)
+
+    profiles = {name.strip() for name in os.environ.get('YUMMYEATS_PROFILE', '').split(',') if name.strip()}
+    if profiles:
+        profiler = None
+        if 'tracemalloc' in profiles:
+            tracemalloc.start()
+        if 'cprofile' in profiles:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        atexit.register(_write_profiles, profiler, os.environ.get('YUMMYEATS_PROFILE_OUTPUT', 'yummyeats_profile'))
+
+
+_configure_from_environment()
+
+
+if __name__ == "__main__":
+    # python_ta is only needed to check this file, so it is not imported along with the module
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['atexit', 'contextlib', 'cProfile', 'json', 'os', 'sys', 'threading', 'time',
+                          'tracemalloc', 'typing', 'python_ta'],
+        'allowed-io': ['_write_report', '_write_profiles'],
+        'max-line-length': 120
+    })
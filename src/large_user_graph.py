@@ -0,0 +1,196 @@
+"""
+This file generates large random bipartite graphs of users and the restaurants they have
+visited with numpy, for load testing the user predictors at millions of users
+
+Users are generated in blocks of USER_BLOCK_SIZE. Each block has its own seed derived from
+the graph's seed, so the same seed gives the same graph whether the blocks are generated in
+one process or many.
+
+Run this file to write a large graph for load tests; pass --help for its options.
+"""
+import argparse
+import multiprocessing
+from typing import Optional
+
+import numpy as np
+
+import Constants
+import create_usable_data
+import generate_sample_user_graph
+
+# the spread of the log-normal distribution user degrees are drawn from
+DEGREE_SIGMA = 0.8
+
+# the spread of a user's rating around the rating of the restaurant, out of 10
+RATING_SPREAD = 1.5
+
+# the number of users generated together, which bounds the memory used per block
+USER_BLOCK_SIZE = 1 << 16
+
+# the most rounds of drawing more restaurants for users who drew too many repeats; users still
+# short after that keep a smaller degree, which only happens to users drawing most of the restaurants
+MAX_DRAW_ROUNDS = 32
+
+
+def generate_sections(data_map: dict, user_size: int, rest_size: Optional[int], seed: int, processes: int,
+                      median_degree: float, popularity_exponent: float) -> tuple:
+    """
+    Return the items, kind names, kinds, offsets, neighbours, weights and categories of a random
+    graph connecting user_size users to rest_size restaurants of data_map (all of them if rest_size
+    is None), as taken by graph_container.write_graph. Restaurants come first, then the users,
+    which are the ints 0 to user_size - 1. The edges are generated by generate_edges, with the
+    mean rating of each restaurant taken from its rate in data_map.
+
+    Preconditions:
+        - user_size >= 0
+        - rest_size is None or 1 <= rest_size <= len(data_map)
+        - processes >= 1
+        - median_degree >= 1
+    """
+    rng = np.random.default_rng(seed)
+    names = sorted(data_map)
+    if rest_size is not None:
+        names = sorted(rng.choice(names, rest_size, replace=False).tolist())
+    mean_ratings = np.array([1 + 9 * data_map[name].rate for name in names])
+
+    users, rests, weights = generate_edges(user_size, mean_ratings, int(rng.integers(2 ** 63)), processes,
+                                           median_degree, popularity_exponent)
+
+    # the entries of the users are already sorted by user and then restaurant;
+    # a stable sort by restaurant gives the entries of the restaurants, sorted by user
+    num_rests = len(names)
+    by_rest = np.argsort(rests, kind='stable')
+    degrees = np.concatenate([np.bincount(rests, minlength=num_rests), np.bincount(users, minlength=user_size)])
+    offsets = np.zeros(num_rests + user_size + 1, dtype=np.int64)
+    np.cumsum(degrees, out=offsets[1:])
+    neighbours = np.concatenate([users[by_rest] + num_rests, rests]).astype(np.int32)
+    entry_weights = np.concatenate([weights[by_rest], weights]).astype(np.float32)
+
+    items = names + list(range(user_size))
+    kind_names = sorted([Constants.RESTAURANT, Constants.USER])
+    kinds = np.repeat(np.array([kind_names.index(Constants.RESTAURANT), kind_names.index(Constants.USER)],
+                               dtype=np.uint8), [num_rests, user_size])
+    return (items, kind_names, kinds, offsets, neighbours, entry_weights,
+            np.zeros(len(neighbours), dtype=np.uint8))
+
+
+def generate_edges(user_size: int, mean_ratings: np.ndarray, seed: int, processes: int, median_degree: float,
+                   popularity_exponent: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the users, restaurants and weights of the edges of a random bipartite graph of
+    user_size users and len(mean_ratings) restaurants, sorted by user and then restaurant.
+    Users and restaurants are given by their index.
+
+    User degrees are log-normal around median_degree, at least 1 and at most half the restaurants.
+    Each user visits distinct restaurants, drawn with Zipf popularity in a random order of the
+    restaurants. The weight of each edge is the restaurant's mean rating plus normal noise,
+    rounded and clipped to between 1 and 10, so well rated restaurants are liked more.
+
+    If processes > 1, blocks of USER_BLOCK_SIZE users are generated in a pool of that many processes.
+    The result depends only on the arguments other than processes.
+
+    Preconditions:
+        - user_size >= 0
+        - len(mean_ratings) >= 1
+        - processes >= 1
+    """
+    num_rests = len(mean_ratings)
+    rng = np.random.default_rng(seed)
+    popularity = np.empty(num_rests)
+    popularity[rng.permutation(num_rests)] = 1 / np.arange(1, num_rests + 1) ** popularity_exponent
+    cumulative = np.cumsum(popularity / popularity.sum())
+
+    block_seeds = np.random.SeedSequence(seed).spawn((user_size + USER_BLOCK_SIZE - 1) // USER_BLOCK_SIZE)
+    tasks = [(block_seed, min(USER_BLOCK_SIZE, user_size - i * USER_BLOCK_SIZE), cumulative, mean_ratings,
+              median_degree) for i, block_seed in enumerate(block_seeds)]
+    if processes > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(processes) as pool:
+            blocks = pool.starmap(_generate_block, tasks)
+    else:
+        blocks = [_generate_block(*task) for task in tasks]
+
+    if not blocks:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int8)
+    return (np.concatenate([block[0] + i * USER_BLOCK_SIZE for i, block in enumerate(blocks)]),
+            np.concatenate([block[1] for block in blocks]), np.concatenate([block[2] for block in blocks]))
+
+
+def _generate_block(block_seed: np.random.SeedSequence, user_size: int, cumulative: np.ndarray,
+                    mean_ratings: np.ndarray, median_degree: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the edges of user_size users as in generate_edges, with users numbered from 0,
+    where cumulative is the cumulative distribution of restaurant popularity
+    """
+    rng = np.random.default_rng(block_seed)
+    num_rests = len(cumulative)
+    degrees = np.rint(rng.lognormal(np.log(median_degree), DEGREE_SIGMA, user_size)).astype(np.int64)
+    degrees = np.clip(degrees, 1, max(1, num_rests // 2))
+
+    keys = _draw_distinct(rng, degrees, cumulative)
+    users, rests = np.divmod(keys, num_rests)
+    weights = np.clip(np.rint(mean_ratings[rests] + rng.normal(0, RATING_SPREAD, len(keys))), 1, 10).astype(np.int8)
+    return users, rests, weights
+
+
+def _draw_distinct(rng: np.random.Generator, degrees: np.ndarray, cumulative: np.ndarray) -> np.ndarray:
+    """
+    Return the sorted keys user * len(cumulative) + restaurant of degrees[user] distinct
+    restaurants for every user, drawn from the cumulative popularity distribution.
+
+    Each user keeps the first distinct restaurants of a sequence of draws with replacement,
+    which is the same as drawing without replacement one restaurant at a time. Every round
+    draws about twice what each user is missing, and only users still short take part in
+    the next round, so a few users who need many draws never slow down the rest.
+    """
+    num_rests = len(cumulative)
+    done = []
+    short = np.arange(len(degrees))
+    drawn = np.empty(0, dtype=np.int64)
+    for _ in range(MAX_DRAW_ROUNDS):
+        missing = degrees[short] - np.bincount(drawn // num_rests, minlength=len(degrees))[short]
+        users = np.repeat(short, 2 * missing + 2)
+        rests = np.minimum(np.searchsorted(cumulative, rng.random(len(users)), side='right'), num_rests - 1)
+        drawn = np.concatenate([drawn, users * num_rests + rests])
+
+        # the first draw of each key, in the order drawn, grouped by user
+        _, first = np.unique(drawn, return_index=True)
+        drawn = drawn[np.sort(first)]
+        drawn = drawn[np.argsort(drawn // num_rests, kind='stable')]
+        users = drawn // num_rests
+        rank = np.arange(len(drawn)) - np.searchsorted(users, users)
+        drawn = drawn[rank < degrees[users]]
+
+        users = drawn // num_rests
+        finished = np.bincount(users, minlength=len(degrees)) == degrees
+        done.append(drawn[finished[users]])
+        drawn = drawn[~finished[users]]
+        short = short[~finished[short]]
+        if len(short) == 0:
+            break
+
+    done.append(drawn)
+    return np.sort(np.concatenate(done))
+
+
+if __name__ == "__main__":
+    import main
+    import synthetic_data
+
+    parser = argparse.ArgumentParser(description='Write a large random user graph in the format of Graph.save.')
+    parser.add_argument('output', help='the file to write')
+    parser.add_argument('--users', type=synthetic_data.parse_size, default=synthetic_data.parse_size('100k'),
+                        help='the number of users, like 1m')
+    parser.add_argument('--restaurants', type=int, default=None, help='the number of restaurants (default: all)')
+    parser.add_argument('--input', default=main.input_file, help='the csv file to read restaurants from')
+    parser.add_argument('--rows', type=int, default=main.number_rows, help='the number of rows to read')
+    parser.add_argument('--seed', type=int, default=0, help='the seed the graph is generated from')
+    parser.add_argument('--processes', type=int, default=1, help='the number of processes to generate in')
+    parser.add_argument('--median-degree', type=float, default=generate_sample_user_graph.MEDIAN_DEGREE,
+                        help='the median number of restaurants per user')
+    parser.add_argument('--popularity-exponent', type=float, default=generate_sample_user_graph.POPULARITY_EXPONENT,
+                        help='the exponent of the Zipf distribution of restaurant popularity')
+    args = parser.parse_args()
+
+    generator = generate_sample_user_graph.Generate_Graph(create_usable_data.load_valid_rows(args.input, args.rows))
+    generator.write_large_graph(args.output, args.users, args.restaurants, args.seed, args.processes,
+                                args.median_degree, args.popularity_exponent)
@@ -1,20 +1,32 @@
 """
 This is the main file to run this project
+
+Importing this file does no work: the data and graphs are built by main.context
+the first time they are used.
 """
 
-import create_usable_data
+import app_context
 import graph_container
-import generate_sample_user_graph
 
 input_file = 'zomato.csv'
 number_rows = 10000
-usable_data = create_usable_data.select_valid_rows(input_file, number_rows)
-graph = graph_container.Graph()
 
-# this is a sample graph
+# weights for the sample graph
 wm = {'location': 9, 'rest_type': 8, 'cuisines': 4, 'approx_cost': 7}
-g = graph_container.Graph()
-sample_graph = create_usable_data.create_graph(usable_data, wm, g)
+# similarity tables built with context.build_similarity_table are saved here
+table_dir = 'similarity_tables'
+context = app_context.App_Context(input_file, number_rows, wm, table_dir)
+
+
+def __getattr__(name: str) -> object:
+    """
+    Build usable_data and sample_graph on first access, so code written
+    against the old module-level variables keeps working
+    """
+    getters = {'usable_data': context.get_usable_data, 'sample_graph': context.get_sample_graph}
+    if name in getters:
+        return getters[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # creating graph helper functions
@@ -25,9 +37,7 @@ def create_user_graph() -> graph_container.Graph:
     """
     Creates a random user graph
     """
-    generator = generate_sample_user_graph.Generate_Graph(usable_data)
-    user_rest_graph = generator.create_random_graph(50, 15)
-    return user_rest_graph
+    return context.create_user_graph()
 
 
 # code to generate structured hard coded graph:
@@ -36,7 +46,7 @@ def create_user_graph() -> graph_container.Graph:
 #     """
 #     create static graph
 #     """
-#     generator = generate_sample_user_graph.Generate_Graph(usable_data)
+#     generator = generate_sample_user_graph.Generate_Graph(context.get_usable_data())
 #     user_rest_graph = generator.create_static_graph()
 #     return user_rest_graph
 
@@ -45,11 +55,11 @@ if __name__ == '__main__':
     # uncomment this to run the interface to show either interface
     # see report for more information
 
-    # with open("show_popular_restaurants.py") as file:
-    #     exec(file.read())
+    # import show_popular_restaurants as interface
+
+    import show_similar_restaurants as interface
 
-    with open("show_similar_restaurants.py") as file:
-        exec(file.read())
+    interface.run_visual()
 
     # Take a look at these restaurants, pick your top 3 that sound the most
     # appetizing to you. Try to copy paste this into the similar restaurants' predictor:
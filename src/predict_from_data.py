@@ -2,76 +2,480 @@
 Apply collaborative filtering to get recommendations for restaurant to restaurant
 and user to user data
 """
-import python_ta
+from __future__ import annotations
+import heapq
+import os
+from typing import TYPE_CHECKING, Optional
 
+import instrumentation
 from graph_container import Graph
+from result_cache import LRU_Cache
+
+if TYPE_CHECKING:
+    from ann_index import ANN_Index
+    from collaborative_filtering import Item_Based_CF, User_Based_CF
+    from similarity_table import Similarity_Table
+    from sparse_graph import Sparse_Graph
+
+# the number of items scored together, which bounds the size of the dense array of scores
+# the sparse backend builds for a batch, and of the dot products the pairwise one keeps
+SCORE_BATCH_SIZE = 256
+
+# the largest number of weight profiles whose Similarity_Table, or lack of one, is remembered at once
+TABLE_CACHE_SIZE = 16
 
 
 class Similarity_Computations:
     """
     A class to handle the computations to give predictions
+
+    Instance Attributes:
+        - graph: the graph the predictions are made from
+        - use_sparse: whether similarity scores are computed from a compiled Sparse_Graph
+          instead of comparing vertices one pair at a time
+        - target_recall: if not None, top-k queries are answered approximately from an
+          ANN_Index calibrated to reach this recall@k against the exact scores
+        - table_dir: if not None, the directory searched for a Similarity_Table of each kind
+          and weight profile queried, at the path given by similarity_table.table_path
+        - cache: the recent results of top_k_similar, find_similar_qualities and
+          recommend_restaurants, keyed by their arguments and the graph version, with its hit and miss counts
+
+    Representation Invariants:
+        - self.target_recall is None or 0 <= self.target_recall <= 1
     """
     graph: Graph
+    use_sparse: bool
+    target_recall: Optional[float]
+    table_dir: Optional[str]
+    cache: LRU_Cache
+    # Private Instance Attributes:
+    #   - _compiled: mapping from vertex kind to the Sparse_Graph compiled for it
+    #   - _ann_indexes: mapping from (vertex kind, weight profile) to the ANN_Index built for it,
+    #     from the Sparse_Graph compiled at the graph version given by its compiled attribute
+    #   - _tables: the TABLE_CACHE_SIZE most recently used entries mapping (vertex kind, weight profile)
+    #     to the graph version its Similarity_Table was added at, the modification time of the
+    #     file it was looked up in (None if there was no file), and the table, or None if there is no usable one
+    #   - _cache_version: the graph version the entries in cache were computed at
+    #   - _user_cf: the User_Based_CF built for the graph, or None if there is none yet
+    #   - _item_cf: the Item_Based_CF built for the graph, or None if there is none yet
+    _compiled: dict[str, Sparse_Graph]
+    _ann_indexes: dict[tuple[str, Optional[tuple]], ANN_Index]
+    _tables: LRU_Cache
+    _cache_version: int
+    _user_cf: Optional[User_Based_CF]
+    _item_cf: Optional[Item_Based_CF]
 
-    def __init__(self, graph: Graph):
+    def __init__(self, graph: Graph, use_sparse: bool = False, target_recall: Optional[float] = None,
+                 table_dir: Optional[str] = None, cache_size: int = 1024):
         """
         Initialize new Similarity_Computations class with a given graph
+
+        If use_sparse is True, the graph is compiled into a Sparse_Graph the first time
+        each kind is queried, and compiled again the first time it is queried after the graph changes.
+
+        If target_recall is given, an ANN_Index is built and calibrated the first time each
+        kind is queried with each weight_map. Its measured recall is reported by get_ann_index,
+        and queries fall back to the exact scores of a Sparse_Graph if it is below target_recall.
+
+        Top-k queries are answered from a Similarity_Table whenever there is one for the kind
+        and weight_map queried, either added with add_similarity_table or found in table_dir,
+        as long as the graph has not changed since.
+
+        Up to cache_size recent results are kept in cache. Changing the graph discards them.
         """
         self.graph = graph
+        self.use_sparse = use_sparse
+        self.target_recall = target_recall
+        self.table_dir = table_dir
+        self._compiled = {}
+        self._ann_indexes = {}
+        self._tables = LRU_Cache(TABLE_CACHE_SIZE)
+        self.cache = LRU_Cache(cache_size)
+        self._cache_version = graph.version
+        self._user_cf = None
+        self._item_cf = None
 
-    def generate_from_similarity_scores(self, item: str, kind: str) -> set[str]:
+    def compile_sparse(self, kind: str) -> Sparse_Graph:
         """
-        Return a set of top 20 restaurants most similar to the given one or user
-        by finding their cosine similarities
+        Compile the vertices of the given kind into a Sparse_Graph, replacing any
+        previously compiled one, and return it.
+        """
+        # imported here so numpy and scipy are only loaded when the sparse backend is used
+        import sparse_graph
+
+        with instrumentation.stage('sparse_compiling'):
+            compiled = sparse_graph.Sparse_Graph(self.graph, kind)
+        self._compiled[kind] = compiled
+        self._ann_indexes = {key: index for key, index in self._ann_indexes.items() if key[0] != kind}
+        return compiled
+
+    def _get_compiled(self, kind: str) -> Sparse_Graph:
+        """
+        Return the Sparse_Graph compiled for the given kind, compiling it if there is none yet
+        or the graph has changed since it was compiled.
+        """
+        if kind not in self._compiled or self._compiled[kind].version != self.graph.version:
+            return self.compile_sparse(kind)
+        return self._compiled[kind]
+
+    def get_ann_index(self, kind: str, weight_map: Optional[dict[str, int]] = None) -> ANN_Index:
+        """
+        Return the ANN_Index over the vertices of the given kind hashed with weight_map,
+        building one and calibrating it to target_recall if there is none yet or the graph
+        has changed since it was built.
+        Its recall attribute is the recall@20 it reached, which is below target_recall
+        if calibration could not reach it; top-k queries then do not use the index.
+
         Precondition:
-            - kind == Constants.RESTAURANT or kind == Constants.USER
+            - self.target_recall is not None
+        """
+        key = _profile_key(kind, weight_map)
+        if key not in self._ann_indexes or self._ann_indexes[key].compiled.version != self.graph.version:
+            # imported here so numpy and scipy are only loaded when the index is used
+            import ann_index
+
+            index = ann_index.ANN_Index(self._get_compiled(kind), weight_map)
+            index.calibrate(self.target_recall)
+            self._ann_indexes[key] = index
+        return self._ann_indexes[key]
+
+    def get_user_cf(self) -> User_Based_CF:
+        """
+        Return the User_Based_CF of the graph, building it if there is none yet
+        or the graph has changed since it was built.
+
+        Precondition:
+            - every neighbour of a user in the graph is a restaurant
+        """
+        if self._user_cf is None or self._user_cf.ratings.version != self.graph.version:
+            # imported here so numpy and scipy are only loaded when collaborative filtering is used
+            import collaborative_filtering
+
+            self._user_cf = collaborative_filtering.User_Based_CF(self.graph)
+        return self._user_cf
+
+    def get_item_cf(self) -> Item_Based_CF:
+        """
+        Return the Item_Based_CF of the graph, building it if there is none yet or the graph
+        has changed since it was built other than through add_rating.
+
+        Precondition:
+            - every neighbour of a restaurant in the graph is a user
+        """
+        if self._item_cf is None or self._item_cf.version != self.graph.version:
+            # imported here so numpy and scipy are only loaded when collaborative filtering is used
+            import collaborative_filtering
+
+            self._item_cf = collaborative_filtering.Item_Based_CF(self.graph)
+        return self._item_cf
+
+    def add_rating(self, user: int, restaurant: str, rating: int) -> None:
         """
-        if item not in self.graph.get_all_vertices(kind):
+        Set user's rating of restaurant in the graph, adding user if it is not in the graph yet.
+        If the Item_Based_CF of the graph is up to date, only the neighbourhoods the rating
+        affects are updated, instead of building it again on the next query.
+        Raise ValueError if restaurant is not a restaurant of the graph.
+
+        Precondition:
+            - 1 <= rating <= 10
+        """
+        if self._item_cf is not None and self._item_cf.version == self.graph.version:
+            self._item_cf.add_rating(user, restaurant, rating)
+        elif restaurant not in self.graph.get_all_vertices('restaurant'):
             raise ValueError
+        else:
+            self.graph.add_vertex(user, 'user')
+            self.graph.add_edge(user, restaurant, rating)
+
+    def add_similarity_table(self, table: Similarity_Table) -> None:
+        """
+        Answer top-k queries for the kind and weight profile of table from it, until the graph
+        changes or more than TABLE_CACHE_SIZE other weight profiles have been queried since it was last used.
+
+        Preconditions:
+            - the rows of table are the vertices of table.kind in self.graph
+        """
+        self._tables.put(_profile_key(table.kind, table.weight_map), (self.graph.version, None, table))
+
+    def get_similarity_table(self, kind: str,
+                             weight_map: Optional[dict[str, int]] = None) -> Optional[Similarity_Table]:
+        """
+        Return the Similarity_Table for the given kind and weight profile, loading it from
+        table_dir the first time it is asked for, or None if there is none.
+
+        A table in table_dir whose fingerprint differs from that of the graph's Sparse_Graph
+        for kind and weight_map was built from other data or weights, so it is not used, and
+        neither is any table once the graph has changed since it was added.
+        When there is no usable table, table_dir is checked again on the next call, and the
+        table is loaded if its file has been created or changed since.
+        """
+        key = _profile_key(kind, weight_map)
+        entry = self._tables.get(key)
+        if entry is None or (entry[2] is None and self._table_file_time(kind, weight_map) != entry[1]):
+            entry = self._load_table(kind, weight_map)
+            self._tables.put(key, entry)
+
+        version, _, table = entry
+        return table if version == self.graph.version else None
+
+    def _table_file_time(self, kind: str, weight_map: Optional[dict[str, int]]) -> Optional[int]:
+        """
+        Return the modification time in nanoseconds of the file in table_dir holding the
+        Similarity_Table for the given kind and weight profile, or None if there is no such file.
+        """
+        if self.table_dir is None:
+            return None
+        # imported here so numpy is only loaded when tables are used
+        import similarity_table
+
+        try:
+            return os.stat(similarity_table.table_path(self.table_dir, kind, weight_map)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load_table(self, kind: str, weight_map: Optional[dict[str, int]]) -> tuple:
+        """
+        Return the entry of _tables for the given kind and weight profile, loading its
+        Similarity_Table from table_dir if there is a usable one
+        """
+        file_time = self._table_file_time(kind, weight_map)
+        table = None
+        if file_time is not None:
+            # imported here so numpy is only loaded when tables are used
+            import similarity_table
+
+            table = similarity_table.load_table(similarity_table.table_path(self.table_dir, kind, weight_map))
+            if table.fingerprint != self._get_compiled(kind).fingerprint(weight_map):
+                table = None
+        return self.graph.version, file_time, table
+
+    def compute_similarity_scores(self, item: str, kind: str,
+                                  weight_map: Optional[dict[str, int]] = None) -> dict[str, float]:
+        """
+        Return a dictionary mapping every other vertex of the given kind to its
+        cosine similarity with item.
+        Raise ValueError if item is not a vertex of the given kind.
 
-        accum_dict = {}
-        accum_list = []
+        If weight_map is given, it maps edge categories to the weight every edge in that
+        category is scored with, for this call only. The graph is not changed, so
+        queries with different weights never affect each other.
+
+        The pairwise computation through Graph.get_all_similarity_scores, which gives the
+        scores of Graph.get_similarity_score, is the reference implementation; the sparse
+        one must give the same scores.
+        """
         connections = self.graph.get_all_vertices(kind)
-        for connection in connections:
-            sim = self.graph.get_similarity_score(item, connection)
-            if connection == item:
-                pass
-            else:
-                accum_dict[sim] = connection
-                accum_list.append(sim)
+        if item not in connections:
+            raise ValueError
+
+        if self.use_sparse:
+            compiled = self._get_compiled(kind)
+            with instrumentation.stage('similarity_scan'):
+                scores = dict(zip(compiled.rows, compiled.similarity_scores(item, weight_map).tolist()))
+            instrumentation.count('similarity_evaluations', len(compiled.rows))
+            scores.pop(item)
+            return scores
+
+        with instrumentation.stage('similarity_scan'):
+            scores = self.graph.get_all_similarity_scores(item, kind, weight_map)
+        scores.pop(item)
+        return scores
+
+    def top_k_similar(self, item: str, kind: str, k: int = 20,
+                      weight_map: Optional[dict[str, int]] = None) -> list[tuple[str, float]]:
+        """
+        Return the k vertices of the given kind most similar to item as (name, score) pairs,
+        from most to least similar. Vertices with equal scores are ordered by name, so
+        restaurants that tie are never dropped and the result is deterministic.
+        Raise ValueError if item is not a vertex of the given kind.
+        weight_map is used as in compute_similarity_scores.
 
-        limit = min(20, len(accum_list))
-        accum_list.sort(reverse=True)
+        If target_recall is set, the result is approximate: it comes from get_ann_index and
+        may miss some of the most similar vertices or hold fewer than k pairs. If that index
+        did not reach target_recall, the result is computed exactly from a Sparse_Graph instead.
+        If there is a Similarity_Table for kind and weight_map with at least k neighbours
+        per vertex, the result is looked up in it instead.
 
-        return {accum_dict[x] for x in accum_list[:limit]}
+        Precondition:
+            - kind == Constants.RESTAURANT or kind == Constants.USER
+            - k >= 0
+        """
+        key = self._cache_key('top_k_similar', item, kind, k, weight_map)
+        result = self.cache.get(key)
+        instrumentation.count('cache_misses' if result is None else 'cache_hits')
+        if result is None:
+            result = tuple(self._top_k_similar(item, kind, k, weight_map))
+            self.cache.put(key, result)
+        return list(result)
 
-    def find_similar_restaurants(self, sim_list: list[set[str]], limit: int) -> list[str]:
+    def _top_k_similar(self, item: str, kind: str, k: int,
+                       weight_map: Optional[dict[str, int]]) -> list[tuple[str, float]]:
         """
-        Given a list of similar restaurant sets, find the ones that are most relevant
-        To do this, we will take the intersection between the various sets given in the
+        Return top_k_similar(item, kind, k, weight_map) without looking in the cache
+        """
+        table = self.get_similarity_table(kind, weight_map)
+        if self.use_sparse or self.target_recall is not None or (table is not None and k <= table.k):
+            return self._top_k_similar_batch([item], kind, k, weight_map)[0]
+
+        scores = self.compute_similarity_scores(item, kind, weight_map)
+        # nsmallest keeps a heap of at most k pairs, so this is O(n log k) rather than a full sort
+        with instrumentation.stage('ranking'):
+            return heapq.nsmallest(k, scores.items(), key=lambda pair: (-pair[1], pair[0]))
+
+    def top_k_similar_batch(self, items: list[str], kind: str, k: int = 20,
+                            weight_map: Optional[dict[str, int]] = None) -> list[list[tuple[str, float]]]:
+        """
+        Return [self.top_k_similar(item, kind, k, weight_map) for item in items],
+        scoring every vertex of the given kind against all of items in one pass.
+        With use_sparse, that pass is one sparse matrix-matrix product per SCORE_BATCH_SIZE items.
+        Raise ValueError if an item is not a vertex of the given kind.
+        If target_recall is set, each item is instead queried against get_ann_index if it reached
+        target_recall, and against a Sparse_Graph if it did not.
+        If there is a Similarity_Table as in top_k_similar, each item is looked up in it.
+
+        Precondition:
+            - kind == Constants.RESTAURANT or kind == Constants.USER
+            - k >= 0
+        """
+        keys = [self._cache_key('top_k_similar', item, kind, k, weight_map) for item in items]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        instrumentation.count('cache_hits', len(items) - len(missing))
+        instrumentation.count('cache_misses', len(missing))
+        if missing:
+            computed = self._top_k_similar_batch([items[i] for i in missing], kind, k, weight_map)
+            for i, result in zip(missing, computed):
+                results[i] = tuple(result)
+                self.cache.put(keys[i], results[i])
+        return [list(result) for result in results]
+
+    def _top_k_similar_batch(self, items: list[str], kind: str, k: int,
+                             weight_map: Optional[dict[str, int]]) -> list[list[tuple[str, float]]]:
+        """
+        Return top_k_similar_batch(items, kind, k, weight_map) without looking in the cache
+        """
+        connections = self.graph.get_all_vertices(kind)
+        if any(item not in connections for item in items):
+            raise ValueError
+
+        table = self.get_similarity_table(kind, weight_map)
+        if table is not None and k <= table.k:
+            instrumentation.count('table_lookups', len(items))
+            with instrumentation.stage('table_lookup'):
+                return [table.top_k(item, k) for item in items]
+
+        if self.target_recall is not None:
+            index = self.get_ann_index(kind, weight_map)
+            if index.recall >= self.target_recall:
+                instrumentation.count('ann_queries', len(items))
+                with instrumentation.stage('ann_query'):
+                    return [index.top_k(item, k) for item in items]
+            # the index could not be calibrated to target_recall, so its results would be
+            # less accurate than promised and the exact scan below is used instead
+            instrumentation.count('ann_fallbacks', len(items))
+
+        if self.use_sparse or self.target_recall is not None:
+            compiled = self._get_compiled(kind)
+            results = []
+            for start in range(0, len(items), SCORE_BATCH_SIZE):
+                batch = items[start:start + SCORE_BATCH_SIZE]
+                with instrumentation.stage('similarity_scan'):
+                    scores = compiled.similarity_matrix(batch, weight_map)
+                instrumentation.count('similarity_evaluations', scores.size)
+                with instrumentation.stage('ranking'):
+                    results.extend(compiled.top_k(scores[:, i], k, item) for i, item in enumerate(batch))
+            return results
+
+        results = []
+        for start in range(0, len(items), SCORE_BATCH_SIZE):
+            results.extend(self._top_k_pairwise(items[start:start + SCORE_BATCH_SIZE], kind, k, weight_map))
+        return results
+
+    def _top_k_pairwise(self, items: list[str], kind: str, k: int,
+                        weight_map: Optional[dict[str, int]]) -> list[list[tuple[str, float]]]:
+        """
+        Return top_k_similar_batch(items, kind, k, weight_map) computed with Graph.get_similarity_scores
+        """
+        # one bounded heap per item, whose smallest entry is the worst pair kept so far.
+        # The heaps are updated as the scores are computed, so this time counts as similarity_scan
+        heaps = [[] for _ in items]
+        with instrumentation.stage('similarity_scan'):
+            for connection, scores in self.graph.get_similarity_scores(items, kind, weight_map):
+                for item, heap, score in zip(items, heaps, scores):
+                    if connection == item:
+                        continue
+                    if len(heap) < k:
+                        heapq.heappush(heap, (score, _Reversed_Name(connection)))
+                    elif heap and (score > heap[0][0] or (score == heap[0][0] and connection < heap[0][1].name)):
+                        heapq.heapreplace(heap, (score, _Reversed_Name(connection)))
+
+        with instrumentation.stage('ranking'):
+            return [[(entry.name, score) for score, entry in sorted(heap, reverse=True)] for heap in heaps]
+
+    def generate_from_similarity_scores(self, item: str, kind: str,
+                                        weight_map: Optional[dict[str, int]] = None) -> set[str]:
+        """
+        Return a set of top 20 restaurants most similar to the given one or user
+        by finding their cosine similarities
+        weight_map is used as in compute_similarity_scores.
+        Precondition:
+            - kind == Constants.RESTAURANT or kind == Constants.USER
+        """
+        return {name for name, _ in self.top_k_similar(item, kind, 20, weight_map)}
+
+    def generate_from_similarity_scores_batch(self, items: list[str], kind: str,
+                                              weight_map: Optional[dict[str, int]] = None) -> list[set[str]]:
+        """
+        Return [self.generate_from_similarity_scores(item, kind, weight_map) for item in items],
+        scoring all of items in one pass as in top_k_similar_batch.
+        Precondition:
+            - kind == Constants.RESTAURANT or kind == Constants.USER
+        """
+        return [{name for name, _ in top} for top in self.top_k_similar_batch(items, kind, 20, weight_map)]
+
+    def _cache_key(self, method: str, seed: object, kind: str, k: Optional[int],
+                   weight_map: Optional[dict[str, int]]) -> tuple:
+        """
+        Return the key the result of the given method for these arguments is cached under.
+        If the graph has changed since the cached results were computed, discard them first.
+        """
+        if self._cache_version != self.graph.version:
+            self.cache.clear()
+            self._cache_version = self.graph.version
+        return method, seed, kind, k, _profile_key(kind, weight_map)[1], self.graph.version
+
+    def find_similar_restaurants(self, sim_list: list[dict[str, float]], limit: int) -> list[str]:
+        """
+        Given a list of mappings from similar restaurants to their similarity scores, find the
+        ones that are most relevant
+        To do this, we will take the intersection between the various mappings given in the
         list and return it as it is the most overlapped restaurants.
         Return elements up to the given limit. If limit == -1, return all the elements
 
         If there is no intersection, return the restaurants from the first item of the sim_list
 
+        The restaurants are ordered by their total score across the mappings they are taken
+        from, highest first, and restaurants with equal totals by name, so the result is deterministic.
+
         Precondition:
             - len(sim_list) > 0
         """
 
-        intersect = sim_list[0]
-        for lst in sim_list[1:]:
-            intersect = intersect.intersection(lst)
+        intersect = sim_list[0].keys()
+        for scores in sim_list[1:]:
+            intersect = intersect & scores.keys()
 
-        intersect_lst = list(intersect)
-        if len(intersect_lst) == 0:
-            limit = min(limit, len(sim_list[0]))
-            first_sim = list(sim_list[0])
-            return list(first_sim[:limit])
+        if len(intersect) == 0:
+            sources = sim_list[:1]
+            intersect = sim_list[0].keys()
+        else:
+            sources = sim_list
 
-        if limit == -1 or limit > len(intersect):
-            return intersect_lst
+        ranked = sorted(intersect, key=lambda name: (-sum(scores[name] for scores in sources), name))
+        if limit == -1:
+            return ranked
 
-        return intersect_lst[:limit]
+        return ranked[:limit]
 
     def find_similar_qualities(self, sim_list: list[str], kind: str) -> list[str]:
         """
@@ -84,6 +488,18 @@ class Similarity_Computations:
         Precondition:
             - kind == Constants.RESTAURANT or kind == Constants.USER
         """
+        key = self._cache_key('find_similar_qualities', tuple(sim_list), kind, None, None)
+        result = self.cache.get(key)
+        instrumentation.count('cache_misses' if result is None else 'cache_hits')
+        if result is None:
+            result = tuple(self._find_similar_qualities(sim_list, kind))
+            self.cache.put(key, result)
+        return list(result)
+
+    def _find_similar_qualities(self, sim_list: list[str], kind: str) -> list[str]:
+        """
+        Return find_similar_qualities(sim_list, kind) without looking in the cache
+        """
         all_restaurants = self.graph.get_all_vertices(kind)
         # initialize an empty dictionary to begin with
         sum_dict = {}
@@ -129,10 +545,86 @@ class Similarity_Computations:
         sorted_rest_occurences = sorted(rest_occurences)
         return sorted_rest_occurences[:7]
 
+    def recommend_restaurants(self, user: int, n: int = 10, item_based: bool = False) -> list[tuple[str, float]]:
+        """
+        Return the n restaurants user has not visited that they are predicted to like most,
+        as (restaurant, predicted rating) pairs from highest to lowest, as given by
+        User_Based_CF.recommend, or Item_Based_CF.recommend if item_based is True.
+        There may be fewer than n.
+        This method will only work if it is being used for a graph with users
+        connecting to restaurants.
+        Raise ValueError if user is not a user of the graph.
+
+        Precondition:
+            - n >= 0
+        """
+        key = self._cache_key('recommend_restaurants', (user, item_based), 'user', n, None)
+        result = self.cache.get(key)
+        instrumentation.count('cache_misses' if result is None else 'cache_hits')
+        if result is None:
+            model = self.get_item_cf() if item_based else self.get_user_cf()
+            result = tuple(model.recommend(user, n))
+            self.cache.put(key, result)
+        return list(result)
+
+    def recommend_restaurants_batch(self, users: list[int], n: int = 10,
+                                    item_based: bool = False) -> list[list[tuple[str, float]]]:
+        """
+        Return [self.recommend_restaurants(user, n, item_based) for user in users], predicting
+        the ratings of all the users missing from the cache together.
+        Raise ValueError if a user is not a user of the graph.
+
+        Precondition:
+            - n >= 0
+        """
+        keys = [self._cache_key('recommend_restaurants', (user, item_based), 'user', n, None) for user in users]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        instrumentation.count('cache_hits', len(users) - len(missing))
+        instrumentation.count('cache_misses', len(missing))
+        if missing:
+            model = self.get_item_cf() if item_based else self.get_user_cf()
+            computed = model.recommend_batch([users[i] for i in missing], n)
+            for i, result in zip(missing, computed):
+                results[i] = tuple(result)
+                self.cache.put(keys[i], results[i])
+        return [list(result) for result in results]
+
+
+def _profile_key(kind: str, weight_map: Optional[dict[str, int]]) -> tuple[str, Optional[tuple]]:
+    """
+    Return a hashable key identifying the given kind and weight profile
+    """
+    return kind, None if weight_map is None else tuple(sorted(weight_map.items()))
+
+
+class _Reversed_Name:
+    """
+    A name that compares as smaller than every larger name, so that a min-heap of
+    (score, _Reversed_Name) pairs keeps the lowest score with the largest name on top
+    """
+    name: str
+
+    def __init__(self, name: str) -> None:
+        """
+        Wrap the given name
+        """
+        self.name = name
+
+    def __lt__(self, other: _Reversed_Name) -> bool:
+        """
+        Return whether this name is larger than other's
+        """
+        return other.name < self.name
+
 
 if __name__ == "__main__":
+    # python_ta is only needed to check this file, so it is not imported along with the module
+    import python_ta
+
     python_ta.check_all(config={
-        'extra-imports': ['graph_container'],
+        'extra-imports': ['annotations', 'heapq', 'os', 'typing', 'instrumentation', 'graph_container', 'result_cache',
+                          'sparse_graph', 'ann_index', 'similarity_table', 'collaborative_filtering'],
         'allowed-io': [],  # the names (strs) of functions that call print/open/input
         'max-line-length': 120
     })
@@ -0,0 +1,274 @@
+"""
+This file serves the recommendations as JSON over HTTP using only the standard library,
+so programs and load tests can use them without the interfaces or a network connection
+
+Endpoints (all GET, all answering with a JSON object):
+    - /similar-restaurants?restaurant=A&restaurant=B&restaurant=C&location=9&price=7&cuisines=4&rest_type=8
+      the restaurants similar to all the given ones, their average price and rating and their
+      most common location, as shown by show_similar_restaurants. Each priority from 0 to 10
+      defaults to the weight the sample graph was built with.
+    - /common-qualities?restaurant=A&restaurant=B
+      the qualities the given restaurants have most in common
+    - /most-liked
+      the restaurants the users of the server's user graph like most
+    - /recommend-for-user?user=3&n=10&model=user
+      the n restaurants (10 by default) a user of the server's user graph has not visited and is
+      predicted to like most, with their predicted ratings, from user-based (model=user, the
+      default) or item-based (model=item) collaborative filtering
+A request whose query parameters are not valid gets status 400, an unknown path 404,
+a request that fails for any other reason 500, and a request that is not answered within
+the timeout 504.
+
+Run this file to start a server; pass --help for its options.
+"""
+import argparse
+import concurrent.futures
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlsplit
+
+import Constants
+import app_context
+import recommendations
+
+# the default number of seconds a request may take before it is answered with status 504
+DEFAULT_TIMEOUT = 10.0
+
+# the query parameter holding each priority of /similar-restaurants, and its edge category
+PRIORITY_PARAMETERS = {'location': Constants.LOCATION, 'price': Constants.APPROX_COST,
+                       'cuisines': Constants.CUISINES, 'rest_type': Constants.REST_TYPE}
+
+
+class Bad_Request(Exception):
+    """
+    Raised by an endpoint when the query parameters of its request are not valid
+    """
+
+
+class Recommendation_Server(ThreadingHTTPServer):
+    """
+    An HTTP server answering the endpoints described at the top of this file.
+
+    Each connection is read on its own thread, but the recommendations are computed on a
+    pool of worker threads shared by all requests, so at most workers are computed at once.
+    All requests share the data, graphs and caches of one App_Context.
+
+    Instance Attributes:
+        - context: the application state the recommendations are computed from
+        - request_timeout: the number of seconds a request may take before it is answered
+          with status 504
+        - pool: the worker threads the recommendations are computed on
+        - quiet: whether requests are not logged to stderr
+    """
+    context: app_context.App_Context
+    request_timeout: float
+    pool: concurrent.futures.ThreadPoolExecutor
+    quiet: bool
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], context: app_context.App_Context, workers: int = 4,
+                 request_timeout: float = DEFAULT_TIMEOUT, quiet: bool = False) -> None:
+        """
+        Initialize a new server listening on address. Nothing is loaded until
+        load is called or the first request needs it.
+
+        Preconditions:
+            - workers >= 1
+            - request_timeout > 0
+        """
+        super().__init__(address, _Request_Handler)
+        self.context = context
+        self.request_timeout = request_timeout
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.quiet = quiet
+
+    def load(self) -> None:
+        """
+        Load the usable data, the graphs and their predictors, so the first requests
+        do not wait for them
+        """
+        self.context.warm_up(background=False)
+        self.context.get_user_predictor()
+
+    def server_close(self) -> None:
+        """
+        Stop listening and drop the requests still waiting for a worker
+        """
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _Request_Handler(BaseHTTPRequestHandler):
+    """
+    Answers one HTTP request to a Recommendation_Server
+    """
+    server: Recommendation_Server
+
+    def do_GET(self) -> None:
+        """
+        Compute the response to a GET request on the server's pool and send it
+        """
+        url = urlsplit(self.path)
+        if url.path not in ENDPOINTS:
+            self._send(404, {'error': f'unknown endpoint {url.path}'})
+            return
+
+        query = parse_qs(url.query)
+        future = self.server.pool.submit(ENDPOINTS[url.path], self.server.context, query)
+        try:
+            body = future.result(timeout=self.server.request_timeout)
+        except concurrent.futures.TimeoutError:
+            # a computation that has started cannot be stopped, but one still waiting never starts
+            future.cancel()
+            self._send(504, {'error': 'timed out'})
+        except Bad_Request as error:
+            self._send(400, {'error': str(error)})
+        except Exception as error:
+            self.log_error('error computing %s: %r', self.path, error)
+            self._send(500, {'error': 'internal error'})
+        else:
+            self._send(200, body)
+
+    def _send(self, status: int, body: dict) -> None:
+        """
+        Send body as a JSON response with the given status
+        """
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """
+        Log a request to stderr unless the server is quiet
+        """
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def similar_restaurants(context: app_context.App_Context, query: dict[str, list[str]]) -> dict:
+    """
+    Return the response to /similar-restaurants with the given query parameters.
+    Raise Bad_Request if they are not valid.
+    """
+    names = _restaurant_parameters(context, query)
+    weight_map = dict(context.weight_map)
+    for parameter, category in PRIORITY_PARAMETERS.items():
+        if parameter in query:
+            priority = _int_parameter(query, parameter)
+            if priority < 0 or priority > 10:
+                raise Bad_Request(f'{parameter} must be between 0 and 10')
+            weight_map[category] = priority
+
+    return dict(zip(recommendations.SIMILAR_FIELDS,
+                    recommendations.similar_restaurants(context, names, weight_map)))
+
+
+def common_qualities(context: app_context.App_Context, query: dict[str, list[str]]) -> dict:
+    """
+    Return the response to /common-qualities with the given query parameters.
+    Raise Bad_Request if they are not valid.
+    """
+    names = _restaurant_parameters(context, query)
+    predictor = context.get_sample_predictor()
+    return {'qualities': predictor.find_similar_qualities(names, Constants.RESTAURANT)}
+
+
+def most_liked(context: app_context.App_Context) -> dict:
+    """
+    Return the response to /most-liked
+    """
+    predictor = context.get_user_predictor()
+    return {'restaurants': predictor.compute_most_liked_restaurants(Constants.USER)}
+
+
+def recommend_for_user(context: app_context.App_Context, query: dict[str, list[str]]) -> dict:
+    """
+    Return the response to /recommend-for-user with the given query parameters.
+    Raise Bad_Request if they are not valid.
+    """
+    if 'user' not in query:
+        raise Bad_Request('no user given')
+    user = _int_parameter(query, 'user')
+    n = _int_parameter(query, 'n') if 'n' in query else 10
+    if n < 0:
+        raise Bad_Request('n must not be negative')
+    model = query.get('model', ['user'])[-1]
+    if model not in ('user', 'item'):
+        raise Bad_Request('model must be user or item')
+
+    predictor = context.get_user_predictor()
+    if user not in predictor.graph.get_all_vertices(Constants.USER):
+        raise Bad_Request(f'unknown user {user}')
+    return {'restaurants': [{'restaurant': restaurant, 'predicted_rating': rating}
+                            for restaurant, rating in predictor.recommend_restaurants(user, n, model == 'item')]}
+
+
+def _restaurant_parameters(context: app_context.App_Context, query: dict[str, list[str]]) -> list[str]:
+    """
+    Return the restaurant names given as the restaurant parameters of query.
+    Raise Bad_Request if there are none or one is not a restaurant in the usable data of context.
+    """
+    names = query.get('restaurant', [])
+    if len(names) == 0:
+        raise Bad_Request('no restaurant given')
+    for name in names:
+        if name not in context.get_usable_data():
+            raise Bad_Request(f'unknown restaurant {name}')
+    return names
+
+
+def _int_parameter(query: dict[str, list[str]], parameter: str) -> int:
+    """
+    Return the last value of the given parameter of query as an int.
+    Raise Bad_Request if it is not an integer.
+
+    Preconditions:
+        - parameter in query
+    """
+    value = query[parameter][-1]
+    try:
+        return int(value)
+    except ValueError:
+        raise Bad_Request(f'{parameter} must be an integer, not {value!r}') from None
+
+
+# the function computing the response to each endpoint from the server's context and the query parameters
+ENDPOINTS: dict[str, Callable[[app_context.App_Context, dict[str, list[str]]], dict]] = {
+    '/similar-restaurants': similar_restaurants,
+    '/common-qualities': common_qualities,
+    # /most-liked takes no query parameters, so they are not passed on
+    '/most-liked': lambda context, _: most_liked(context),
+    '/recommend-for-user': recommend_for_user
+}
+
+
+if __name__ == "__main__":
+    import main
+
+    parser = argparse.ArgumentParser(description='Serve restaurant recommendations as JSON over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1', help='the address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='the port to listen on')
+    parser.add_argument('--input', default=main.input_file, help='the csv file to read restaurants from')
+    parser.add_argument('--rows', type=int, default=main.number_rows, help='the number of rows to read')
+    parser.add_argument('--table-dir', default=main.table_dir, help='the directory of similarity tables')
+    parser.add_argument('--workers', type=int, default=4, help='the number of worker threads')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='seconds allowed per request')
+    parser.add_argument('--quiet', action='store_true', help='do not log each request')
+    args = parser.parse_args()
+
+    server = Recommendation_Server((args.host, args.port),
+                                   app_context.App_Context(args.input, args.rows, main.wm, args.table_dir),
+                                   args.workers, args.timeout, args.quiet)
+    server.load()
+    print(f'Serving on http://{args.host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,117 @@
+"""
+This file computes the recommendations the interfaces show without using any widget,
+so they can also be served to other programs
+"""
+import Constants
+import create_usable_data
+import predict_from_data
+from app_context import App_Context
+
+# the largest number of similar restaurants recommended for a set of favourites
+SIMILAR_LIMIT = 4
+
+# the name of each field of the tuples returned by similar_restaurants, as used in JSON output
+SIMILAR_FIELDS = ('similar_restaurants', 'average_price', 'average_rating', 'common_location')
+
+
+def similar_restaurants(context: App_Context, names: list[str],
+                        weight_map: dict[str, int]) -> tuple[list[str], float, float, str]:
+    """
+    Return the restaurants most similar to all of the given favourites when their edges
+    are weighted with weight_map, as a tuple in order of:
+    ([list of similar restaurants], avg_price, avg_rating, common_location)
+
+    Raise ValueError if a name is not a restaurant in the usable data of context.
+
+    Preconditions:
+        - len(names) > 0
+    """
+    return similar_restaurants_batch(context, [names], weight_map)[0]
+
+
+def similar_restaurants_batch(context: App_Context, name_lists: list[list[str]],
+                              weight_map: dict[str, int]) -> list[tuple[list[str], float, float, str]]:
+    """
+    Return [similar_restaurants(context, names, weight_map) for names in name_lists],
+    scoring the favourites of every list in one batched pass.
+
+    Raise ValueError if a name is not a restaurant in the usable data of context.
+
+    Preconditions:
+        - all(len(names) > 0 for names in name_lists)
+    """
+    # the shared predictor is built once; the user's priorities are applied per query
+    predictor = context.get_sample_predictor()
+    all_names = [name for names in name_lists for name in names]
+    all_predictions = [dict(top) for top in predictor.top_k_similar_batch(all_names, Constants.RESTAURANT, 20,
+                                                                          weight_map)]
+
+    results = []
+    start = 0
+    for names in name_lists:
+        prediction_list = all_predictions[start:start + len(names)]
+        start += len(names)
+        # compute up to SIMILAR_LIMIT similar restaurants to display
+        similar = predictor.find_similar_restaurants(prediction_list, SIMILAR_LIMIT)
+        results.append(_summarize(context, similar))
+    return results
+
+
+def _summarize(context: App_Context, similar: list[str]) -> tuple[list[str], float, float, str]:
+    """
+    Return similar with the average price, average ratings, and most common location of its restaurants.
+    If similar is empty, there is nothing to average, so return it with averages of 0 and no location.
+    """
+    limit = len(similar)
+    if limit == 0:
+        return similar, 0.0, 0.0, ''
+
+    # compute the average price, average ratings, and most common location
+    total_price = 0
+    total_ratings = 0
+    common_locations = {}
+
+    for res in similar:
+        res_data = context.get_usable_data()[res]
+
+        total_price += res_data.approx_cost
+        total_ratings += res_data.rate
+
+        # group by the location's code and only look up its name once at the end
+        if res_data.location_code in common_locations:
+            common_locations[res_data.location_code] += 1
+        else:
+            common_locations[res_data.location_code] = 1
+
+    # get the averages and return them
+    avg_price = total_price / limit
+    avg_ratings = (total_ratings / limit) * 5
+    common_locations = sorted(create_usable_data.LOCATIONS.names[code] for code in common_locations)
+    common_locations = common_locations[0]
+    return similar, avg_price, avg_ratings, common_locations
+
+
+def popular_restaurants(user_predictor: predict_from_data.Similarity_Computations,
+                        rest_predictor: predict_from_data.Similarity_Computations) -> tuple[list[str], list[str]]:
+    """
+    Return the most popular restaurants as chosen by the users of user_predictor's graph
+    and the qualities that are common between them in rest_predictor's graph
+    """
+    # find the top restaurants as chosen by users
+    top_restaurants = user_predictor.compute_most_liked_restaurants(Constants.USER)
+
+    # find what qualities the most popular restaurants have in common
+    qualities = rest_predictor.find_similar_qualities(top_restaurants, Constants.RESTAURANT)
+
+    return top_restaurants, qualities
+
+
+if __name__ == "__main__":
+    # python_ta is only needed to check this file, so it is not imported along with the module
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['python_ta', 'Constants', 'create_usable_data', 'predict_from_data', 'app_context'],
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120
+    })
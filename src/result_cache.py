@@ -0,0 +1,97 @@
+"""
+This file holds a bounded cache for query results, so repeated queries for the same
+popular items are answered without recomputing them
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LRU_Cache:
+    """
+    A mapping holding at most maxsize entries, which discards its least recently used
+    entry to make room for a new one. It is safe to use from several threads.
+
+    Instance Attributes:
+        - maxsize: the largest number of entries held at once
+        - hits: the number of calls to get that found their key
+        - misses: the number of calls to get that did not find their key
+
+    Representation Invariants:
+        - self.maxsize >= 0
+        - len(self) <= self.maxsize
+    """
+    maxsize: int
+    hits: int
+    misses: int
+    # Private Instance Attributes:
+    #   - _entries: the entries, from least to most recently used
+    #   - _lock: held while _entries or the counters are changed
+    _entries: OrderedDict
+    _lock: threading.Lock
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        """
+        Initialize an empty cache of the given size. A cache of size 0 holds nothing.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """
+        Return the number of entries in this cache
+        """
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return the value stored under key, marking it as the most recently used,
+        or default if there is none.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store value under key as the most recently used entry, discarding the least
+        recently used entry if the cache is full.
+        """
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Remove every entry from this cache, keeping its counters
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Return the hit and miss counts and the current and largest sizes of this cache
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+
+if __name__ == "__main__":
+    # python_ta is only needed to check this file, so it is not imported along with the module
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['threading', 'collections', 'typing', 'python_ta'],
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120
+    })
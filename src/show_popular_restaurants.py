@@ -5,8 +5,9 @@ from pathlib import Path
 from tkinter import Tk, Canvas, Button, PhotoImage
 import python_ta
 import main
+import background_task
 import predict_from_data
-import Constants
+import recommendations
 import os
 
 
@@ -40,28 +41,22 @@ def compute_results() -> tuple[list[str], list[str]]:
     """
     Compute the most popular restaurants as chosen by users
     and the qualities that are common between the most popular restaurants
+
+    This runs on the worker thread of runner, so it must not use any widget.
     """
     # initialize the data and the predictors
     user_rest_graph = main.create_user_graph()
-    rest_graph = main.sample_graph
+    rest_graph = main.context.get_sample_graph()
     user_predictor = predict_from_data.Similarity_Computations(user_rest_graph)
     rest_predictor = predict_from_data.Similarity_Computations(rest_graph)
 
-    # find the top restaurants as chosen by users
-    top_restaurants = user_predictor.compute_most_liked_restaurants(Constants.USER)
-
-    # find what qualities the most popular restaurants have in common
-    qualities = rest_predictor.find_similar_qualities(top_restaurants, Constants.RESTAURANT)
+    return recommendations.popular_restaurants(user_predictor, rest_predictor)
 
-    return top_restaurants, qualities
 
-
-def draw_results():
+def draw_results(results: tuple[list[str], list[str]]):
     """
     Draw the results computed by the above function
     """
-    results = compute_results()
-
     # draw the most popular restaurants
     rests = results[0]
     factors = results[1]
@@ -74,6 +69,26 @@ def draw_results():
     canvas.itemconfig(answer_three_text, text=factors[2])
 
 
+def show_busy(busy: bool):
+    """
+    show whether results are being computed
+    """
+    window.config(cursor="watch" if busy else "")
+    if busy:
+        canvas.itemconfig(trending_1, text="Computing...")
+
+
+def run_functions():
+    """
+    compute the results on the worker thread and draw them once they are ready
+    """
+    runner.submit(compute_results, draw_results)
+
+
+# computes results away from the event loop so the window keeps responding
+runner = background_task.Background_Runner(window, show_busy)
+
+
 canvas.place(x=0, y=0)
 image_image_1 = PhotoImage(
     file=relative_to_assets("image_11.png"))
@@ -255,7 +270,7 @@ button_1 = Button(
     image=button_image_1,
     borderwidth=0,
     highlightthickness=0,
-    command=draw_results,
+    command=run_functions,
     relief="flat"
 )
 button_1.place(
@@ -270,13 +285,15 @@ def run_visual():
     """
     Run this file in a loop
     """
+    # start building the data while the window opens
+    main.context.warm_up()
     window.resizable(False, False)
     window.mainloop()
 
 
 if __name__ == "__main__":
     # python_ta.check_all(config={
-    #     'extra-imports': ['Path', 'tkinter', 'main', 'predict_from_data', 'Constants'],
+    #     'extra-imports': ['Path', 'tkinter', 'main', 'background_task', 'predict_from_data', 'recommendations'],
     #     'allowed-io': [],  # the names (strs) of functions that call print/open/input
     #     'max-line-length': 120
     # })
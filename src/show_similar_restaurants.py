@@ -5,10 +5,9 @@ from pathlib import Path
 from tkinter import Tk, Canvas, Entry, Button, PhotoImage
 import python_ta
 import main
-import create_usable_data
+import background_task
+import recommendations
 import Constants
-import graph_container
-import predict_from_data
 import os
 
 
@@ -36,24 +35,28 @@ def relative_to_assets(path: str) -> Path:
     return ASSETS_PATH / Path(path)
 
 
-def validate_input() -> bool:
+def read_input() -> tuple[list[str], list[str]]:
     """
-    Check if the input given in the text boxes are valid inputs
+    Return the restaurant names and the priorities (location, price, cuisine type,
+    restaurant type) typed in the text boxes, so they can be used away from the event loop
     """
-    r_name = restaurant_name_entry.get()
-    r1_name = restaurant1_name_entry.get()
-    r2_name = restaurant2_name_entry.get()
+    names = [restaurant_name_entry.get(), restaurant1_name_entry.get(), restaurant2_name_entry.get()]
+    priorities = [location_entry.get(), price_entry.get(), cuisine_type_entry.get(), restaurant_type_entry.get()]
+    return names, priorities
+
 
-    location = location_entry.get()
-    price = price_entry.get()
-    cuisine_type = cuisine_type_entry.get()
-    restaurant_type = restaurant_type_entry.get()
+def validate_input(names: list[str], priorities: list[str]) -> bool:
+    """
+    Check if the input given in the text boxes are valid inputs
+    """
+    r_name, r1_name, r2_name = names
+    location, price, cuisine_type, restaurant_type = priorities
 
-    if r_name not in main.usable_data:
+    if r_name not in main.context.get_usable_data():
         return False
-    if r1_name not in main.usable_data:
+    if r1_name not in main.context.get_usable_data():
         return False
-    if r2_name not in main.usable_data:
+    if r2_name not in main.context.get_usable_data():
         return False
     try:
         location = int(location)
@@ -74,71 +77,33 @@ def validate_input() -> bool:
     return True
 
 
-def create_graph() -> graph_container.Graph:
+def get_weight_map(priorities: list[str]) -> dict[str, int]:
     """
-    create a graph from the valid input
+    create the weight map from the valid input
     """
-    graph = main.graph
-    location = int(location_entry.get())
-    price = int(price_entry.get())
-    cuisine_type = int(cuisine_type_entry.get())
-    restaurant_type = int(restaurant_type_entry.get())
-    weight_map = {Constants.LOCATION: location, Constants.APPROX_COST: price,
-                  Constants.CUISINES: cuisine_type, Constants.REST_TYPE: restaurant_type}
-    created = create_usable_data.create_graph(main.usable_data, weight_map, graph)
-    return created
-
-
-def compute_results() -> tuple[list[str], float, float, str]:
+    location, price, cuisine_type, restaurant_type = (int(priority) for priority in priorities)
+    return {Constants.LOCATION: location, Constants.APPROX_COST: price,
+            Constants.CUISINES: cuisine_type, Constants.REST_TYPE: restaurant_type}
+
+
+def compute_results(names: list[str], priorities: list[str]) -> tuple[list[str], float, float, str]:
     """
-    Computes the results and returns a tuple in order of:
+    Computes the results for the input read by read_input and returns a tuple in order of:
     ([list of similar restaurants], avg_price, avg_rating, common_location)
+    Raise ValueError if the input is not valid.
+
+    This runs on the worker thread of runner, so it must not use any widget.
     """
+    if not validate_input(names, priorities):
+        raise ValueError('the restaurants must be in the data and the priorities between 0 and 10')
+
+    return recommendations.similar_restaurants(main.context, names, get_weight_map(priorities))
+
 
-    # create the graph and predictor model
-    graph = create_graph()
-    predictor = predict_from_data.Similarity_Computations(graph)
-    # compute up to 4 similar restaurants to display
-    limit = 4
-
-    # compute the restaurants obtained from similarity scores and get similar restaurants
-    r1_sims = predictor.generate_from_similarity_scores(restaurant_name_entry.get(), Constants.RESTAURANT)
-    r2_sims = predictor.generate_from_similarity_scores(restaurant1_name_entry.get(), Constants.RESTAURANT)
-    r3_sims = predictor.generate_from_similarity_scores(restaurant2_name_entry.get(), Constants.RESTAURANT)
-    prediction_list = [r1_sims, r2_sims, r3_sims]
-    similar_restaurants = predictor.find_similar_restaurants(prediction_list, limit)
-    limit = len(similar_restaurants)
-
-    # compute the average price, average ratings, and most common location
-    total_price = 0
-    total_ratings = 0
-    common_locations = {}
-
-    for res in similar_restaurants:
-        res_data = main.usable_data[res]
-
-        total_price += res_data.approx_cost
-        total_ratings += res_data.rate
-
-        if res_data.location in common_locations:
-            common_locations[res_data.location] += 1
-        else:
-            common_locations[res_data.location] = 1
-
-    # get the averages and return them
-    avg_price = total_price / limit
-    avg_ratings = (total_ratings / limit) * 5
-    common_locations = sorted(common_locations)
-    common_locations = common_locations[0]
-    return similar_restaurants, avg_price, avg_ratings, common_locations
-
-
-def display_results():
+def display_results(results: tuple[list[str], float, float, str]):
     """
     display the results produced to the interface
     """
-    # initalize the results
-    results = compute_results()
     similar_restaurants = results[0]
     avg_price = str(results[1].__round__(1))
     avg_ratings = str(results[2].__round__(1))
@@ -155,16 +120,38 @@ def display_results():
     canvas.itemconfig(answer_location_text, text=common_location)
 
 
+def show_invalid_input(error: Exception):
+    """
+    report input that compute_results could not use, which it signals with a ValueError.
+    Any other error is not about the input, so it is raised again.
+    """
+    if not isinstance(error, ValueError):
+        raise error
+    print(f"invalid input: {error}")
+    canvas.itemconfig(rest1, text="")
+
+
+def show_busy(busy: bool):
+    """
+    show whether results are being computed
+    """
+    window.config(cursor="watch" if busy else "")
+    if busy:
+        canvas.itemconfig(rest1, text="Computing...")
+
+
 def run_functions():
     """
-    combines the functions above to get input and compute and display the output
+    combines the functions above to get input, then compute the output on the worker
+    thread and display it once it is ready. Clicking again before then replaces the
+    computation with one for the new input.
     """
-    valid = validate_input()
-    if not valid:
-        print("invalid input")
-        pass
-    else:
-        display_results()
+    names, priorities = read_input()
+    runner.submit(lambda: compute_results(names, priorities), display_results, show_invalid_input)
+
+
+# computes results away from the event loop so the window keeps responding
+runner = background_task.Background_Runner(window, show_busy)
 
 
 canvas.place(x=0, y=0)
@@ -555,14 +542,15 @@ def run_visual():
     """
     Run this file in a loop
     """
+    # start building the data while the window opens
+    main.context.warm_up()
     window.resizable(False, False)
     window.mainloop()
 
 
 if __name__ == "__main__":
     # python_ta.check_all(config={
-    #     'extra-imports': ['Path', 'tkinter', 'main', 'predict_from_data', 'Constants',
-    #                       'create_usable_data', 'graph_container'],
+    #     'extra-imports': ['Path', 'tkinter', 'main', 'background_task', 'recommendations', 'Constants'],
     #     'allowed-io': [],  # the names (strs) of functions that call print/open/input
     #     'max-line-length': 120
     # })
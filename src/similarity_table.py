@@ -0,0 +1,248 @@
+"""
+This file computes, ahead of time, the most similar vertices of every vertex of one kind
+under one weight profile, and stores them in a compact table that answers top-k queries by lookup
+
+Run this file to build the restaurant table of one weight profile into the table directory
+the application reads; pass --help for its options.
+"""
+import argparse
+import json
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+from typing import Any, Optional
+
+import numpy as np
+
+from sparse_graph import Sparse_Graph
+
+# The saved table format, all in native byte order:
+#   - header: TABLE_MAGIC, then the row count, k and table length as int64s
+#   - table: JSON object holding the kind, the weight map, the fingerprint, the row items in row order
+#            and the byte order
+#   - neighbours: k int32 row numbers per row, most similar first, padded with -1
+#   - scores: k float32 cosine similarities per row, matching neighbours
+# Every section after the header starts on an 8 byte boundary.
+TABLE_MAGIC = b'YETOPK01'
+_HEADER = struct.Struct('<8sqqq')
+
+# the most scores computed at once while building, which bounds the size of the dense
+# array of scores each process holds
+BUILD_BATCH_ENTRIES = 1 << 24
+
+
+class Similarity_Table:
+    """
+    The k most similar rows of every row of a Sparse_Graph under one weight profile.
+
+    Instance Attributes:
+        - kind: the kind of the vertices in the table
+        - weight_map: the edge category weights the scores were computed with, or None
+          for the weights stored in the graph
+        - fingerprint: the Sparse_Graph.fingerprint of the matrix and weight_map the scores were
+          computed from, or None if it is not known
+        - k: the number of neighbours stored per row
+        - rows: the row items, in row order
+        - row_index: mapping from each row item to its row number
+
+    Representation Invariants:
+        - self.k >= 0
+        - all(self.rows[self.row_index[item]] == item for item in self.rows)
+    """
+    kind: str
+    weight_map: Optional[dict[str, float]]
+    fingerprint: Optional[str]
+    k: int
+    rows: list
+    row_index: dict[Any, int]
+    # Private Instance Attributes:
+    #   - _neighbours: len(rows) x k array of row numbers, most similar first, padded with -1
+    #   - _scores: len(rows) x k array of the cosine similarities of _neighbours
+    _neighbours: np.ndarray
+    _scores: np.ndarray
+
+    def __init__(self, kind: str, weight_map: Optional[dict[str, float]], rows: list,
+                 neighbours: np.ndarray, scores: np.ndarray, fingerprint: Optional[str] = None) -> None:
+        """
+        Initialize a new table from the given arrays.
+
+        Preconditions:
+            - neighbours.shape == scores.shape
+            - neighbours.shape[0] == len(rows)
+        """
+        self.kind = kind
+        self.weight_map = weight_map
+        self.fingerprint = fingerprint
+        self.k = neighbours.shape[1]
+        self.rows = rows
+        self.row_index = {item: i for i, item in enumerate(rows)}
+        self._neighbours = neighbours
+        self._scores = scores
+
+    def top_k(self, item: Any, k: int) -> list[tuple[Any, float]]:
+        """
+        Return the k rows most similar to item as (item, score) pairs, in the order
+        Sparse_Graph.top_k gives them. Scores are rounded to float32.
+
+        Raise ValueError if item is not a row of this table.
+
+        Preconditions:
+            - 0 <= k <= self.k
+        """
+        if item not in self.row_index:
+            raise ValueError
+
+        row = self.row_index[item]
+        return [(self.rows[neighbour], score)
+                for neighbour, score in zip(self._neighbours[row, :k].tolist(), self._scores[row, :k].tolist())
+                if neighbour != -1]
+
+    def save(self, path: str) -> None:
+        """
+        Save this table to the file at the given path in the format described at the top of this file.
+
+        Preconditions:
+            - every row item is a str or an int
+        """
+        table = json.dumps({'kind': self.kind, 'weight_map': self.weight_map, 'fingerprint': self.fingerprint,
+                            'rows': self.rows, 'byteorder': sys.byteorder}).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(TABLE_MAGIC, len(self.rows), self.k, len(table)))
+            for section in (table, self._neighbours.astype(np.int32).tobytes(),
+                            self._scores.astype(np.float32).tobytes()):
+                f.write(section)
+                f.write(bytes(-len(section) % 8))
+
+
+def load_table(path: str) -> Similarity_Table:
+    """
+    Return the table saved at the given path.
+
+    The file is memory-mapped, so loading a table does no work per row beyond indexing
+    the row items, and processes that load the same file share its pages.
+    Raise ValueError if the file is not a saved table.
+    """
+    with open(path, 'rb') as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, num_rows, k, table_len = _HEADER.unpack_from(buf, 0)
+    if magic != TABLE_MAGIC:
+        raise ValueError
+
+    pos = _HEADER.size
+    table = json.loads(buf[pos:pos + table_len].decode('utf-8'))
+    if table['byteorder'] != sys.byteorder:
+        raise ValueError
+    pos += table_len + (-table_len % 8)
+
+    # the arrays below keep buf open for as long as the table uses them
+    neighbours = np.frombuffer(buf, dtype=np.int32, count=num_rows * k, offset=pos).reshape(num_rows, k)
+    pos += 4 * num_rows * k + (-(4 * num_rows * k) % 8)
+    scores = np.frombuffer(buf, dtype=np.float32, count=num_rows * k, offset=pos).reshape(num_rows, k)
+    return Similarity_Table(table['kind'], table['weight_map'], table['rows'], neighbours, scores,
+                            table.get('fingerprint'))
+
+
+def table_path(directory: str, kind: str, weight_map: Optional[dict[str, float]]) -> str:
+    """
+    Return the path in directory of the table for the given kind and weight profile,
+    so that tables built for different profiles never overwrite each other.
+    """
+    profile = 'default' if weight_map is None else '_'.join(f'{category}-{weight}' for category, weight
+                                                            in sorted(weight_map.items()))
+    return os.path.join(directory, f'{kind}.{profile}.topk')
+
+
+def build_table(compiled: Sparse_Graph, weight_map: Optional[dict[str, float]] = None, k: int = 20,
+                processes: int = 1) -> Similarity_Table:
+    """
+    Return the table of the k most similar rows of every row of compiled under weight_map,
+    selected exactly as Sparse_Graph.top_k selects them.
+
+    If processes > 1, the rows are split into batches scored by a pool of that many processes.
+    The result is the same as the sequential one.
+
+    Preconditions:
+        - k >= 0
+        - processes >= 1
+    """
+    num_rows = len(compiled.rows)
+    neighbours = np.full((num_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((num_rows, k), dtype=np.float32)
+    batch_size = max(1, BUILD_BATCH_ENTRIES // max(num_rows, 1))
+    batches = [(start, min(start + batch_size, num_rows)) for start in range(0, num_rows, batch_size)]
+
+    if processes > 1:
+        with multiprocessing.Pool(processes, _init_worker, (compiled, weight_map, k)) as pool:
+            results = pool.imap_unordered(_score_batch, batches)
+            for start, batch_neighbours, batch_scores in results:
+                neighbours[start:start + len(batch_neighbours)] = batch_neighbours
+                scores[start:start + len(batch_scores)] = batch_scores
+    else:
+        _init_worker(compiled, weight_map, k)
+        for batch in batches:
+            start, batch_neighbours, batch_scores = _score_batch(batch)
+            neighbours[start:start + len(batch_neighbours)] = batch_neighbours
+            scores[start:start + len(batch_scores)] = batch_scores
+
+    return Similarity_Table(compiled.kind, weight_map, list(compiled.rows), neighbours, scores,
+                            compiled.fingerprint(weight_map))
+
+
+# the state _score_batch reads in each process, set by _init_worker
+_worker_state = {}
+
+
+def _init_worker(compiled: Sparse_Graph, weight_map: Optional[dict[str, float]], k: int) -> None:
+    """
+    Store what _score_batch needs in this process, weighting the matrix once rather than per batch
+    """
+    if weight_map is None:
+        matrix, norms = compiled.matrix, compiled.norms
+    else:
+        matrix, norms = compiled.weighted_matrix(weight_map)
+    _worker_state.update(compiled=compiled, matrix=matrix, norms=norms, k=k)
+
+
+def _score_batch(batch: tuple[int, int]) -> tuple[int, np.ndarray, np.ndarray]:
+    """
+    Return the start of the given range of rows with the neighbours and scores of its rows
+    """
+    start, stop = batch
+    compiled, matrix, norms, k = (_worker_state[key] for key in ('compiled', 'matrix', 'norms', 'k'))
+    dots = (matrix @ matrix[start:stop].T).toarray()
+    denominators = np.outer(norms, norms[start:stop])
+    batch_scores = np.divide(dots, denominators, out=np.zeros_like(dots), where=denominators != 0)
+
+    neighbours = np.full((stop - start, k), -1, dtype=np.int32)
+    scores = np.zeros((stop - start, k), dtype=np.float32)
+    for i in range(stop - start):
+        top = compiled.top_k(batch_scores[:, i], k, compiled.rows[start + i])
+        neighbours[i, :len(top)] = [compiled.row_index[item] for item, _ in top]
+        scores[i, :len(top)] = [score for _, score in top]
+    return start, neighbours, scores
+
+
+if __name__ == "__main__":
+    import Constants
+    import app_context
+    import main
+
+    parser = argparse.ArgumentParser(description='Build the table of the restaurants most similar to each '
+                                                 'restaurant under one weight profile.')
+    parser.add_argument('--input', default=main.input_file, help='the csv file to read restaurants from')
+    parser.add_argument('--rows', type=int, default=main.number_rows, help='the number of rows to read')
+    parser.add_argument('--table-dir', default=main.table_dir, help='the directory to write the table to')
+    parser.add_argument('--k', type=int, default=20, help='the number of similar restaurants kept per restaurant')
+    parser.add_argument('--processes', type=int, default=1, help='the number of processes to compute in')
+    for parameter, category in [('location', Constants.LOCATION), ('price', Constants.APPROX_COST),
+                                ('cuisines', Constants.CUISINES), ('rest-type', Constants.REST_TYPE)]:
+        parser.add_argument(f'--{parameter}', type=int, default=main.wm[category], choices=range(0, 11),
+                            metavar='0-10', help=f'the priority of {category}')
+    args = parser.parse_args()
+
+    priorities = {Constants.LOCATION: args.location, Constants.APPROX_COST: args.price,
+                  Constants.CUISINES: args.cuisines, Constants.REST_TYPE: args.rest_type}
+    table_context = app_context.App_Context(args.input, args.rows, main.wm, args.table_dir)
+    print(table_context.build_similarity_table(priorities, args.k, args.processes))
@@ -0,0 +1,195 @@
+"""
+This file compiles a Graph into a sparse matrix so that a vertex can be compared
+against every other vertex of its kind with a single matrix-vector product
+"""
+import hashlib
+import json
+from typing import Any, Optional
+
+import numpy as np
+from scipy import sparse
+
+from graph_container import Graph
+
+
+class Sparse_Graph:
+    """
+    A CSR matrix snapshot of a Graph.
+    Each row is a vertex of a single kind (restaurants or users) and each column
+    is one of the vertices those rows are connected to.
+
+    Instance Attributes:
+        - kind: the kind of the vertices in the rows
+        - version: the version of the graph this matrix was compiled from
+        - rows: the row items, in row order
+        - row_index: mapping from each row item to its row number
+        - columns: the column items, in column order
+        - column_index: mapping from each column item to its column number
+        - categories: the names of the edge categories in the matrix
+        - matrix: the len(rows) x len(columns) matrix of edge weights
+        - entry_categories: for each stored entry of matrix, 0 if its edge has no category,
+          otherwise 1 + the index of its category in categories
+        - norms: the L2 norm of each row
+        - name_ranks: the position of each row item when the row items are sorted,
+          used to break ties between equal scores by name
+
+    Representation Invariants:
+        - all(self.rows[self.row_index[item]] == item for item in self.rows)
+        - all(self.columns[self.column_index[item]] == item for item in self.columns)
+    """
+    kind: str
+    version: int
+    rows: list
+    row_index: dict[Any, int]
+    columns: list
+    column_index: dict[Any, int]
+    categories: list[str]
+    matrix: sparse.csr_matrix
+    entry_categories: np.ndarray
+    norms: np.ndarray
+    name_ranks: np.ndarray
+
+    def __init__(self, graph: Graph, kind: str) -> None:
+        """
+        Compile the vertices of the given kind in graph into a new sparse matrix.
+        Rows and columns are ordered by first appearance in the graph, so compiling
+        the same graph twice gives the same ids.
+
+        Later changes to graph are not reflected in this matrix.
+        """
+        self.kind = kind
+        self.version = graph.version
+        self.rows = list(graph.get_all_vertices(kind))
+        self.row_index = {item: i for i, item in enumerate(self.rows)}
+        self.columns = []
+        self.column_index = {}
+        self.categories = []
+        category_codes = {}
+
+        indptr = [0]
+        indices = []
+        data = []
+        entry_categories = []
+        for item in self.rows:
+            edge_categories = graph.get_edge_categories(item)
+            for neighbour, weight in graph.get_edges(item).items():
+                if neighbour not in self.column_index:
+                    self.column_index[neighbour] = len(self.columns)
+                    self.columns.append(neighbour)
+                category = edge_categories.get(neighbour)
+                if category is not None and category not in category_codes:
+                    self.categories.append(category)
+                    category_codes[category] = len(self.categories)
+                indices.append(self.column_index[neighbour])
+                data.append(weight)
+                entry_categories.append(category_codes.get(category, 0))
+            indptr.append(len(indices))
+
+        self.matrix = sparse.csr_matrix(
+            (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(self.rows), len(self.columns))
+        )
+        self.entry_categories = np.array(entry_categories, dtype=np.int16)
+        self.norms = _row_norms(self.matrix)
+        self.name_ranks = np.empty(len(self.rows), dtype=np.int64)
+        self.name_ranks[sorted(range(len(self.rows)), key=self.rows.__getitem__)] = np.arange(len(self.rows))
+
+    def fingerprint(self, weight_map: Optional[dict[str, float]] = None) -> str:
+        """
+        Return a hex digest of the rows, columns, edges and edge categories of this matrix and of
+        weight_map, so results computed from it can be recognised in another process.
+        Compiling the same graph twice gives the same fingerprint, while changing any vertex,
+        weight or category, or weight_map, gives another one.
+        """
+        digest = hashlib.sha256(json.dumps([self.kind, self.rows, self.columns, self.categories, weight_map],
+                                           sort_keys=True).encode('utf-8'))
+        for section in (self.matrix.data, self.matrix.indices, self.matrix.indptr, self.entry_categories):
+            digest.update(section.tobytes())
+        return digest.hexdigest()
+
+    def weighted_matrix(self, weight_map: dict[str, float]) -> tuple[sparse.csr_matrix, np.ndarray]:
+        """
+        Return a copy of the matrix in which every entry whose category is in weight_map
+        has weight weight_map[category] in place of its own, and the row norms of that copy.
+        """
+        category_weights = np.full(len(self.categories) + 1, np.nan)
+        for i, category in enumerate(self.categories):
+            if category in weight_map:
+                category_weights[i + 1] = weight_map[category]
+
+        entry_weights = category_weights[self.entry_categories]
+        data = np.where(np.isnan(entry_weights), self.matrix.data, entry_weights)
+        matrix = sparse.csr_matrix((data, self.matrix.indices, self.matrix.indptr), shape=self.matrix.shape)
+        return matrix, _row_norms(matrix)
+
+    def similarity_scores(self, item: Any, weight_map: Optional[dict[str, float]] = None) -> np.ndarray:
+        """
+        Return the cosine similarity between item and every row, in row order.
+        Rows with no edges have a similarity of 0.
+        If weight_map is given, the scores are computed from weighted_matrix(weight_map).
+
+        Raise ValueError if item is not a row of this matrix.
+        """
+        return self.similarity_matrix([item], weight_map)[:, 0]
+
+    def similarity_matrix(self, items: list, weight_map: Optional[dict[str, float]] = None) -> np.ndarray:
+        """
+        Return the len(rows) x len(items) array whose column i holds the cosine similarity
+        between items[i] and every row, computed with one sparse matrix-matrix product.
+        weight_map is used as in similarity_scores.
+
+        Raise ValueError if an item is not a row of this matrix.
+        """
+        if any(item not in self.row_index for item in items):
+            raise ValueError
+
+        if weight_map is None:
+            matrix, norms = self.matrix, self.norms
+        else:
+            matrix, norms = self.weighted_matrix(weight_map)
+
+        seed_rows = [self.row_index[item] for item in items]
+        dots = (matrix @ matrix[seed_rows].T).toarray()
+        denominators = np.outer(norms, norms[seed_rows])
+        return np.divide(dots, denominators, out=np.zeros_like(dots), where=denominators != 0)
+
+    def top_k(self, scores: np.ndarray, k: int, exclude: Any) -> list[tuple[Any, float]]:
+        """
+        Return the k row items with the highest scores as (item, score) pairs, from highest
+        to lowest score, leaving out the row item exclude. Equal scores are ordered by item,
+        the same way Similarity_Computations.top_k_similar orders them.
+
+        Preconditions:
+            - scores.shape == (len(self.rows),)
+            - exclude in self.row_index
+            - k >= 0
+        """
+        scores = scores.copy()
+        scores[self.row_index[exclude]] = -np.inf
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return []
+
+        # partition to find the k-th best score, then only sort the rows that reach it
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        candidates = np.flatnonzero(scores >= threshold)
+        order = candidates[np.lexsort((self.name_ranks[candidates], -scores[candidates]))][:k]
+        return [(self.rows[i], float(scores[i])) for i in order]
+
+
+def _row_norms(matrix: sparse.csr_matrix) -> np.ndarray:
+    """
+    Return the L2 norm of each row of matrix.
+    """
+    return np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+
+
+if __name__ == "__main__":
+    # python_ta is only needed to check this file, so it is not imported along with the module
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['hashlib', 'json', 'typing', 'numpy', 'python_ta', 'scipy', 'graph_container'],
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120
+    })
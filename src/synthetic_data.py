@@ -0,0 +1,180 @@
+"""
+This file writes synthetic csv files shaped like the Zomato Bangalore dataset, so the loader,
+graph and predictors can be benchmarked at any size without downloading the real data
+
+The files have the same 17 columns as zomato.csv. Quoted multi-line address, review and menu
+fields are as long as the real ones on average, and the categorical columns have about as many
+distinct values as the real ones, with a few values far more common than the rest.
+As in the real data, each restaurant is listed on several rows.
+"""
+import argparse
+import csv
+import random
+
+HEADER = ['url', 'address', 'name', 'online_order', 'book_table', 'rate', 'votes', 'phone', 'location',
+          'rest_type', 'dish_liked', 'cuisines', 'approx_cost(for two people)', 'reviews_list', 'menu_item',
+          'listed_in(type)', 'listed_in(city)']
+
+# the number of distinct values of each categorical column in the real data
+NUM_LOCATIONS = 93
+NUM_REST_TYPES = 25
+NUM_CUISINES = 107
+NUM_COSTS = 70
+NUM_CITIES = 30
+LISTED_TYPES = ['Delivery', 'Dine-out', 'Desserts', 'Cafes', 'Drinks & nightlife', 'Buffet', 'Pubs and bars']
+
+# the fraction of rows naming a restaurant not named on an earlier row, as in the real data
+UNIQUE_NAME_FRACTION = 0.17
+
+# the most reviews written for one row, and the number of distinct review texts drawn from
+MAX_REVIEWS = 40
+NUM_REVIEW_TEXTS = 512
+
+# the multiplier of each suffix accepted by parse_size
+SIZE_SUFFIXES = {'k': 1000, 'm': 1000000}
+
+_WORDS = ['good', 'food', 'place', 'ambience', 'service', 'taste', 'great', 'biryani', 'chicken', 'staff',
+          'friendly', 'quantity', 'price', 'visit', 'must', 'try', 'awesome', 'spicy', 'delivery', 'time',
+          'order', 'paneer', 'dosa', 'coffee', 'dessert', 'worth', 'money', 'crowd', 'weekend', 'music']
+
+
+def parse_size(size: str) -> int:
+    """
+    Return the number of rows written as size, which is a whole number optionally followed
+    by k (thousands) or m (millions), like '10k'
+
+    >>> parse_size('10k')
+    10000
+    >>> parse_size('250')
+    250
+    """
+    size = size.strip().lower()
+    if size[-1:] in SIZE_SUFFIXES:
+        return int(size[:-1]) * SIZE_SUFFIXES[size[-1]]
+    return int(size)
+
+
+def write_synthetic_csv(path: str, num_rows: int, seed: int = 0, max_reviews: int = MAX_REVIEWS) -> None:
+    """
+    Write a synthetic zomato-shaped csv file of num_rows rows (plus the header) to path.
+    The same arguments always give the same file.
+
+    Rows are generated and written one at a time, so memory use does not grow with num_rows.
+
+    Preconditions:
+        - num_rows >= 0
+        - max_reviews >= 0
+    """
+    rng = random.Random(seed)
+    locations = _category_names(rng, 'Layout', NUM_LOCATIONS)
+    rest_types = _category_names(rng, 'Dining', NUM_REST_TYPES)
+    cuisines = _category_names(rng, 'Cuisine', NUM_CUISINES)
+    costs = sorted(rng.sample(range(40, 6000, 10), NUM_COSTS))
+    cities = _category_names(rng, 'City', NUM_CITIES)
+    reviews = [_review(rng) for _ in range(NUM_REVIEW_TEXTS)]
+    dishes = [' '.join(rng.choices(_WORDS, k=2)).title() for _ in range(200)]
+
+    # a few values of each column are far more common than the rest, like a Zipf distribution
+    location_weights = _zipf_weights(NUM_LOCATIONS)
+    rest_type_weights = _zipf_weights(NUM_REST_TYPES)
+    cuisine_weights = _zipf_weights(NUM_CUISINES)
+    cost_weights = _zipf_weights(NUM_COSTS)
+
+    num_names = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for _ in range(num_rows):
+            if num_names == 0 or rng.random() < UNIQUE_NAME_FRACTION:
+                num_names += 1
+                name_id = num_names
+            else:
+                name_id = rng.randint(1, num_names)
+
+            writer.writerow([
+                f'https://www.zomato.com/bangalore/restaurant-{name_id}',
+                f'{rng.randint(1, 999)}, {rng.randint(1, 40)}th Cross, '
+                f'{rng.choices(locations, location_weights)[0]}, Bangalore',
+                f'Restaurant {name_id}',
+                rng.choice(['Yes', 'No']),
+                rng.choice(['Yes', 'No']),
+                _rating(rng),
+                str(rng.randint(0, 5000)),
+                f'080 {rng.randint(10000000, 99999999)}',
+                _maybe_empty(rng, rng.choices(locations, location_weights)[0], 0.001),
+                _maybe_empty(rng, ', '.join(_distinct_choices(rng, rest_types, rest_type_weights, 2)), 0.004),
+                ', '.join(rng.sample(dishes, rng.randint(0, 7))),
+                _maybe_empty(rng, ', '.join(_distinct_choices(rng, cuisines, cuisine_weights, 4)), 0.001),
+                _maybe_empty(rng, f'{rng.choices(costs, cost_weights)[0]:,}', 0.007),
+                '[' + ', '.join(rng.choices(reviews, k=rng.randint(0, max_reviews))) + ']',
+                '[' + ', '.join(f"'{dish}'" for dish in rng.sample(dishes, rng.randint(0, 60))) + ']',
+                rng.choice(LISTED_TYPES),
+                rng.choice(cities)
+            ])
+
+
+def _category_names(rng: random.Random, suffix: str, count: int) -> list[str]:
+    """
+    Return count distinct names of realistic length for the values of a categorical column
+    """
+    names = set()
+    while len(names) < count:
+        names.add(f'{rng.choice(_WORDS).title()} {rng.choice(_WORDS).title()} {suffix}')
+    return sorted(names)
+
+
+def _zipf_weights(count: int) -> list[float]:
+    """
+    Return weights making the i-th of count values about 1 / (i + 1) times as likely as the first
+    """
+    return [1 / (i + 1) for i in range(count)]
+
+
+def _distinct_choices(rng: random.Random, values: list[str], weights: list[float], most: int) -> list[str]:
+    """
+    Return between 1 and most distinct values, chosen by weight
+    """
+    chosen = []
+    for value in rng.choices(values, weights, k=rng.randint(1, most)):
+        if value not in chosen:
+            chosen.append(value)
+    return chosen
+
+
+def _maybe_empty(rng: random.Random, value: str, probability: float) -> str:
+    """
+    Return an empty string with the given probability, and value otherwise
+    """
+    return '' if rng.random() < probability else value
+
+
+def _rating(rng: random.Random) -> str:
+    """
+    Return a rating written like those of the real data, including the unrated forms
+    """
+    roll = rng.random()
+    if roll < 0.15:
+        return ''
+    if roll < 0.19:
+        return 'NEW'
+    if roll < 0.20:
+        return '-'
+    return f'{rng.randint(18, 49) / 10}/5'
+
+
+def _review(rng: random.Random) -> str:
+    """
+    Return one review tuple written like those in the reviews_list column of the real data
+    """
+    text = ' '.join(rng.choices(_WORDS, k=rng.randint(10, 80)))
+    return f"('Rated {rng.randint(1, 5)}.0', 'RATED\\n  {text.capitalize()}. \"{rng.choice(_WORDS)}\"')"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write a synthetic zomato-shaped csv file.')
+    parser.add_argument('output', help='the file to write')
+    parser.add_argument('--rows', type=parse_size, default=parse_size('10k'), help='the number of rows, like 50k')
+    parser.add_argument('--seed', type=int, default=0, help='the seed the rows are generated from')
+    parser.add_argument('--max-reviews', type=int, default=MAX_REVIEWS, help='the most reviews per row')
+    args = parser.parse_args()
+    write_synthetic_csv(args.output, args.rows, args.seed, args.max_reviews)
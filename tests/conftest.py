@@ -0,0 +1,27 @@
+"""
+This file holds the fixtures the tests share. pytest.ini puts src on the import path,
+so the tests import its modules the same way those modules import each other
+"""
+import pytest
+
+import create_usable_data
+import synthetic_data
+from graph_container import Graph
+
+# the edge weights the restaurant graph of the tests is built with, as in main
+WEIGHT_MAP = {'location': 9, 'rest_type': 8, 'cuisines': 4, 'approx_cost': 7}
+
+
+@pytest.fixture(scope='session')
+def synthetic_csv(tmp_path_factory) -> str:
+    """Return the path of a small synthetic zomato-shaped csv file."""
+    path = str(tmp_path_factory.mktemp('data') / 'synthetic.csv')
+    synthetic_data.write_synthetic_csv(path, 600, seed=3)
+    return path
+
+
+@pytest.fixture
+def restaurant_graph(synthetic_csv: str) -> Graph:
+    """Return a new restaurant graph built from synthetic_csv."""
+    usable_data = create_usable_data.select_valid_rows(synthetic_csv, 600)
+    return create_usable_data.create_graph(usable_data, WEIGHT_MAP, Graph())
@@ -0,0 +1,91 @@
+"""
+This file tests the collaborative filtering recommenders
+"""
+import random
+
+import numpy as np
+import pytest
+
+import Constants
+import collaborative_filtering
+import create_usable_data
+from collaborative_filtering import Item_Based_CF, User_Based_CF
+from generate_sample_user_graph import Generate_Graph
+from graph_container import Graph
+
+
+@pytest.fixture
+def user_graph(synthetic_csv: str) -> Graph:
+    """Return a new user graph of 400 users and 60 restaurants."""
+    usable_data = create_usable_data.select_valid_rows(synthetic_csv, 600)
+    return Generate_Graph(usable_data).create_large_graph(400, 60, seed=5, median_degree=4)
+
+
+def _assert_same_model(model: Item_Based_CF, expected: Item_Based_CF) -> None:
+    """Assert that model has the same neighbourhoods and recommendations as expected."""
+    assert np.array_equal(model.neighbours, expected.neighbours)
+    assert np.allclose(model.neighbour_scores, expected.neighbour_scores, rtol=1e-12, atol=0)
+    users = sorted(model.graph.get_all_vertices(Constants.USER), key=str)[:50]
+    assert model.recommend_batch(users, 5) == expected.recommend_batch(users, 5)
+
+
+@pytest.mark.parametrize('max_pending', [collaborative_filtering.MAX_PENDING_PRODUCTS, 16])
+def test_add_rating_matches_rebuild(user_graph: Graph, monkeypatch, max_pending: int) -> None:
+    """Test that the neighbourhoods kept up to date by add_rating match a model built again
+    from the changed graph, including after the pending co-rating products are merged."""
+    monkeypatch.setattr(collaborative_filtering, 'MAX_PENDING_PRODUCTS', max_pending)
+    model = Item_Based_CF(user_graph, 6)
+    users = sorted(user_graph.get_all_vertices(Constants.USER), key=str)
+    rng = random.Random(7)
+    for step in range(150):
+        # mostly change existing users' ratings, sometimes rate as a new user
+        user = rng.choice(users) if step % 10 else f'new user {step}'
+        model.add_rating(user, rng.choice(model.restaurants), rng.randint(1, 10))
+        if step % 50 == 49:
+            _assert_same_model(model, Item_Based_CF(user_graph, 6))
+
+
+def test_similar_restaurants_match_pairwise_scores(user_graph: Graph) -> None:
+    """Test that each neighbourhood holds the restaurants with the highest cosine similarity."""
+    model = Item_Based_CF(user_graph, 6)
+    for restaurant in model.restaurants[:20]:
+        scores = [(user_graph.get_similarity_score(restaurant, other), other)
+                  for other in model.restaurants if other != restaurant]
+        expected = [(other, score) for score, other in sorted(scores, key=lambda p: (-p[0], p[1])) if score > 0][:6]
+        actual = model.similar_restaurants(restaurant)
+        assert [other for other, _ in actual] == [other for other, _ in expected]
+        assert [score for _, score in actual] == pytest.approx([score for _, score in expected])
+
+
+def _direct_recommendations(graph: Graph, user, num_neighbours: int, n: int) -> list[tuple]:
+    """Return the recommendations of user computed straight from the edges of graph: the mean rating
+    of user plus the similarity-weighted mean-centred ratings of its most similar other users."""
+    users = graph.get_all_vertices(Constants.USER)
+    means = {other: sum(graph.get_edges(other).values()) / len(graph.get_edges(other)) for other in users}
+    # round so that scores equal up to rounding are ordered by user, as the recommender orders ties
+    scores = [(round(graph.get_similarity_score(user, other), 12), other) for other in users if other != user]
+    neighbours = [(other, score) for score, other in sorted(scores, key=lambda p: (-p[0], p[1])) if score > 0]
+
+    rated = graph.get_edges(user)
+    predictions = []
+    for restaurant in graph.get_all_vertices(Constants.RESTAURANT) - set(rated):
+        raters = [(graph.get_edges(other)[restaurant] - means[other], score)
+                  for other, score in neighbours[:num_neighbours] if restaurant in graph.get_edges(other)]
+        if raters:
+            prediction = means[user] + sum(d * s for d, s in raters) / sum(s for _, s in raters)
+            predictions.append((restaurant, min(max(prediction, 1), 10)))
+    return sorted(predictions, key=lambda p: (-p[1], p[0]))[:n]
+
+
+def test_user_recommendations_match_direct_computation(user_graph: Graph) -> None:
+    """Test that the user-based recommendations match a neighbourhood computed pair by pair."""
+    model = User_Based_CF(user_graph, 5)
+    for user in sorted(user_graph.get_all_vertices(Constants.USER))[:40]:
+        expected = _direct_recommendations(user_graph, user, 5, 8)
+        actual = model.recommend(user, 8)
+        assert [restaurant for restaurant, _ in actual] == [restaurant for restaurant, _ in expected]
+        assert [rating for _, rating in actual] == pytest.approx([rating for _, rating in expected])
+
+
+if __name__ == '__main__':
+    pytest.main(['test_collaborative_filtering.py'])
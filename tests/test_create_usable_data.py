@@ -0,0 +1,85 @@
+"""
+This file tests reading the raw csv file and creating the restaurant graph from it
+"""
+import csv
+
+import pytest
+
+import create_usable_data
+
+# csv text that is easy to split differently from csv.reader, each after a header line
+TRICKY_CSV = [
+    'a,"b"c,d\n',
+    'a,"b"c"d",e\n',
+    '"a""b"c""d,e\n',
+    'x,a"b,c\n',
+    'a,"b" \r\n',
+    'a,b\rc,d\re\n',
+    'a,b\r\rc\n',
+    'a,"b"\rc\n',
+    'a,"x\ry",z\r\nq\n',
+    'a,"b,\n"\r\n',
+    'a\n\n \nb',
+]
+
+
+def _csv_reader_rows(path: str) -> list[list[str]]:
+    """Return the non-blank data rows csv.reader reads from the file at path."""
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)
+        return [row for row in reader if row]
+
+
+@pytest.mark.parametrize('text', TRICKY_CSV)
+def test_read_columns_matches_csv_reader(tmp_path, text: str) -> None:
+    """Test that read_columns splits fields and records exactly like csv.reader."""
+    path = tmp_path / 'tricky.csv'
+    path.write_bytes(b'header\n' + text.encode('utf-8'))
+
+    assert list(create_usable_data.read_columns(str(path), list(range(5)), 100)) == _csv_reader_rows(str(path))
+
+
+def test_read_columns_skips_unwanted_columns(tmp_path) -> None:
+    """Test that read_columns leaves the fields of unwanted columns empty."""
+    path = tmp_path / 'tricky.csv'
+    path.write_bytes(b'header\n' + ''.join(TRICKY_CSV).encode('utf-8'))
+
+    expected = [[field if column == 1 else '' for column, field in enumerate(row)]
+                for row in _csv_reader_rows(str(path))]
+    assert list(create_usable_data.read_columns(str(path), [1], 100)) == expected
+
+
+@pytest.mark.parametrize('num_rows', [1, 250, 600, 10000])
+def test_parallel_loader_matches_sequential(synthetic_csv: str, num_rows: int) -> None:
+    """Test that parsing the file in a pool of processes selects the same restaurants as parsing it in order."""
+    expected = create_usable_data.select_valid_rows(synthetic_csv, num_rows)
+    assert create_usable_data.select_valid_rows_parallel(synthetic_csv, num_rows, 3) == expected
+
+
+# an empty file, a file that is not a pickle, a truncated pickle, a pickle of something else,
+# a pickle of a class that no longer exists and a pickle of an unsupported protocol
+@pytest.mark.parametrize('contents', [b'', b'not a pickle', b'\x80\x05K', b'\x80\x05\x8c\x03abc\x94.',
+                                      b'cno_such_module\nName\n.', b'\x80\x99'])
+def test_unreadable_snapshot_is_rebuilt(synthetic_csv: str, tmp_path, contents: bytes) -> None:
+    """Test that a snapshot that cannot be unpickled is treated as missing and written again."""
+    expected = create_usable_data.load_valid_rows(synthetic_csv, 100, cache_dir=str(tmp_path))
+    [snapshot] = tmp_path.iterdir()
+    snapshot.write_bytes(contents)
+    assert create_usable_data.load_valid_rows(synthetic_csv, 100, cache_dir=str(tmp_path)) == expected
+    assert snapshot.read_bytes() != contents
+
+
+def test_failed_snapshot_write_leaves_no_file(synthetic_csv: str, tmp_path, monkeypatch) -> None:
+    """Test that the temporary snapshot file is removed when writing the snapshot fails."""
+    def fail(*_args, **_kwargs) -> None:
+        raise OSError('disk full')
+
+    monkeypatch.setattr(create_usable_data.pickle, 'dump', fail)
+    with pytest.raises(OSError):
+        create_usable_data.load_valid_rows(synthetic_csv, 100, cache_dir=str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+
+
+if __name__ == '__main__':
+    pytest.main(['test_create_usable_data.py'])
@@ -0,0 +1,171 @@
+"""
+This file tests the Graph data structure
+"""
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import pytest
+
+import Constants
+from graph_container import Graph
+
+CATEGORIES = [None, 'location', 'rest_type', 'cuisines']
+
+
+def _random_graph(seed: int, num_vertices: int = 30, num_edges: int = 300) -> Graph:
+    """Return a graph of restaurants with random edges, some of which overwrite earlier ones."""
+    rng = random.Random(seed)
+    graph = Graph()
+    for i in range(num_vertices):
+        graph.add_vertex(f'Rest {i}', 'restaurant')
+    for _ in range(num_edges):
+        item1, item2 = rng.sample(range(num_vertices), 2)
+        graph.add_edge(f'Rest {item1}', f'Rest {item2}', rng.randint(0, 9), rng.choice(CATEGORIES))
+    return graph
+
+
+def _expected_similarity(graph: Graph, item1: str, item2: str, weight_map: dict[str, int]) -> float:
+    """Return the cosine similarity of item1 and item2 computed from their edges one at a time."""
+    def weighted_edges(item: str) -> dict[str, float]:
+        categories = graph.get_edge_categories(item)
+        return {other: weight_map.get(categories.get(other), weight)
+                for other, weight in graph.get_edges(item).items()}
+
+    edges1, edges2 = weighted_edges(item1), weighted_edges(item2)
+    dot = sum(weight * edges2[other] for other, weight in edges1.items() if other in edges2)
+    norm1 = sum(weight * weight for weight in edges1.values()) ** 0.5
+    norm2 = sum(weight * weight for weight in edges2.values()) ** 0.5
+    return 0.0 if norm1 * norm2 == 0 else dot / (norm1 * norm2)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_weighted_similarity_after_updates(seed: int) -> None:
+    """Test that weighted similarity scores stay correct while edges are added and overwritten
+    between queries, so the per-category totals of each vertex are kept up to date."""
+    rng = random.Random(seed)
+    graph = _random_graph(seed)
+    for _ in range(20):
+        weight_map = {category: rng.randint(0, 5) for category in rng.sample(CATEGORIES[1:], rng.randint(0, 3))}
+        item1, item2 = rng.sample(sorted(graph.get_all_vertices()), 2)
+        assert graph.get_similarity_score(item1, item2, weight_map) == pytest.approx(
+            _expected_similarity(graph, item1, item2, weight_map))
+        item3, item4 = rng.sample(sorted(graph.get_all_vertices()), 2)
+        graph.add_edge(item3, item4, rng.randint(0, 9), rng.choice(CATEGORIES))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_similarity_scans_match_pairs(seed: int) -> None:
+    """Test that scoring items against every vertex at once gives exactly the scores of comparing each pair."""
+    rng = random.Random(seed)
+    graph = _random_graph(seed)
+    graph.add_vertex('Lonely', 'restaurant')
+    items = sorted(graph.get_all_vertices())
+    for weight_map in [None, {'location': 0}, {'cuisines': 3, 'rest_type': 7}]:
+        seeds = rng.sample(items, 3)
+        for other, scores in graph.get_similarity_scores(seeds, 'restaurant', weight_map):
+            assert scores == [graph.get_similarity_score(item, other, weight_map) for item in seeds]
+        for item in seeds:
+            assert graph.get_all_similarity_scores(item, 'restaurant', weight_map) == {
+                other: graph.get_similarity_score(item, other, weight_map) for other in items}
+
+
+def _graph_contents(graph: Graph) -> dict:
+    """Return every vertex of graph mapped to its kind, edges and edge categories."""
+    kinds = {item: kind for kind in (Constants.RESTAURANT, Constants.LOCATION, Constants.REST_TYPE,
+                                     Constants.CUISINES, Constants.APPROX_COST, Constants.OTHER)
+             for item in graph.get_all_vertices(kind)}
+    return {item: (kinds.get(item), graph.get_edges(item), graph.get_edge_categories(item))
+            for item in graph.get_all_vertices()}
+
+
+def test_save_load_round_trip(restaurant_graph: Graph, tmp_path) -> None:
+    """Test that a loaded graph has the same vertices, kinds, edges and similarity scores as the saved one."""
+    path = str(tmp_path / 'graph.bin')
+    restaurant_graph.save(path)
+    loaded = Graph()
+    loaded.load(path)
+
+    assert _graph_contents(loaded) == _graph_contents(restaurant_graph)
+    restaurants = sorted(restaurant_graph.get_all_vertices('restaurant'))[:10]
+    weight_map = {'location': 2, 'cuisines': 9}
+    for item in restaurants:
+        assert list(loaded.get_similarity_scores([item], 'restaurant', weight_map)) == \
+            list(restaurant_graph.get_similarity_scores([item], 'restaurant', weight_map))
+
+
+def test_loaded_graph_can_change(restaurant_graph: Graph, tmp_path) -> None:
+    """Test that changing a loaded graph changes it like the graph it was saved from,
+    and that the file it was loaded from can be loaded again unchanged."""
+    path = str(tmp_path / 'graph.bin')
+    restaurant_graph.save(path)
+    expected = _graph_contents(restaurant_graph)
+    loaded = Graph()
+    loaded.load(path)
+
+    restaurants = sorted(restaurant_graph.get_all_vertices('restaurant'))
+    for graph in (restaurant_graph, loaded):
+        graph.add_edge(restaurants[0], restaurants[1], 3, 'location')
+        graph.add_vertex('New Location', 'location')
+        graph.add_edge(restaurants[2], 'New Location', 6, 'location')
+    assert _graph_contents(loaded) == _graph_contents(restaurant_graph)
+
+    reloaded = Graph()
+    reloaded.load(path)
+    assert _graph_contents(reloaded) == expected
+
+
+@pytest.mark.parametrize('loaded', [False, True])
+def test_weighted_similarity_from_threads(restaurant_graph: Graph, tmp_path, loaded: bool) -> None:
+    """Test that weighted similarity scores queried from several threads at once on a new graph
+    are the same as the scores computed one edge at a time, so queries never change shared state."""
+    graph = restaurant_graph
+    if loaded:
+        restaurant_graph.save(str(tmp_path / 'graph.bin'))
+        graph = Graph()
+        graph.load(str(tmp_path / 'graph.bin'))
+    weight_map = {'location': 2, 'cuisines': 9}
+    restaurants = sorted(graph.get_all_vertices(Constants.RESTAURANT))
+    pairs = list(zip(restaurants, restaurants[1:]))
+
+    def score_all(_: int) -> list[float]:
+        """Return the weighted scores of all of pairs, in order."""
+        return [graph.get_similarity_score(item1, item2, weight_map) for item1, item2 in pairs]
+
+    # every thread scores the same pairs, and switching threads often makes a query that
+    # builds shared state likely to be interrupted while another thread reads that state
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(score_all, range(8)))
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    expected = [_expected_similarity(graph, item1, item2, weight_map) for item1, item2 in pairs]
+    for scores in results:
+        assert scores == pytest.approx(expected)
+
+
+def test_weight_maps_do_not_change_graph(restaurant_graph: Graph) -> None:
+    """Test that queries with different weight maps, run from several threads at once, score as if
+    each ran alone and leave the graph unchanged."""
+    weight_maps = [None, {'location': 9}, {'cuisines': 1, 'rest_type': 0}, {'location': 0, 'approx_cost': 7}]
+    restaurants = sorted(restaurant_graph.get_all_vertices(Constants.RESTAURANT))[:20]
+    contents = _graph_contents(restaurant_graph)
+    version = restaurant_graph.version
+
+    def score_all(weight_map: Optional[dict[str, int]]) -> list[list]:
+        """Return the scores of every restaurant against the first of restaurants, with weight_map."""
+        return list(restaurant_graph.get_similarity_scores(restaurants[:1], Constants.RESTAURANT, weight_map))
+
+    expected = [score_all(weight_map) for weight_map in weight_maps]
+    with ThreadPoolExecutor(len(weight_maps)) as pool:
+        assert list(pool.map(score_all, weight_maps * 4)) == expected * 4
+    assert restaurant_graph.version == version
+    assert _graph_contents(restaurant_graph) == contents
+
+
+if __name__ == '__main__':
+    pytest.main(['test_graph_container.py'])
@@ -0,0 +1,82 @@
+"""
+This file tests that the sparse similarity queries give the same results as the pairwise ones
+"""
+import pytest
+
+import Constants
+from graph_container import Graph
+from predict_from_data import Similarity_Computations
+
+WEIGHT_MAPS = [None, {'location': 3, 'cuisines': 9}]
+
+
+@pytest.mark.parametrize('weight_map', WEIGHT_MAPS)
+def test_sparse_scores_match_pairwise(restaurant_graph: Graph, weight_map) -> None:
+    """Test that the sparse backend scores every restaurant as the pairwise computation does."""
+    pairwise = Similarity_Computations(restaurant_graph)
+    sparse = Similarity_Computations(restaurant_graph, use_sparse=True)
+    for item in sorted(restaurant_graph.get_all_vertices(Constants.RESTAURANT))[:10]:
+        expected = pairwise.compute_similarity_scores(item, Constants.RESTAURANT, weight_map)
+        assert sparse.compute_similarity_scores(item, Constants.RESTAURANT, weight_map) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('weight_map', WEIGHT_MAPS)
+def test_sparse_top_k_matches_pairwise(restaurant_graph: Graph, weight_map) -> None:
+    """Test that the sparse top-k ranking picks the same restaurants in the same order as the pairwise one,
+    one item at a time and in a batch."""
+    items = sorted(restaurant_graph.get_all_vertices(Constants.RESTAURANT))[:25]
+    pairwise = Similarity_Computations(restaurant_graph)
+    sparse = Similarity_Computations(restaurant_graph, use_sparse=True)
+    expected = pairwise.top_k_similar_batch(items, Constants.RESTAURANT, 15, weight_map)
+
+    for item, top in zip(items, expected):
+        assert pairwise.top_k_similar(item, Constants.RESTAURANT, 15, weight_map) == top
+        result = sparse.top_k_similar(item, Constants.RESTAURANT, 15, weight_map)
+        assert [name for name, _ in result] == [name for name, _ in top]
+        assert [score for _, score in result] == pytest.approx([score for _, score in top])
+
+    batch = sparse.top_k_similar_batch(items, Constants.RESTAURANT, 15, weight_map)
+    assert [[name for name, _ in top] for top in batch] == [[name for name, _ in top] for top in expected]
+
+
+def _add_copy(graph: Graph, item: str, copy: str) -> None:
+    """Add a restaurant named copy to graph with the same edges as item."""
+    categories = graph.get_edge_categories(item)
+    graph.add_vertex(copy, Constants.RESTAURANT)
+    for other, weight in graph.get_edges(item).items():
+        graph.add_edge(copy, other, weight, categories.get(other))
+
+
+def test_ann_index_follows_graph_changes(restaurant_graph: Graph) -> None:
+    """Test that approximate top-k queries see a restaurant added after the index was first built."""
+    computations = Similarity_Computations(restaurant_graph, target_recall=0.9)
+    seed = sorted(restaurant_graph.get_all_vertices(Constants.RESTAURANT))[0]
+    assert all(name != 'Copy' for name, _ in computations.top_k_similar(seed, Constants.RESTAURANT, 5))
+
+    _add_copy(restaurant_graph, seed, 'Copy')
+    assert computations.get_ann_index(Constants.RESTAURANT).compiled.version == restaurant_graph.version
+    assert ('Copy', pytest.approx(1.0)) in computations.top_k_similar(seed, Constants.RESTAURANT, 5)
+    assert (seed, pytest.approx(1.0)) in computations.top_k_similar('Copy', Constants.RESTAURANT, 5)
+
+
+@pytest.mark.parametrize('use_sparse', [False, True])
+def test_cached_results_follow_graph_changes(restaurant_graph: Graph, use_sparse: bool) -> None:
+    """Test that top-k results cached before the graph changed are not returned after it."""
+    computations = Similarity_Computations(restaurant_graph, use_sparse=use_sparse)
+    items = sorted(restaurant_graph.get_all_vertices(Constants.RESTAURANT))[:5]
+    for weight_map in WEIGHT_MAPS:
+        computations.top_k_similar(items[0], Constants.RESTAURANT, 5, weight_map)
+        computations.top_k_similar_batch(items, Constants.RESTAURANT, 5, weight_map)
+
+    _add_copy(restaurant_graph, items[0], 'Copy')
+    for weight_map in WEIGHT_MAPS:
+        assert ('Copy', pytest.approx(1.0)) in computations.top_k_similar(items[0], Constants.RESTAURANT, 5, weight_map)
+        batch = computations.top_k_similar_batch(items, Constants.RESTAURANT, 5, weight_map)
+        assert ('Copy', pytest.approx(1.0)) in batch[0]
+        expected = Similarity_Computations(restaurant_graph).top_k_similar_batch(items, Constants.RESTAURANT, 5,
+                                                                                 weight_map)
+        assert [[name for name, _ in top] for top in batch] == [[name for name, _ in top] for top in expected]
+
+
+if __name__ == '__main__':
+    pytest.main(['test_predict_from_data.py'])
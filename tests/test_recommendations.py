@@ -0,0 +1,31 @@
+"""
+This file tests the recommendations the interfaces show
+"""
+import pytest
+
+import recommendations
+from app_context import App_Context
+
+WEIGHT_MAP = {'location': 9, 'rest_type': 8, 'cuisines': 4, 'approx_cost': 7}
+
+
+def test_summary_of_similar_restaurants(synthetic_csv: str) -> None:
+    """Test that the summary averages the price and rating of the similar restaurants."""
+    context = App_Context(synthetic_csv, 600, WEIGHT_MAP)
+    names = sorted(context.get_usable_data())[:2]
+    similar, avg_price, avg_rating, location = recommendations.similar_restaurants(context, names, WEIGHT_MAP)
+    assert 0 < len(similar) <= recommendations.SIMILAR_LIMIT
+    data = [context.get_usable_data()[name] for name in similar]
+    assert avg_price == pytest.approx(sum(res.approx_cost for res in data) / len(data))
+    assert avg_rating == pytest.approx(sum(res.rate for res in data) / len(data) * 5)
+    assert location in {res.location for res in data}
+
+
+def test_summary_of_no_similar_restaurants(synthetic_csv: str) -> None:
+    """Test that a summary with no similar restaurants is neutral instead of dividing by zero."""
+    context = App_Context(synthetic_csv, 600, WEIGHT_MAP)
+    assert recommendations._summarize(context, []) == ([], 0.0, 0.0, '')
+
+
+if __name__ == '__main__':
+    pytest.main(['test_recommendations.py'])
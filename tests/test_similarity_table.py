@@ -0,0 +1,64 @@
+"""
+This file tests building, saving and loading the precomputed top-k similarity tables
+"""
+import pytest
+
+import similarity_table
+from graph_container import Graph
+from predict_from_data import Similarity_Computations
+from sparse_graph import Sparse_Graph
+
+WEIGHT_MAP = {'location': 3, 'cuisines': 9}
+
+
+def test_save_load_round_trip(restaurant_graph: Graph, tmp_path) -> None:
+    """Test that a loaded table holds the same rows, profile and neighbours as the saved one."""
+    table = similarity_table.build_table(Sparse_Graph(restaurant_graph, 'restaurant'), WEIGHT_MAP, k=10)
+    path = str(tmp_path / 'restaurant.topk')
+    table.save(path)
+    loaded = similarity_table.load_table(path)
+
+    assert (loaded.kind, loaded.weight_map, loaded.k, loaded.rows) == (table.kind, table.weight_map, table.k,
+                                                                       table.rows)
+    assert all(loaded.top_k(item, 10) == table.top_k(item, 10) for item in table.rows)
+
+
+def test_table_matches_sparse_top_k(restaurant_graph: Graph) -> None:
+    """Test that a table gives the neighbours Sparse_Graph.top_k gives."""
+    compiled = Sparse_Graph(restaurant_graph, 'restaurant')
+    table = similarity_table.build_table(compiled, WEIGHT_MAP, k=10)
+    for item in compiled.rows[:50]:
+        expected = compiled.top_k(compiled.similarity_scores(item, WEIGHT_MAP), 10, item)
+        actual = table.top_k(item, 10)
+        assert [name for name, _ in actual] == [name for name, _ in expected]
+        assert [score for _, score in actual] == pytest.approx([score for _, score in expected], abs=1e-6)
+
+
+def test_table_written_after_a_miss_is_used(restaurant_graph: Graph, tmp_path) -> None:
+    """Test that a table saved to table_dir after it was looked up and missing is loaded."""
+    predictor = Similarity_Computations(restaurant_graph, table_dir=str(tmp_path))
+    assert predictor.get_similarity_table('restaurant', WEIGHT_MAP) is None
+
+    table = similarity_table.build_table(Sparse_Graph(restaurant_graph, 'restaurant'), WEIGHT_MAP, k=10)
+    table.save(similarity_table.table_path(str(tmp_path), 'restaurant', WEIGHT_MAP))
+    loaded = predictor.get_similarity_table('restaurant', WEIGHT_MAP)
+    assert loaded is not None and loaded.rows == table.rows
+
+
+def test_table_from_other_data_is_not_used(restaurant_graph: Graph, tmp_path) -> None:
+    """Test that a table in table_dir with the graph's restaurant names, but built from other edges
+    or other weights, is not loaded."""
+    path = similarity_table.table_path(str(tmp_path), 'restaurant', WEIGHT_MAP)
+    similarity_table.build_table(Sparse_Graph(restaurant_graph, 'restaurant'), {'location': 1}, k=10).save(path)
+    predictor = Similarity_Computations(restaurant_graph, table_dir=str(tmp_path))
+    assert predictor.get_similarity_table('restaurant', WEIGHT_MAP) is None
+
+    restaurants = sorted(restaurant_graph.get_all_vertices('restaurant'))
+    similarity_table.build_table(Sparse_Graph(restaurant_graph, 'restaurant'), WEIGHT_MAP, k=10).save(path)
+    restaurant_graph.add_edge(restaurants[0], restaurants[1], 2)
+    predictor = Similarity_Computations(restaurant_graph, table_dir=str(tmp_path))
+    assert predictor.get_similarity_table('restaurant', WEIGHT_MAP) is None
+
+
+if __name__ == '__main__':
+    pytest.main(['test_similarity_table.py'])